@@ -1,7 +1,8 @@
 """
 ASGI config for transaction_api project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``,
+served with e.g. ``uvicorn transaction_api.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -12,5 +13,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transaction_api.settings')
+# Serves the async read views, see TRANSACTIONS_SERVER in the settings.
+os.environ.setdefault('TRANSACTIONS_SERVER', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,11 @@
+"""
+URL configuration served under ASGI: the transaction list, detail, export and report
+endpoints are async views, the rest are the same views as in `transaction_api.urls`.
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path("api/v1.0/", include("transactions.api.async_urls")),
+]
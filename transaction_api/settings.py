@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,7 +44,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'transactions.api.authentication.AsyncTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
     'DEFAULT_MODEL_SERIALIZER_CLASS': (
@@ -60,6 +61,7 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    'transactions.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,7 +71,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'transaction_api.urls'
+# TRANSACTIONS_SERVER=asgi (set by asgi.py) routes the transaction list, detail, export and
+# report endpoints to async views.
+TRANSACTIONS_ASYNC_VIEWS = os.environ.get('TRANSACTIONS_SERVER') == 'asgi'
+
+ROOT_URLCONF = 'transaction_api.asgi_urls' if TRANSACTIONS_ASYNC_VIEWS else 'transaction_api.urls'
 
 TEMPLATES = [
     {
@@ -91,13 +97,63 @@ WSGI_APPLICATION = 'transaction_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite performance profile, run by every new connection. WAL lets reports read while an
+# import writes; synchronous=NORMAL only syncs at checkpoints, which WAL keeps consistent;
+# busy_timeout (ms) makes a writer wait for the lock instead of failing. An empty dict
+# keeps the SQLite defaults.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db_transaction.sqlite3',
+        # Connections are reused for CONN_MAX_AGE seconds and checked before each request reuses them.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Write transactions take the lock at BEGIN, where busy_timeout applies, instead of
+            # failing with "database is locked" when upgrading from a read.
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# TRANSACTIONS_DATABASE=postgresql switches to PostgreSQL (requirements/postgres.txt), configured
+# by the POSTGRES_* variables; there the transactions table is range-partitioned by month.
+if os.environ.get('TRANSACTIONS_DATABASE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'transaction_api'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# Under ASGI each request runs its queries in a thread of its own, which would leave a persistent
+# connection behind per request; connections are closed after each request instead, and pooled
+# on PostgreSQL.
+if TRANSACTIONS_ASYNC_VIEWS:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES['default']['OPTIONS'] = {'pool': True}
+
+# The covering indexes of the transactions table include non-key columns on PostgreSQL only;
+# SQLite builds them as plain composite indexes, which is expected.
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -137,9 +193,95 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    },
+    'metrics': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/2',
+    },
+}
+
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'create-transaction-partitions': {
+        'task': 'transactions.tasks.create_partitions_task',
+        'schedule': 24 * 60 * 60,
+    },
+    'dispatch-imports': {
+        'task': 'transactions.tasks.dispatch_imports_task',
+        'schedule': 60,
+    },
+}
+
+# Number of validated rows inserted and committed together by the CSV importer.
+TRANSACTIONS_IMPORT_BATCH_SIZE = 5000
+
+# 'rows' validates each CSV row with the compiled RowValidator; 'columnar' validates each
+# batch column-wise with NumPy (requirements/columnar.txt), falling back to RowValidator per row.
+TRANSACTIONS_IMPORT_ENGINE = 'rows'
+
+# 'staging' loads each batch into a temporary table (COPY on PostgreSQL, executemany on
+# SQLite) and inserts it with one INSERT ... SELECT; 'bulk_create' uses the ORM.
+TRANSACTIONS_IMPORT_LOADER = 'staging'
+
+# Monthly partitions of the transactions table (PostgreSQL only) are created this many months
+# ahead by the daily create_partitions_task, and on demand for the months of imported rows.
+TRANSACTIONS_PARTITION_MONTHS_AHEAD = 3
+
+# SQLite only: store transaction amounts as integer minor units and customer/product ids as
+# 16-byte BLOBs instead of decimals and 32 hex characters. Migrations convert the stored rows
+# when it is on; after changing it on a migrated database run `manage.py convert_storage`.
+TRANSACTIONS_COMPACT_STORAGE = False
+
+# Files larger than TRANSACTIONS_IMPORT_SHARD_SIZE bytes are split into line-aligned
+# byte ranges imported in parallel by up to TRANSACTIONS_IMPORT_MAX_SHARDS workers.
+TRANSACTIONS_IMPORT_SHARD_SIZE = 64 * 1024 * 1024
+TRANSACTIONS_IMPORT_MAX_SHARDS = 16
+
+# Imports are sent to the first Celery queue whose size limit (bytes, None for no limit) the file
+# fits in; run workers for each, e.g. `celery -A transaction_api worker -Q imports_small`.
+TRANSACTIONS_IMPORT_QUEUES = [
+    ('imports_small', 16 * 1024 * 1024),
+    ('imports_large', None),
+]
+# Imports of one user sent to a queue at a time; the rest wait in the database and are sent as
+# imports complete, the users with the fewest imports in the queue first.
+TRANSACTIONS_IMPORT_USER_CONCURRENCY = 2
+
+# Seconds a STARTED import keeps its user's slot without committing a batch; longer than the
+# slowest batch and than shards wait in their queue. An import past it is presumed lost.
+TRANSACTIONS_IMPORT_LEASE = 30 * 60
+
+# Largest chunk accepted by PATCH /api/transactions/uploads/<id>, in bytes. Chunks are
+# streamed to storage, so this bounds the time one request holds the upload's lock.
+TRANSACTIONS_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Rows fetched per database round trip and written per chunk by the transaction export.
+TRANSACTIONS_EXPORT_CHUNK_SIZE = 2000
+
+# Cache alias holding report responses, invalidated per customer/product id when their
+# transactions change; entries also expire after TRANSACTIONS_REPORT_CACHE_TIMEOUT seconds.
+TRANSACTIONS_REPORT_CACHE = 'reports'
+TRANSACTIONS_REPORT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Maximum number of ids accepted by the batch report endpoints.
+TRANSACTIONS_REPORT_BATCH_MAX_IDS = 500
+
+# SQL queries of a request slower than this many milliseconds are logged with their plan to the
+# transactions.slow_queries logger; None turns the slow query log off.
+TRANSACTIONS_SLOW_QUERY_MS = None
+
+# Cache alias holding the import metrics: imports run in Celery workers, so their counters are
+# shared through the cache rather than kept in the memory of the serving process.
+TRANSACTIONS_METRICS_CACHE = 'metrics'
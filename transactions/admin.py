@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import FileImportRequest, Transaction
+from .models import ChunkedUpload, ExchangeRate, FileImportRequest, ImportCheckpoint, Transaction
 
 
 @admin.register(Transaction)
@@ -24,6 +24,50 @@ class FileImportRequestAdmin(admin.ModelAdmin):
     list_display = [
         "id",
         "status",
+        "queue",
+        "duplicate_policy",
+        "rows_inserted",
+        "rows_rejected",
+        "dispatched_at",
+        "started_at",
         "processed_at",
     ]
-    list_filter = ["status"]
+    list_filter = ["status", "queue"]
+
+
+@admin.register(ImportCheckpoint)
+class ImportCheckpointAdmin(admin.ModelAdmin):
+    list_display = [
+        "import_request",
+        "start",
+        "end",
+        "offset",
+        "rows_read",
+        "rows_inserted",
+        "rows_rejected",
+        "finished",
+        "updated_at",
+    ]
+    list_filter = ["finished"]
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "filename",
+        "size",
+        "offset",
+        "import_request",
+        "updated_at",
+    ]
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = [
+        "currency",
+        "effective_date",
+        "rate",
+    ]
+    list_filter = ["currency"]
@@ -0,0 +1,18 @@
+from django.urls import path, re_path
+from . import async_views, urls
+
+app_name = 'transactions'
+
+# The read and export endpoints served by async views; everything else falls through to the sync urls.
+urlpatterns = [
+    path('transactions/', async_views.AsyncTransactionListView.as_view(), name='transaction-list'),
+    re_path(r'^transactions/export\.(?P<export_format>ndjson|csv)$', async_views.AsyncTransactionExportView.as_view(), name='export-transactions'),
+    re_path(r'^transactions/(?P<transaction_id>[^/.]+)/$', async_views.AsyncTransactionDetailView.as_view(), name='transaction-detail'),
+
+    path('reports/customer-summary/<uuid:customer_id>', async_views.AsyncReportCustomerSummaryView.as_view(), name='report-customer-summary'),
+    path('reports/product-summary/<uuid:product_id>', async_views.AsyncReportProductSummaryView.as_view(), name='report-product-summary'),
+    path('reports/customer-summaries', async_views.AsyncReportCustomerSummariesView.as_view(), name='report-customer-summaries'),
+    path('reports/product-summaries', async_views.AsyncReportProductSummariesView.as_view(), name='report-product-summaries'),
+
+    *urls.urlpatterns,
+]
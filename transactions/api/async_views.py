@@ -0,0 +1,183 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404
+from django_filters import rest_framework as filters
+
+from rest_framework import exceptions, generics
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .serializers import ReportCustomerSummarySerializer, ReportProductSummarySerializer, TransactionSerializer
+from .views import CachedReportMixin, ReportSummariesView, TransactionExportView, TransactionPaginationMixin
+from .. import report_cache
+from ..exports import EXPORT_FORMATS
+from ..models import Transaction
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines, so under ASGI a request waiting on the database
+    does not hold a worker thread. Authenticators with an `aauthenticate` coroutine are
+    awaited, others run in a thread; permissions and throttles must not query the database.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            # OPTIONS and not allowed methods keep their sync handlers.
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def aperform_authentication(self, request):
+        # Request.user authenticates synchronously on first access, so the result is set up front.
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None) or sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+
+class AsyncGenericAPIView(AsyncAPIView, generics.GenericAPIView):
+    pass
+
+
+class AsyncTransactionView(AsyncGenericAPIView):
+    queryset = Transaction.objects.all()
+    serializer_class = TransactionSerializer
+    filter_backends = [filters.DjangoFilterBackend]
+    filterset_fields = ("customer_id", "product_id",)
+    lookup_field = 'id'
+    lookup_url_kwarg = 'transaction_id'
+
+
+class AsyncTransactionListView(TransactionPaginationMixin, AsyncTransactionView):
+    async def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        if page is None:
+            return Response(self.get_serializer([obj async for obj in queryset], many=True).data)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+
+class AsyncTransactionDetailView(AsyncTransactionView):
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[self.lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, DjangoValidationError):
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def get(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
+
+
+class AsyncTransactionExportView(AsyncAPIView, TransactionExportView):
+    """Streams the export from an async iterator, so under ASGI each chunk is sent as soon as it is read."""
+
+    async def get(self, request, export_format):
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = EXPORT_FORMATS[export_format].aiter_chunks(queryset, settings.TRANSACTIONS_EXPORT_CHUNK_SIZE)
+        return self.export_response(chunks, export_format)
+
+
+class AsyncCachedReportMixin(CachedReportMixin):
+    async def get(self, request, *args, **kwargs):
+        report = await report_cache.CachedReport.acreate(
+            self.report_kind, self.kwargs[self.lookup_field], *self.date_range,
+        )
+        response = self.conditional_response(report)
+        if response is None:
+            serializer = self.get_serializer(await report.aget_or_compute(self.aget_object))
+            response = Response(serializer.data)
+        return self.set_validators(response, report)
+
+
+class AsyncReportCustomerSummaryView(AsyncCachedReportMixin, AsyncGenericAPIView):
+    serializer_class = ReportCustomerSummarySerializer
+    lookup_field = "customer_id"
+    report_kind = report_cache.CUSTOMER
+
+    async def aget_object(self):
+        return await Transaction.objects.agroup_by_customer(self.kwargs["customer_id"], *self.date_range)
+
+
+class AsyncReportProductSummaryView(AsyncCachedReportMixin, AsyncGenericAPIView):
+    serializer_class = ReportProductSummarySerializer
+    lookup_field = "product_id"
+    report_kind = report_cache.PRODUCT
+
+    async def aget_object(self):
+        return await Transaction.objects.agroup_by_product(self.kwargs["product_id"], *self.date_range)
+
+
+class AsyncReportSummariesView(AsyncAPIView, ReportSummariesView):
+    async def aget_summaries(self, ids, date_from, date_to):
+        raise NotImplementedError
+
+    async def post(self, request, *args, **kwargs):
+        ids, date_from, date_to = self.get_batch(request)
+        summaries = await report_cache.aget_or_compute_many(
+            self.report_kind, ids, date_from, date_to,
+            lambda missing: self.aget_summaries(missing, date_from, date_to),
+        )
+        return self.summaries_response(ids, summaries)
+
+
+class AsyncReportCustomerSummariesView(AsyncReportSummariesView):
+    summary_serializer_class = ReportCustomerSummarySerializer
+    report_kind = report_cache.CUSTOMER
+
+    async def aget_summaries(self, ids, date_from, date_to):
+        return await Transaction.objects.agroup_by_customers(ids, date_from, date_to)
+
+
+class AsyncReportProductSummariesView(AsyncReportSummariesView):
+    summary_serializer_class = ReportProductSummarySerializer
+    report_kind = report_cache.PRODUCT
+
+    async def aget_summaries(self, ids, date_from, date_to):
+        return await Transaction.objects.agroup_by_products(ids, date_from, date_to)
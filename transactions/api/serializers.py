@@ -1,27 +1,190 @@
-from django.core.validators import FileExtensionValidator
+from celery import states
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import serializers
 
-from ..models import Transaction, FileImportRequest
-from ..tasks import import_csv_task
+from .. import scheduling
+from ..choices import DuplicatePolicyChoices
+from ..importers import ROW_COUNTERS
+from ..models import ChunkedUpload, Transaction, FileImportRequest
 
 
-class CSVFileUploadSerializer(serializers.Serializer):
-    file = serializers.FileField(
-        required=True,
-        validators=[
-            FileExtensionValidator(allowed_extensions=['csv']),
+# Gzipped files are decompressed by the import task before they are imported.
+CSV_FILE_SUFFIXES = ('.csv', '.csv.gz')
 
-        ]
+
+def validate_csv_filename(filename):
+    if not filename.lower().endswith(CSV_FILE_SUFFIXES):
+        raise serializers.ValidationError(
+            f"File name must end with one of: {', '.join(CSV_FILE_SUFFIXES)}."
+        )
+
+
+class CSVFileUploadSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    file = serializers.FileField(required=True)
+    duplicate_policy = serializers.ChoiceField(
+        choices=DuplicatePolicyChoices.choices,
+        default=DuplicatePolicyChoices.REJECT,
     )
+    profile = serializers.BooleanField(default=False)
 
     def create(self, validated_data):
         import_request = FileImportRequest.objects.create(
             requested_by=self.context["request"].user,
             file=validated_data["file"],
+            duplicate_policy=validated_data["duplicate_policy"],
+            profile=validated_data["profile"],
         )
-        import_csv_task.delay(import_request.id)
+        scheduling.enqueue(import_request)
         return import_request
 
+    def validate_file(self, value):
+        validate_csv_filename(value.name)
+        return value
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """
+    Starts an upload of a file in chunks. The client appends each chunk at the returned
+    `offset`, which it reads again to resume an interrupted upload, and then finalizes it.
+    """
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'size', 'offset', 'duplicate_policy', 'profile', 'import_request', 'created_at']
+        read_only_fields = ['offset', 'import_request', 'created_at']
+
+    def validate_filename(self, value):
+        validate_csv_filename(value)
+        return value
+
+    def create(self, validated_data):
+        return ChunkedUpload.objects.create(requested_by=self.context["request"].user, **validated_data)
+
+
+class ChunkedUploadFinalizeSerializer(serializers.Serializer):
+    """
+    Creates the import request of a complete upload and queues its import.
+    Finalizing a finalized upload returns the same request.
+    """
+    checksum = serializers.RegexField(r'^[0-9a-f]{64}$', required=False, help_text="SHA-256 of the whole file, in hex.")
+    import_request = serializers.IntegerField(source='import_request_id', read_only=True)
+
+    def validate(self, attrs):
+        upload = self.instance
+        if upload.import_request_id is None:
+            if not upload.offset:
+                raise serializers.ValidationError("Nothing has been uploaded.")
+            if upload.size is not None and upload.offset != upload.size:
+                raise serializers.ValidationError(f"Uploaded {upload.offset} of {upload.size} bytes.")
+        return attrs
+
+    def update(self, instance, validated_data):
+        if instance.import_request_id is not None:
+            return instance
+        instance.checksum = validated_data.get('checksum', '')
+        instance.import_request = FileImportRequest.objects.create(
+            requested_by=instance.requested_by,
+            duplicate_policy=instance.duplicate_policy,
+            profile=instance.profile,
+        )
+        instance.save(update_fields=['checksum', 'import_request', 'updated_at'])
+        scheduling.enqueue(instance.import_request)
+        return instance
+
+
+class FileImportStatusSerializer(serializers.ModelSerializer):
+    """
+    Progress of an import, read from the checkpoints of its byte ranges while it runs.
+    Expects the checkpoint aggregates annotated by `FileImportStatusView`.
+    """
+    file_size = serializers.SerializerMethodField()
+    bytes_processed = serializers.SerializerMethodField()
+    progress = serializers.SerializerMethodField()
+    rows_read = serializers.SerializerMethodField()
+    rows_per_second = serializers.SerializerMethodField()
+    bytes_per_second = serializers.SerializerMethodField()
+    rejections_url = serializers.SerializerMethodField()
+    profile_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FileImportRequest
+        fields = [
+            'id',
+            'status',
+            'duplicate_policy',
+            'exception_meta',
+            'created_at',
+            'started_at',
+            'processed_at',
+            'file_size',
+            'bytes_processed',
+            'progress',
+            'rows_read',
+            *ROW_COUNTERS,
+            'rows_per_second',
+            'bytes_per_second',
+            'rejection_counts',
+            'rejections_url',
+            'stats',
+            'profile',
+            'profile_url',
+        ]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.status == states.STARTED:
+            # The request counters are only saved once the import completes.
+            for counter in ROW_COUNTERS:
+                data[counter] = getattr(instance, f'checkpoint_{counter}') or 0
+        return data
+
+    def get_file_size(self, obj):
+        return obj.file.size if obj.file else None
+
+    def get_bytes_processed(self, obj):
+        if obj.status == states.SUCCESS:
+            return self.get_file_size(obj)
+        return obj.bytes_processed or 0
+
+    def get_progress(self, obj):
+        if obj.status == states.SUCCESS:
+            return 1.0
+        file_size = self.get_file_size(obj)
+        return round(self.get_bytes_processed(obj) / file_size, 4) if file_size else 0.0
+
+    def get_rows_read(self, obj):
+        return obj.checkpoint_rows_read or 0
+
+    def get_elapsed(self, obj):
+        if obj.started_at is None:
+            return None
+        return ((obj.processed_at or timezone.now()) - obj.started_at).total_seconds()
+
+    def get_rows_per_second(self, obj):
+        elapsed = self.get_elapsed(obj)
+        return round(self.get_rows_read(obj) / elapsed, 1) if elapsed else None
+
+    def get_bytes_per_second(self, obj):
+        elapsed = self.get_elapsed(obj)
+        return round(self.get_bytes_processed(obj) / elapsed, 1) if elapsed else None
+
+    def get_rejections_url(self, obj):
+        if not obj.rejections_file:
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('transactions:import-rejections', args=[obj.id]),
+        )
+
+    def get_profile_url(self, obj):
+        if not obj.profile_file:
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('transactions:import-profile', args=[obj.id]),
+        )
+
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -49,3 +212,16 @@ class ReportProductSummarySerializer(serializers.Serializer):
     sum_quantity = serializers.IntegerField()
     total_income_in_pln = serializers.DecimalField(max_digits=12, decimal_places=2)
     count_distinct_customer = serializers.IntegerField()
+
+
+class ReportBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+    date_from = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    date_to = serializers.DateTimeField(required=False, allow_null=True, default=None)
+
+    def validate_ids(self, value):
+        if len(value) > settings.TRANSACTIONS_REPORT_BATCH_MAX_IDS:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {settings.TRANSACTIONS_REPORT_BATCH_MAX_IDS} elements."
+            )
+        return list(dict.fromkeys(value))
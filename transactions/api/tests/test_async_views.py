@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import io
+import uuid
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import resolve, reverse
+from rest_framework.authtoken.models import Token
+
+from transactions.api.tests import test_views
+from transactions.exports import EXPORT_FORMATS
+from transactions.api.tests.test_views import api_client, api_client_with_authenticated  # noqa: F401
+from transactions.tests.factories import UserFactory
+
+# The sync view tests, run against the async views of the ASGI url configuration.
+async_urls = pytest.mark.urls('transaction_api.asgi_urls')
+
+
+@async_urls
+class TestAsyncTransactionViews(test_views.TestTransactionViewSet):
+    @pytest.mark.parametrize("name, args", [
+        ("transactions:transaction-list", ()),
+        ("transactions:transaction-detail", ("0b7a4b4e-3a3b-4d1c-9f3e-7a4b4e3a3b4d",)),
+        ("transactions:report-customer-summary", ("0b7a4b4e-3a3b-4d1c-9f3e-7a4b4e3a3b4d",)),
+        ("transactions:report-product-summaries", ()),
+        ("transactions:export-transactions", ("csv",)),
+    ])
+    def test_resolve_should_return_async_view(self, name, args):
+        assert asyncio.iscoroutinefunction(resolve(reverse(name, args=args)).func)
+
+    def test_list_should_authenticate_token_when_given(self, api_client):
+        token = Token.objects.create(user=UserFactory())
+        self.create_transactions(2)
+        url = reverse("transactions:transaction-list")
+
+        response = api_client.get(url, HTTP_AUTHORIZATION=f"Token {token.key}")
+        invalid = api_client.get(url, HTTP_AUTHORIZATION="Token invalid")
+
+        assert response.status_code == 200
+        assert response.data["count"] == 2
+        assert invalid.status_code == 401
+        assert invalid.data["detail"] == "Invalid token."
+
+    def test_list_should_return_401_when_user_inactive(self, api_client):
+        token = Token.objects.create(user=UserFactory(is_active=False))
+
+        response = api_client.get(reverse("transactions:transaction-list"), HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        assert response.status_code == 401
+
+
+@async_urls
+class TestAsyncReportCustomerSummaryView(test_views.TestReportCustomerSummaryView):
+    pass
+
+
+@async_urls
+class TestAsyncReportProductSummaryView(test_views.TestReportProductSummaryView):
+    pass
+
+
+@async_urls
+class TestAsyncReportSummariesView(test_views.TestReportSummariesView):
+    pass
+
+
+@async_urls
+@pytest.mark.django_db
+class TestAsyncTransactionExportView(test_views.TestTransactionExportView):
+    def test_get_should_send_first_chunk_before_reading_all_rows_when_served_by_asgi_handler(self, settings):
+        settings.TRANSACTIONS_EXPORT_CHUNK_SIZE = 2
+        token = Token.objects.create(user=UserFactory())
+        customer_id = uuid.uuid4()
+        transactions = self.create_transactions(customer_id, 5)
+        export_format = EXPORT_FORMATS["csv"]
+        encode = export_format.encode
+        encoded = []
+
+        def record_encode(rows):
+            encoded.append(len(rows))
+            return encode(rows)
+
+        async def get_export():
+            response = await AsyncClient().get(
+                reverse("transactions:export-transactions", args=("csv",)), {"customer_id": customer_id},
+                headers={"Authorization": f"Token {token.key}"},
+            )
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            encoded_before_rest = list(encoded)
+            return response, [first, *[chunk async for chunk in chunks]], encoded_before_rest
+
+        with mock.patch.object(export_format, "encode", side_effect=record_encode):
+            response, chunks, encoded_before_rest = async_to_sync(get_export)()
+
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        assert response.status_code == 200
+        assert response.is_async
+        assert encoded_before_rest == [2]
+        assert encoded == [2, 2, 1]
+        assert [row["id"] for row in rows] == [str(transaction.id) for transaction in transactions]
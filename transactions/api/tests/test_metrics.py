@@ -0,0 +1,156 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from celery import states
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from transactions import metrics
+from transactions.api.tests.test_views import api_client, api_client_with_authenticated  # noqa: F401
+from transactions.tests.factories import FileImportRequestFactory, UserFactory
+from transactions.tests.test_rollups import make_transaction
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def staff_client():
+    client = APIClient()
+    client.force_authenticate(UserFactory(is_staff=True))
+    return client
+
+
+def sample(text, line_start):
+    return next(line.rsplit(' ', 1)[1] for line in text.splitlines() if line.startswith(line_start))
+
+
+class TestHistogram:
+    def test_samples_should_return_cumulative_buckets(self):
+        histogram = metrics.Histogram('latency_seconds', "Latency.", ('view',), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('list',), value)
+
+        assert list(histogram.samples()) == [
+            'latency_seconds_bucket{view="list",le="0.1"} 2',
+            'latency_seconds_bucket{view="list",le="1"} 3',
+            'latency_seconds_bucket{view="list",le="+Inf"} 4',
+            'latency_seconds_sum{view="list"} 3.65',
+            'latency_seconds_count{view="list"} 4',
+        ]
+
+    def test_format_labels_should_escape_quotes_and_backslashes(self):
+        assert metrics.format_labels(('view',), ('a"b\\c',)) == '{view="a\\"b\\\\c"}'
+
+
+@pytest.mark.django_db
+class TestMetricsView:
+    def test_get_should_return_403_when_not_staff(self, api_client_with_authenticated):
+        response = api_client_with_authenticated.get(reverse("transactions:metrics"))
+
+        assert response.status_code == 403
+
+    def test_get_should_return_request_metrics_when_staff(self, api_client_with_authenticated, staff_client):
+        for _ in range(3):
+            make_transaction()
+        api_client_with_authenticated.get(reverse("transactions:transaction-list"))
+        api_client_with_authenticated.get(reverse("transactions:transaction-list"), {"page": 9})
+
+        response = staff_client.get(reverse("transactions:metrics"))
+
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+        text = response.content.decode()
+        labels = 'view="transactions:transaction-list",method="GET"'
+        assert sample(text, f'transactions_http_requests_total{{{labels},status="200"}}') == '1'
+        assert sample(text, f'transactions_http_requests_total{{{labels},status="404"}}') == '1'
+        assert sample(text, f'transactions_http_request_duration_seconds_count{{{labels}}}') == '2'
+        # A count and a page query for the first request, the count for the out of range one.
+        assert sample(text, f'transactions_http_request_queries_sum{{{labels}}}') == '3'
+        assert float(sample(text, f'transactions_http_request_db_duration_seconds_sum{{{labels}}}')) > 0
+        assert sample(text, 'transactions_report_cache_misses_total{kind="customer"}') == '0'
+
+    def test_get_should_count_unmatched_requests(self, api_client, staff_client):
+        api_client.get("/missing")
+
+        text = staff_client.get(reverse("transactions:metrics")).content.decode()
+
+        assert sample(text, 'transactions_http_requests_total{view="<unmatched>",method="GET",status="404"}') == '1'
+
+    @pytest.mark.urls('transaction_api.asgi_urls')
+    def test_get_should_count_queries_of_async_views(self, api_client_with_authenticated, staff_client):
+        transaction = make_transaction()
+        api_client_with_authenticated.get(reverse("transactions:transaction-detail", args=(transaction.id,)))
+
+        text = staff_client.get(reverse("transactions:metrics")).content.decode()
+
+        labels = 'view="transactions:transaction-detail",method="GET"'
+        assert sample(text, f'transactions_http_request_queries_sum{{{labels}}}') == '1'
+
+    @pytest.mark.urls('transaction_api.asgi_urls')
+    def test_get_should_count_queries_when_served_by_asgi_handler(self, staff_client):
+        token = Token.objects.create(user=UserFactory())
+        transaction = make_transaction()
+        url = reverse("transactions:transaction-detail", args=(transaction.id,))
+
+        response = async_to_sync(AsyncClient().get)(url, headers={"Authorization": f"Token {token.key}"})
+        text = staff_client.get(reverse("transactions:metrics")).content.decode()
+
+        assert response.status_code == 200
+        labels = 'view="transactions:transaction-detail",method="GET"'
+        # The token lookup and the transaction.
+        assert sample(text, f'transactions_http_request_queries_sum{{{labels}}}') == '2'
+
+    def test_get_should_return_queue_depth_and_waits_when_imports_are_queued(self, staff_client):
+        user = UserFactory()
+        FileImportRequestFactory(requested_by=user, queue="imports_small")
+        FileImportRequestFactory(requested_by=user, queue="imports_small", dispatched_at=timezone.now())
+        FileImportRequestFactory(requested_by=user, queue="imports_large", status=states.STARTED)
+        metrics.record_import_wait("imports_small", 3)
+        metrics.record_import_wait("imports_small", 90)
+
+        text = staff_client.get(reverse("transactions:metrics")).content.decode()
+
+        depth = 'transactions_import_queue_depth{queue="imports_small",state='
+        assert sample(text, f'{depth}"waiting"}}') == '1'
+        assert sample(text, f'{depth}"queued"}}') == '1'
+        assert sample(text, 'transactions_import_queue_depth{queue="imports_large",state="running"}') == '1'
+        assert float(sample(text, 'transactions_import_queue_oldest_wait_seconds{queue="imports_small"}')) > 0
+        wait = 'transactions_import_wait_seconds'
+        assert sample(text, f'{wait}_bucket{{queue="imports_small",le="5"}}') == '1'
+        assert sample(text, f'{wait}_bucket{{queue="imports_small",le="+Inf"}}') == '2'
+        assert sample(text, f'{wait}_sum{{queue="imports_small"}}') == '93.0'
+        assert sample(text, f'{wait}_count{{queue="imports_large"}}') == '0'
+
+
+@pytest.mark.django_db
+class TestSlowQueryLog:
+    def test_request_should_log_slow_queries_with_plan_when_enabled(
+        self, settings, caplog, api_client_with_authenticated,
+    ):
+        settings.TRANSACTIONS_SLOW_QUERY_MS = 0
+        transaction = make_transaction()
+
+        with caplog.at_level(logging.WARNING, logger='transactions.slow_queries'):
+            api_client_with_authenticated.get(reverse("transactions:transaction-detail", args=(transaction.id,)))
+
+        records = [record for record in caplog.records if record.name == 'transactions.slow_queries']
+        assert len(records) == 1
+        assert records[0].sql.startswith('SELECT')
+        assert records[0].plan
+
+    def test_request_should_not_log_queries_when_disabled(self, caplog, api_client_with_authenticated):
+        transaction = make_transaction()
+
+        with caplog.at_level(logging.WARNING, logger='transactions.slow_queries'):
+            api_client_with_authenticated.get(reverse("transactions:transaction-detail", args=(transaction.id,)))
+
+        assert not [record for record in caplog.records if record.name == 'transactions.slow_queries']
@@ -0,0 +1,181 @@
+import json
+import re
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from transactions.choices import CurrencyChoices
+from transactions.tests.factories import TransactionFactory, UserFactory
+
+FULL_SCAN = 'full scan'
+INDEX_RANGE = 'index range'
+INDEX_ONLY = 'index only'
+# SCAN reads a whole table or index, SEARCH a range of an index; COVERING marks an index-only read.
+SQLITE_READ = re.compile(r'^(?P<kind>SCAN|SEARCH) (?P<table>\w+)(?P<covering> USING COVERING INDEX)?')
+
+
+class QueryRecorder:
+    """Execute wrapper keeping the SELECT statements run inside it, with their parameters."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def sqlite_table_reads(cursor, sql, params):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    reads = []
+    for *_, detail in cursor.fetchall():
+        match = SQLITE_READ.match(detail)
+        if match is None:
+            continue
+        if match['covering']:
+            access = INDEX_ONLY
+        else:
+            access = INDEX_RANGE if match['kind'] == 'SEARCH' else FULL_SCAN
+        reads.append((match['table'], access))
+    return reads
+
+
+def postgresql_table_reads(cursor, sql, params):
+    # The test tables hold a handful of rows, which PostgreSQL would rather read whole;
+    # turning the alternatives off shows whether an index path exists at all.
+    cursor.execute('SET LOCAL enable_seqscan = off')
+    cursor.execute('SET LOCAL enable_bitmapscan = off')
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    reads = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('Plans', []))
+        if node['Node Type'] == 'Seq Scan':
+            reads.append((node['Relation Name'], FULL_SCAN))
+        elif node['Node Type'] == 'Index Only Scan':
+            reads.append((node['Relation Name'], INDEX_ONLY))
+        elif node['Node Type'] == 'Index Scan':
+            reads.append((node['Relation Name'], INDEX_RANGE if 'Index Cond' in node else FULL_SCAN))
+    return reads
+
+
+def table_reads(sql, params):
+    """Returns (table, access) for every table the plan of `sql` reads."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            return sqlite_table_reads(cursor, sql, params)
+        return postgresql_table_reads(cursor, sql, params)
+
+
+@pytest.fixture
+def api_client():
+    client = APIClient()
+    client.force_authenticate(UserFactory())
+    return client
+
+
+@pytest.fixture
+def reported_transaction():
+    # Rows on both sides of the report date range, so reports read raw edges and rollups.
+    now = timezone.now()
+    customer_id, product_id = uuid.uuid4(), uuid.uuid4()
+    for days in (90, 40, 3, 0):
+        instance = TransactionFactory(
+            customer_id=customer_id,
+            currency=CurrencyChoices.PLN,
+            amount=100,
+            amount_in_pln=100,
+            product_id=product_id,
+            quantity=2,
+            timestamp=now - timedelta(days=days),
+        )
+    return instance
+
+
+@pytest.mark.skipif(connection.vendor not in ('sqlite', 'postgresql'), reason="No plan reader for this backend.")
+@pytest.mark.django_db
+class TestQueryPlans:
+    def plans(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = request()
+            if response.streaming:
+                b"".join(response.streaming_content)
+        assert response.status_code == 200
+        assert recorder.queries
+        return {sql: table_reads(sql, params) for sql, params in recorder.queries}
+
+    def assert_no_full_scans(self, request):
+        plans = self.plans(request)
+        full_scans = {sql: reads for sql, reads in plans.items() if any(access == FULL_SCAN for _, access in reads)}
+        assert full_scans == {}
+        return plans
+
+    def date_range(self, instance):
+        return {
+            "date_from": (instance.timestamp - timedelta(days=60)).isoformat(),
+            "date_to": (instance.timestamp - timedelta(days=1)).isoformat(),
+        }
+
+    @pytest.mark.parametrize("filter_field", ["customer_id", "product_id"])
+    def test_list_should_use_indexes_when_filtered(self, api_client, reported_transaction, filter_field):
+        url = reverse("transactions:transaction-list")
+
+        self.assert_no_full_scans(lambda: api_client.get(url, {filter_field: getattr(reported_transaction, filter_field)}))
+
+    def test_list_should_use_indexes_when_cursor_pagination(self, api_client, reported_transaction):
+        url = reverse("transactions:transaction-list")
+        first = api_client.get(url, {"pagination": "cursor", "page_size": 2})
+
+        self.assert_no_full_scans(lambda: api_client.get(first.data["next"]))
+
+    def test_export_should_use_indexes_when_filtered(self, api_client, reported_transaction):
+        url = reverse("transactions:export-transactions", args=("ndjson",))
+        params = {"customer_id": reported_transaction.customer_id, **self.date_range(reported_transaction)}
+
+        self.assert_no_full_scans(lambda: api_client.get(url, params))
+
+    @pytest.mark.parametrize("name, field", [
+        ("report-customer-summary", "customer_id"),
+        ("report-product-summary", "product_id"),
+    ])
+    def test_report_should_use_indexes_when_date_range_given(self, api_client, reported_transaction, name, field):
+        url = reverse(f"transactions:{name}", args=(getattr(reported_transaction, field),))
+
+        self.assert_no_full_scans(lambda: api_client.get(url, self.date_range(reported_transaction)))
+
+    @pytest.mark.parametrize("name, field", [
+        ("report-customer-summaries", "customer_id"),
+        ("report-product-summaries", "product_id"),
+    ])
+    def test_batch_report_should_use_indexes_when_date_range_given(self, api_client, reported_transaction, name, field):
+        url = reverse(f"transactions:{name}")
+        payload = {"ids": [str(getattr(reported_transaction, field)), str(uuid.uuid4())], **self.date_range(reported_transaction)}
+
+        self.assert_no_full_scans(lambda: api_client.post(url, payload, format="json"))
+
+    @pytest.mark.skipif(connection.vendor != 'postgresql', reason="SQLite has no covering index columns.")
+    @pytest.mark.parametrize("name, field", [
+        ("report-customer-summary", "customer_id"),
+        ("report-product-summary", "product_id"),
+    ])
+    def test_report_should_read_transactions_from_covering_index(self, api_client, reported_transaction, name, field):
+        url = reverse(f"transactions:{name}", args=(getattr(reported_transaction, field),))
+
+        plans = self.assert_no_full_scans(lambda: api_client.get(url, self.date_range(reported_transaction)))
+
+        # Partitions are named after the table.
+        transaction_reads = [access for reads in plans.values() for table, access in reads
+                             if table.startswith('transactions_transaction')]
+        assert transaction_reads
+        assert set(transaction_reads) == {INDEX_ONLY}
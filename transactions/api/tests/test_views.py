@@ -1,14 +1,30 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import pstats
 import uuid
+from datetime import timedelta
 from unittest import mock
 
 import pytest
+from asgiref.sync import async_to_sync
+from celery import states
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
-from transactions.choices import CurrencyChoices
-from transactions.tests.factories import UserFactory, TransactionFactory
+from transactions import uploads
+from transactions.choices import CurrencyChoices, DuplicatePolicyChoices
+from transactions.api.serializers import TransactionSerializer
+from transactions.models import ChunkedUpload, FileImportRequest, ImportCheckpoint
+from transactions.tests.factories import FileImportRequestFactory, UserFactory, TransactionFactory
+from transactions.tasks import import_csv_task
 from transactions.tests.test_importers import get_sample_file
 
 
@@ -36,16 +52,539 @@ class TestTransactionUploadView:
 
         assert response.status_code == 401
 
-    @mock.patch("transactions.api.serializers.import_csv_task.delay")
-    def test_post_should_handle_file_when_ok(self, mock_import_csv_task_delay, api_client_with_authenticated):
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_post_should_handle_file_when_ok(
+            self, mock_apply_async, api_client_with_authenticated, django_capture_on_commit_callbacks):
         url = reverse("transactions:upload-transactions")
 
         payload = {"file": get_sample_file("valid_transactions.csv")}
 
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client_with_authenticated.post(url, payload)
+
+        assert response.status_code == 201
+        mock_apply_async.assert_called_once_with((response.json()["id"],), queue="imports_small")
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_post_should_save_duplicate_policy_when_given(self, mock_apply_async, api_client_with_authenticated):
+        url = reverse("transactions:upload-transactions")
+
+        payload = {"file": get_sample_file("valid_transactions.csv"), "duplicate_policy": "overwrite"}
+
         response = api_client_with_authenticated.post(url, payload)
 
         assert response.status_code == 201
-        mock_import_csv_task_delay.assert_called_once()
+        assert FileImportRequest.objects.get().duplicate_policy == DuplicatePolicyChoices.OVERWRITE
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_post_should_save_profile_when_given(self, mock_apply_async, api_client_with_authenticated):
+        url = reverse("transactions:upload-transactions")
+
+        payload = {"file": get_sample_file("valid_transactions.csv"), "profile": "true"}
+
+        response = api_client_with_authenticated.post(url, payload)
+
+        assert response.status_code == 201
+        assert FileImportRequest.objects.get().profile is True
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_post_should_return_import_request_id(self, mock_apply_async, api_client_with_authenticated):
+        url = reverse("transactions:upload-transactions")
+
+        response = api_client_with_authenticated.post(url, {"file": get_sample_file("valid_transactions.csv")})
+
+        assert response.json()["id"] == FileImportRequest.objects.get().id
+
+
+@pytest.mark.django_db
+class TestChunkedUploadViews:
+    @pytest.fixture
+    def content(self):
+        return get_sample_file("valid_transactions.csv").read()
+
+    def create_upload(self, client, **payload):
+        payload = {"filename": "transactions.csv", **payload}
+        return client.post(reverse("transactions:chunked-uploads"), payload, format="json")
+
+    def append(self, client, upload_id, offset, chunk):
+        return client.generic(
+            "PATCH", reverse("transactions:chunked-upload", args=[upload_id]), chunk,
+            content_type="application/offset+octet-stream", HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_post_should_return_401_when_no_authenticated(self, api_client):
+        assert self.create_upload(api_client).status_code == 401
+
+    def test_post_should_return_400_when_filename_is_not_csv(self, api_client_with_authenticated):
+        response = self.create_upload(api_client_with_authenticated, filename="transactions.xlsx")
+
+        assert response.status_code == 400
+        assert "filename" in response.json()
+
+    def test_patch_should_append_chunks_when_offset_matches(self, api_client_with_authenticated, content):
+        upload_id = self.create_upload(api_client_with_authenticated, size=len(content)).json()["id"]
+
+        self.append(api_client_with_authenticated, upload_id, 0, content[:100])
+        response = self.append(api_client_with_authenticated, upload_id, 100, content[100:])
+
+        assert response.status_code == 200
+        assert response.json()["offset"] == len(content)
+        detail = api_client_with_authenticated.get(reverse("transactions:chunked-upload", args=[upload_id]))
+        assert detail.json()["offset"] == len(content)
+
+    def test_patch_should_return_409_when_offset_does_not_match(self, api_client_with_authenticated, content):
+        upload_id = self.create_upload(api_client_with_authenticated).json()["id"]
+        self.append(api_client_with_authenticated, upload_id, 0, content[:100])
+
+        response = self.append(api_client_with_authenticated, upload_id, 0, content[:100])
+
+        assert response.status_code == 409
+        assert response.json()["offset"] == 100
+
+    def test_patch_should_write_chunk_outside_transaction(self, api_client_with_authenticated, content):
+        upload_id = self.create_upload(api_client_with_authenticated).json()["id"]
+        atomic_blocks = len(connection.atomic_blocks)
+        save_part = uploads.save_part
+
+        def check_save_part(*args):
+            assert len(connection.atomic_blocks) == atomic_blocks
+            return save_part(*args)
+
+        with mock.patch("transactions.uploads.save_part", side_effect=check_save_part):
+            response = self.append(api_client_with_authenticated, upload_id, 0, content[:100])
+
+        assert response.status_code == 200
+
+    def test_patch_should_return_409_and_delete_part_when_offset_moved_during_write(
+            self, api_client_with_authenticated, content):
+        upload_id = self.create_upload(api_client_with_authenticated).json()["id"]
+        save_part = uploads.save_part
+        saved = []
+
+        def concurrent_save_part(*args):
+            saved.append(save_part(*args))
+            ChunkedUpload.objects.filter(pk=upload_id).update(offset=100)
+            return saved[-1]
+
+        with mock.patch("transactions.uploads.save_part", side_effect=concurrent_save_part):
+            response = self.append(api_client_with_authenticated, upload_id, 0, content[:100])
+
+        assert response.status_code == 409
+        assert response.json()["offset"] == 100
+        assert ChunkedUpload.objects.get(pk=upload_id).parts == []
+        assert not default_storage.exists(saved[0])
+
+    def test_patch_should_return_413_when_chunk_is_too_large(self, api_client_with_authenticated, settings):
+        settings.TRANSACTIONS_UPLOAD_MAX_CHUNK_SIZE = 10
+        upload_id = self.create_upload(api_client_with_authenticated).json()["id"]
+
+        response = self.append(api_client_with_authenticated, upload_id, 0, b"x" * 11)
+
+        assert response.status_code == 413
+
+    def test_patch_should_return_400_when_chunk_ends_past_size(self, api_client_with_authenticated):
+        upload_id = self.create_upload(api_client_with_authenticated, size=5).json()["id"]
+
+        response = self.append(api_client_with_authenticated, upload_id, 0, b"x" * 6)
+
+        assert response.status_code == 400
+
+    def test_patch_should_return_404_when_upload_belongs_to_another_user(self, api_client_with_authenticated):
+        upload = ChunkedUpload.objects.create(requested_by=UserFactory(), filename="transactions.csv")
+
+        response = self.append(api_client_with_authenticated, upload.id, 0, b"x")
+
+        assert response.status_code == 404
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_finalize_should_queue_import_when_upload_is_complete(
+            self, mock_apply_async, api_client_with_authenticated, content, django_capture_on_commit_callbacks):
+        upload_id = self.create_upload(
+            api_client_with_authenticated, size=len(content), duplicate_policy="skip",
+        ).json()["id"]
+        self.append(api_client_with_authenticated, upload_id, 0, content)
+        url = reverse("transactions:finalize-chunked-upload", args=[upload_id])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client_with_authenticated.post(url, {}, format="json")
+        again = api_client_with_authenticated.post(url, {}, format="json")
+
+        assert response.status_code == 201
+        import_request = FileImportRequest.objects.get()
+        assert response.json()["import_request"] == import_request.id
+        assert import_request.duplicate_policy == DuplicatePolicyChoices.SKIP
+        mock_apply_async.assert_called_once_with((import_request.id,), queue="imports_small")
+        assert again.status_code == 200
+        assert again.json()["import_request"] == import_request.id
+        assert self.append(api_client_with_authenticated, upload_id, len(content), b"x").status_code == 409
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_finalize_should_return_400_when_upload_is_incomplete(
+            self, mock_apply_async, api_client_with_authenticated, content):
+        upload_id = self.create_upload(api_client_with_authenticated, size=len(content)).json()["id"]
+        self.append(api_client_with_authenticated, upload_id, 0, content[:100])
+
+        response = api_client_with_authenticated.post(
+            reverse("transactions:finalize-chunked-upload", args=[upload_id]), {}, format="json",
+        )
+
+        assert response.status_code == 400
+        assert not FileImportRequest.objects.exists()
+        mock_apply_async.assert_not_called()
+
+    def test_finalize_should_import_gzipped_upload_when_checksum_matches(
+            self, api_client_with_authenticated, content, django_capture_on_commit_callbacks):
+        compressed = gzip.compress(content)
+        upload_id = self.create_upload(
+            api_client_with_authenticated, filename="transactions.csv.gz", size=len(compressed),
+        ).json()["id"]
+        for start in range(0, len(compressed), 64):
+            self.append(api_client_with_authenticated, upload_id, start, compressed[start:start + 64])
+
+        run_import = mock.Mock(side_effect=lambda args, queue: import_csv_task(*args))
+        with mock.patch("transactions.tasks.import_csv_task.apply_async", run_import), \
+                django_capture_on_commit_callbacks(execute=True):
+            response = api_client_with_authenticated.post(
+                reverse("transactions:finalize-chunked-upload", args=[upload_id]),
+                {"checksum": hashlib.sha256(compressed).hexdigest()}, format="json",
+            )
+
+        import_request = FileImportRequest.objects.get(pk=response.json()["import_request"])
+        assert import_request.status == states.SUCCESS
+        assert import_request.rows_inserted == 5
+        assert import_request.file.open("rb").read() == content
+
+
+@pytest.mark.django_db
+class TestFileImportStatusView:
+    @pytest.fixture
+    def user(self):
+        return UserFactory()
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_get_should_return_checkpoint_progress_when_import_started(self, client, user):
+        file_request = FileImportRequestFactory(
+            requested_by=user,
+            file=SimpleUploadedFile("transactions.csv", b"h\n" + b"x" * 98),
+            status=states.STARTED,
+            started_at=timezone.now() - timedelta(seconds=10),
+        )
+        for start, offset, rows_read in [(2, 20, 4), (50, 80, 6)]:
+            ImportCheckpoint.objects.create(
+                import_request=file_request,
+                start=start,
+                offset=offset,
+                rows_read=rows_read,
+                rows_inserted=rows_read - 1,
+                rows_rejected=1,
+            )
+
+        response = client.get(reverse("transactions:import-status", args=[file_request.id]))
+
+        data = response.json()
+        assert response.status_code == 200
+        assert data["status"] == states.STARTED
+        assert data["file_size"] == 100
+        assert data["bytes_processed"] == 2 + 18 + 30
+        assert data["progress"] == 0.5
+        assert data["rows_read"] == 10
+        assert (data["rows_inserted"], data["rows_rejected"]) == (8, 2)
+        assert 0.9 < data["rows_per_second"] <= 1
+
+    def test_get_should_return_request_counters_when_import_succeeded(self, client, user):
+        file_request = FileImportRequestFactory(requested_by=user, status=states.SUCCESS, rows_inserted=7)
+
+        data = client.get(reverse("transactions:import-status", args=[file_request.id])).json()
+
+        assert data["progress"] == 1.0
+        assert data["rows_inserted"] == 7
+        assert data["rows_per_second"] is None
+
+    def test_get_should_return_404_when_import_requested_by_other_user(self, client):
+        file_request = FileImportRequestFactory()
+
+        response = client.get(reverse("transactions:import-status", args=[file_request.id]))
+
+        assert response.status_code == 404
+
+    def test_get_should_link_rejections_when_rows_rejected(self, client, user):
+        file_request = FileImportRequestFactory(
+            requested_by=user,
+            status=states.SUCCESS,
+            rejections_file=SimpleUploadedFile("rejections.ndjson.gz", gzip.compress(b"{}\n")),
+            rejection_counts={"amount:invalid": 1},
+        )
+
+        data = client.get(reverse("transactions:import-status", args=[file_request.id])).json()
+
+        assert data["rejection_counts"] == {"amount:invalid": 1}
+        assert data["rejections_url"].endswith(reverse("transactions:import-rejections", args=[file_request.id]))
+
+    def test_get_should_return_stats_and_profile_when_import_profiled(self, client, user):
+        file_request = FileImportRequestFactory(
+            requested_by=user, file=get_sample_file("valid_transactions.csv"), profile=True,
+        )
+        import_csv_task(file_request.id)
+
+        data = client.get(reverse("transactions:import-status", args=[file_request.id])).json()
+
+        assert data["stats"]["rows_read"] == data["stats"]["rows_validated"] == data["rows_inserted"]
+        assert data["stats"]["batches"] == 1
+        assert data["profile_url"].endswith(reverse("transactions:import-profile", args=[file_request.id]))
+
+
+@pytest.mark.django_db
+class TestFileImportRejectionsView:
+    @pytest.fixture
+    def user(self):
+        return UserFactory()
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_get_should_download_rejected_rows(self, client, user):
+        file_request = FileImportRequestFactory(requested_by=user, file=get_sample_file("invalid_transactions.csv"))
+        import_csv_task(file_request.id)
+
+        response = client.get(reverse("transactions:import-rejections", args=[file_request.id]))
+
+        rows = [json.loads(line) for line in gzip.decompress(b"".join(response.streaming_content)).splitlines()]
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/gzip"
+        assert [row["row"] for row in rows] == [2, 3, 4]
+
+    def test_get_should_return_404_when_no_rows_rejected(self, client, user):
+        file_request = FileImportRequestFactory(requested_by=user, status=states.SUCCESS)
+
+        response = client.get(reverse("transactions:import-rejections", args=[file_request.id]))
+
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize("url_name", ["transactions:import-rejections", "transactions:import-profile"])
+    def test_get_should_return_404_when_import_of_other_user(self, client, url_name):
+        file_request = FileImportRequestFactory(file=get_sample_file("invalid_transactions.csv"), profile=True)
+        import_csv_task(file_request.id)
+
+        response = client.get(reverse(url_name, args=[file_request.id]))
+
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestFileImportProfileView:
+    @pytest.fixture
+    def user(self):
+        return UserFactory()
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_get_should_download_pstats_profile_when_import_profiled(self, client, user, tmp_path):
+        file_request = FileImportRequestFactory(
+            requested_by=user, file=get_sample_file("valid_transactions.csv"), profile=True,
+        )
+        import_csv_task(file_request.id)
+
+        response = client.get(reverse("transactions:import-profile", args=[file_request.id]))
+
+        assert response.status_code == 200
+        path = tmp_path / "import.prof"
+        path.write_bytes(b"".join(response.streaming_content))
+        functions = {function for _, _, function in pstats.Stats(str(path)).stats}
+        assert {"save_batch", "validate"} <= functions
+
+    def test_get_should_return_404_when_import_not_profiled(self, client, user):
+        file_request = FileImportRequestFactory(requested_by=user, file=get_sample_file("valid_transactions.csv"))
+        import_csv_task(file_request.id)
+
+        response = client.get(reverse("transactions:import-profile", args=[file_request.id]))
+
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestTransactionViewSet:
+    def create_transactions(self, count, same_timestamp_every=3):
+        start = timezone.now()
+        return [
+            TransactionFactory(
+                customer_id=uuid.uuid4(),
+                currency=CurrencyChoices.PLN,
+                amount=100,
+                amount_in_pln=100,
+                product_id=uuid.uuid4(),
+                quantity=1,
+                # Groups of rows share a timestamp, so pages have to break ties on id.
+                timestamp=start - timedelta(minutes=index // same_timestamp_every),
+            )
+            for index in range(count)
+        ]
+
+    def test_list_should_return_keyset_pages_in_order_when_cursor_pagination(self, api_client_with_authenticated):
+        transactions = self.create_transactions(11)
+        expected = [str(t.id) for t in sorted(transactions, key=lambda t: (t.timestamp, t.id), reverse=True)]
+        url = reverse("transactions:transaction-list")
+
+        ids, pages = [], 0
+        response = api_client_with_authenticated.get(url, {"pagination": "cursor", "page_size": 4})
+        while True:
+            assert response.status_code == 200
+            assert "count" not in response.data
+            ids += [row["id"] for row in response.data["results"]]
+            pages += 1
+            if not response.data["next"]:
+                break
+            response = api_client_with_authenticated.get(response.data["next"])
+
+        assert ids == expected
+        assert pages == 3
+
+    def test_list_should_return_previous_page_when_following_previous_link(self, api_client_with_authenticated):
+        self.create_transactions(10)
+        url = reverse("transactions:transaction-list")
+        first = api_client_with_authenticated.get(url, {"pagination": "cursor", "page_size": 4})
+        second = api_client_with_authenticated.get(first.data["next"])
+
+        previous = api_client_with_authenticated.get(second.data["previous"])
+
+        assert first.data["previous"] is None
+        assert previous.data["results"] == first.data["results"]
+        assert previous.data["next"] == first.data["next"]
+
+    def test_list_should_not_count_rows_when_cursor_pagination(
+        self, api_client_with_authenticated, django_assert_max_num_queries,
+    ):
+        self.create_transactions(5)
+        url = reverse("transactions:transaction-list")
+
+        with django_assert_max_num_queries(1) as captured:
+            # Authentication is forced, so the only query is the page itself.
+            response = api_client_with_authenticated.get(url, {"pagination": "cursor", "customer_id": uuid.uuid4()})
+
+        assert response.status_code == 200
+        assert "COUNT(" not in captured.captured_queries[0]["sql"]
+
+    def test_list_should_return_404_when_cursor_invalid(self, api_client_with_authenticated):
+        url = reverse("transactions:transaction-list")
+
+        response = api_client_with_authenticated.get(url, {"pagination": "cursor", "cursor": "cD1ub3QtYS1wb3NpdGlvbg=="})
+
+        assert response.status_code == 404
+
+    def test_list_should_paginate_by_page_number_by_default(self, api_client_with_authenticated):
+        self.create_transactions(3)
+        url = reverse("transactions:transaction-list")
+
+        response = api_client_with_authenticated.get(url)
+
+        assert response.status_code == 200
+        assert response.data["count"] == 3
+
+    def test_list_should_return_404_when_page_out_of_range(self, api_client_with_authenticated):
+        self.create_transactions(3)
+        url = reverse("transactions:transaction-list")
+
+        response = api_client_with_authenticated.get(url, {"page": 2})
+
+        assert response.status_code == 404
+
+    def test_retrieve_should_return_transaction_when_exists(self, api_client_with_authenticated):
+        transaction = self.create_transactions(2)[1]
+        url = reverse("transactions:transaction-detail", args=(transaction.id,))
+
+        response = api_client_with_authenticated.get(url)
+
+        assert response.status_code == 200
+        assert response.data == TransactionSerializer(transaction).data
+
+    @pytest.mark.parametrize("transaction_id", [uuid.uuid4(), "not-a-uuid"])
+    def test_retrieve_should_return_404_when_not_exists(self, api_client_with_authenticated, transaction_id):
+        url = reverse("transactions:transaction-detail", args=(transaction_id,))
+
+        response = api_client_with_authenticated.get(url)
+
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestTransactionExportView:
+    def create_transactions(self, customer_id, count):
+        return [
+            TransactionFactory(
+                customer_id=customer_id,
+                currency=CurrencyChoices.EUR,
+                amount="10.50",
+                amount_in_pln="42.00",
+                product_id=uuid.uuid4(),
+                quantity=index + 1,
+                timestamp=timezone.now() - timedelta(hours=index),
+            )
+            for index in range(count)
+        ]
+
+    def read_chunks(self, response):
+        # The ASGI url configuration streams from an async iterator.
+        if response.is_async:
+            async def read():
+                return [chunk async for chunk in response.streaming_content]
+            return async_to_sync(read)()
+        return list(response.streaming_content)
+
+    def test_get_should_return_401_when_no_authenticated(self, api_client):
+        url = reverse("transactions:export-transactions", args=("ndjson",))
+
+        response = api_client.get(url)
+
+        assert response.status_code == 401
+
+    def test_get_should_stream_serializer_representation_when_ndjson(self, api_client_with_authenticated):
+        customer_id = uuid.uuid4()
+        transactions = self.create_transactions(customer_id, 3)
+        self.create_transactions(uuid.uuid4(), 2)
+        url = reverse("transactions:export-transactions", args=("ndjson",))
+
+        response = api_client_with_authenticated.get(url, {"customer_id": customer_id})
+        rows = [json.loads(line) for line in b"".join(self.read_chunks(response)).decode().splitlines()]
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert rows == [dict(TransactionSerializer(transaction).data) for transaction in transactions]
+
+    def test_get_should_stream_csv_with_header_when_csv(self, api_client_with_authenticated, settings):
+        settings.TRANSACTIONS_EXPORT_CHUNK_SIZE = 2
+        customer_id = uuid.uuid4()
+        transactions = self.create_transactions(customer_id, 5)
+        url = reverse("transactions:export-transactions", args=("csv",))
+
+        response = api_client_with_authenticated.get(url, {"customer_id": customer_id}, HTTP_ACCEPT="text/csv")
+        chunks = self.read_chunks(response)
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+
+        assert response.status_code == 200
+        assert response["Content-Disposition"] == 'attachment; filename="transactions.csv"'
+        assert len(chunks) == 3
+        assert [row["id"] for row in rows] == [str(transaction.id) for transaction in transactions]
+        assert rows[0]["amount"] == "10.50"
+        assert rows[0]["quantity"] == "1"
+
+    def test_get_should_return_400_when_filter_invalid(self, api_client_with_authenticated):
+        url = reverse("transactions:export-transactions", args=("csv",))
+
+        response = api_client_with_authenticated.get(url, {"date_from": "yesterday"})
+
+        assert response.status_code == 400
 
 
 @pytest.mark.django_db
@@ -110,6 +649,72 @@ class TestReportCustomerSummaryView:
         assert response.data["count_distinct_product"] == 2
         assert response.data["last_transaction_datetime"] == now.isoformat().replace("+00:00", "Z")
 
+    def test_get_should_aggregate_date_range_when_given(self, api_client_with_authenticated):
+        customer_id = uuid.uuid4()
+        now = timezone.now()
+        for days, amount_in_pln in ((40, 100), (3, 200), (0, 400)):
+            TransactionFactory(
+                customer_id=customer_id,
+                currency=CurrencyChoices.PLN,
+                amount=amount_in_pln,
+                amount_in_pln=amount_in_pln,
+                product_id=uuid.uuid4(),
+                quantity=1,
+                timestamp=now - timedelta(days=days),
+            )
+        url = reverse("transactions:report-customer-summary", args=(customer_id,))
+
+        response = api_client_with_authenticated.get(url, {
+            "date_from": (now - timedelta(days=30)).isoformat(),
+            "date_to": (now - timedelta(days=1)).isoformat(),
+        })
+
+        assert response.status_code == 200
+        assert response.data["total_cost_in_pln"] == "200.00"
+        assert response.data["count_distinct_product"] == 1
+
+    def test_get_should_return_304_when_etag_matches(self, api_client_with_authenticated):
+        url = reverse("transactions:report-customer-summary", args=(uuid.uuid4(),))
+
+        response = api_client_with_authenticated.get(url)
+        not_modified = api_client_with_authenticated.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        assert response.status_code == 200
+        assert response["Last-Modified"]
+        assert not_modified.status_code == 304
+        assert not_modified["ETag"] == response["ETag"]
+
+    def test_get_should_return_fresh_report_when_customer_transactions_imported(
+        self, api_client_with_authenticated, django_capture_on_commit_callbacks,
+    ):
+        customer_id = uuid.uuid4()
+        url = reverse("transactions:report-customer-summary", args=(customer_id,))
+        response = api_client_with_authenticated.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TransactionFactory(
+                customer_id=customer_id,
+                currency=CurrencyChoices.PLN,
+                amount=100,
+                amount_in_pln=100,
+                product_id=uuid.uuid4(),
+                quantity=1,
+                timestamp=timezone.now(),
+            )
+        refreshed = api_client_with_authenticated.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        assert refreshed.status_code == 200
+        assert refreshed.data["total_cost_in_pln"] == "100.00"
+        assert refreshed["ETag"] != response["ETag"]
+
+    def test_get_should_return_400_when_date_range_invalid(self, api_client_with_authenticated):
+        url = reverse("transactions:report-customer-summary", args=(uuid.uuid4(),))
+
+        response = api_client_with_authenticated.get(url, {"date_from": "yesterday"})
+
+        assert response.status_code == 400
+        assert "date_from" in response.data
+
 
 @pytest.mark.django_db
 class TestReportProductSummaryView:
@@ -172,3 +777,67 @@ class TestReportProductSummaryView:
         assert response.data["sum_quantity"] == 4
         assert response.data["count_distinct_customer"] == 2
         assert response.data["total_income_in_pln"] == "1000.00"
+
+
+@pytest.mark.django_db
+class TestReportSummariesView:
+    def test_post_should_return_401_when_no_authenticated(self, api_client):
+        url = reverse("transactions:report-customer-summaries")
+
+        response = api_client.post(url, {"ids": [str(uuid.uuid4())]}, format="json")
+
+        assert response.status_code == 401
+
+    def test_post_should_return_summaries_keyed_by_id(self, api_client_with_authenticated):
+        customer_ids = [uuid.uuid4() for _ in range(3)]
+        for index, customer_id in enumerate(customer_ids[:2]):
+            TransactionFactory(
+                customer_id=customer_id,
+                currency=CurrencyChoices.PLN,
+                amount=100,
+                amount_in_pln=100 * (index + 1),
+                product_id=uuid.uuid4(),
+                quantity=1,
+                timestamp=timezone.now(),
+            )
+        url = reverse("transactions:report-customer-summaries")
+
+        response = api_client_with_authenticated.post(url, {"ids": [str(id_) for id_ in customer_ids]}, format="json")
+
+        assert response.status_code == 200
+        assert list(response.data) == [str(id_) for id_ in customer_ids]
+        for customer_id in customer_ids:
+            single = api_client_with_authenticated.get(
+                reverse("transactions:report-customer-summary", args=(customer_id,)),
+            )
+            assert response.data[str(customer_id)] == single.data
+        assert response.data[str(customer_ids[1])]["total_cost_in_pln"] == "200.00"
+        assert response.data[str(customer_ids[2])]["count_distinct_product"] == 0
+
+    def test_post_should_query_once_per_source_whatever_the_number_of_ids(
+        self, api_client_with_authenticated, django_assert_num_queries,
+    ):
+        product_ids = [str(uuid.uuid4()) for _ in range(50)]
+        url = reverse("transactions:report-product-summaries")
+        payload = {"ids": product_ids, "date_from": "2024-01-01T12:00:00Z", "date_to": "2024-03-01T12:00:00Z"}
+
+        # Bucket totals, raw edge totals, bucket pairs and edge pairs.
+        with django_assert_num_queries(4):
+            response = api_client_with_authenticated.post(url, payload, format="json")
+        with django_assert_num_queries(0):
+            cached = api_client_with_authenticated.post(url, payload, format="json")
+
+        assert response.status_code == 200
+        assert len(response.data) == 50
+        assert cached.data == response.data
+
+    def test_post_should_return_400_when_too_many_ids(self, api_client_with_authenticated, settings):
+        settings.TRANSACTIONS_REPORT_BATCH_MAX_IDS = 2
+        url = reverse("transactions:report-product-summaries")
+
+        response = api_client_with_authenticated.post(
+            url, {"ids": [str(uuid.uuid4()) for _ in range(3)]}, format="json",
+        )
+
+        assert response.status_code == 400
+        assert "ids" in response.data
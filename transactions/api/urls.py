@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from . import views
 
@@ -9,9 +9,20 @@ router.register('transactions', views.TransactionViewSet, basename='transaction'
 
 urlpatterns = [
     path('transactions/upload', views.TransactionUploadView.as_view(), name='upload-transactions'),
+    path('transactions/uploads', views.ChunkedUploadCreateView.as_view(), name='chunked-uploads'),
+    path('transactions/uploads/<int:upload_id>', views.ChunkedUploadView.as_view(), name='chunked-upload'),
+    path('transactions/uploads/<int:upload_id>/finalize', views.ChunkedUploadFinalizeView.as_view(), name='finalize-chunked-upload'),
+    path('transactions/imports/<int:import_request_id>', views.FileImportStatusView.as_view(), name='import-status'),
+    path('transactions/imports/<int:import_request_id>/rejections', views.FileImportRejectionsView.as_view(), name='import-rejections'),
+    path('transactions/imports/<int:import_request_id>/profile', views.FileImportProfileView.as_view(), name='import-profile'),
+    re_path(r'^transactions/export\.(?P<export_format>ndjson|csv)$', views.TransactionExportView.as_view(), name='export-transactions'),
 
     path('reports/customer-summary/<uuid:customer_id>', views.ReportCustomerSummaryView.as_view(), name='report-customer-summary'),
     path('reports/product-summary/<uuid:product_id>', views.ReportProductSummaryView.as_view(), name='report-product-summary'),
+    path('reports/customer-summaries', views.ReportCustomerSummariesView.as_view(), name='report-customer-summaries'),
+    path('reports/product-summaries', views.ReportProductSummariesView.as_view(), name='report-product-summaries'),
+
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 
     path('', include(router.urls)),
 ]
@@ -1,16 +1,39 @@
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.db.models import F, Min, Q, Sum
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
 from django_filters import rest_framework as filters
 
-from rest_framework import viewsets, generics
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.parsers import MultiPartParser
+from rest_framework import status, viewsets, generics
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from .serializers import (
     TransactionSerializer,
     ReportCustomerSummarySerializer,
     ReportProductSummarySerializer,
-    CSVFileUploadSerializer
+    ReportBatchSerializer,
+    CSVFileUploadSerializer,
+    ChunkedUploadSerializer,
+    ChunkedUploadFinalizeSerializer,
+    FileImportStatusSerializer,
 )
-from ..models import Transaction
+from .. import metrics, report_cache, uploads
+from ..exports import EXPORT_FORMATS
+from ..importers import ROW_COUNTERS
+from ..models import ChunkedUpload, FileImportRequest, Transaction
 
 
 class RangeTransactionFilter(filters.FilterSet):
@@ -18,39 +41,404 @@ class RangeTransactionFilter(filters.FilterSet):
     date_to = filters.DateTimeFilter(field_name="timestamp", lookup_expr="lte")
 
 
+class TransactionExportFilter(RangeTransactionFilter):
+    class Meta:
+        model = Transaction
+        fields = ("customer_id", "product_id")
+
+
+class CachedReportMixin:
+    """Serves reports through the report cache, answering conditional requests from its version alone."""
+    filterset_class = RangeTransactionFilter
+    report_kind = None
+
+    @cached_property
+    def date_range(self):
+        filterset = self.filterset_class(self.request.query_params, queryset=Transaction.objects.none())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return filterset.form.cleaned_data.get("date_from"), filterset.form.cleaned_data.get("date_to")
+
+    def conditional_response(self, report):
+        return get_conditional_response(self.request, etag=quote_etag(report.etag), last_modified=report.last_modified)
+
+    def set_validators(self, response, report):
+        response.headers["ETag"] = quote_etag(report.etag)
+        response.headers["Last-Modified"] = http_date(report.last_modified)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        report = report_cache.CachedReport(self.report_kind, self.kwargs[self.lookup_field], *self.date_range)
+        response = self.conditional_response(report)
+        if response is None:
+            serializer = self.get_serializer(report.get_or_compute(self.get_object))
+            response = Response(serializer.data)
+        return self.set_validators(response, report)
+
+
 class TransactionPagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Counted up front, the paginator would otherwise count synchronously.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return self.page.object_list
+
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (timestamp, id) ordering: each page continues strictly
+    after the row its cursor points at, so the cost of a page does not depend on its
+    depth and no total count is taken.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_page_queryset(self, queryset, request):
+        """Returns the queryset of the requested page and one row more, None when not paginating."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        if self.cursor is not None and self.cursor.position is not None:
+            timestamp, pk = self.parse_position(self.cursor.position)
+            # The redundant bound on timestamp alone lets the database seek on the timestamp indexes.
+            if reverse:
+                queryset = queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk),
+                                           timestamp__gte=timestamp)
+            else:
+                queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk),
+                                           timestamp__lte=timestamp)
+        queryset = queryset.order_by(*(('timestamp', 'id') if reverse else self.ordering))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse = self.cursor is not None and self.cursor.reverse
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        if self.page:
+            self.previous_position = self.get_position(self.page[0])
+            self.next_position = self.get_position(self.page[-1])
+        else:
+            self.previous_position = self.next_position = self.cursor.position if self.cursor else None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return None if queryset is None else self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return None if queryset is None else self.set_page([obj async for obj in queryset])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def get_position(self, instance):
+        return f"{instance.timestamp.isoformat()}|{instance.id}"
+
+    def parse_position(self, position):
+        try:
+            timestamp, pk = position.split("|")
+            return datetime.fromisoformat(timestamp), uuid.UUID(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
 
 class TransactionUploadView(generics.CreateAPIView):
     serializer_class = CSVFileUploadSerializer
     parser_classes = (MultiPartParser,)
 
 
-class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Transaction.objects.all()
+class ChunkTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Chunk too large."
+    default_code = 'chunk_too_large'
+
+
+class ChunkedUploadCreateView(generics.CreateAPIView):
+    serializer_class = ChunkedUploadSerializer
+    parser_classes = (JSONParser,)
+
+
+class ChunkedUploadView(generics.RetrieveAPIView):
+    """
+    GET returns the upload with the offset to resume at. PATCH appends the raw request body
+    at the offset given by the `Upload-Offset` header, which must be the current offset; the
+    body is written straight to storage without being parsed. The upload is locked only to
+    append the written part, so a slow client does not hold a database lock (on SQLite, the
+    database-wide write lock) while it sends a chunk.
+    """
+    serializer_class = ChunkedUploadSerializer
+    lookup_url_kwarg = 'upload_id'
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(requested_by=self.request.user)
+
+    def conflict(self, upload, offset):
+        if upload.import_request_id is None and offset == upload.offset:
+            return None
+        detail = "The upload is finalized." if upload.import_request_id else "Unexpected offset."
+        return Response({'detail': detail, 'offset': upload.offset}, status=status.HTTP_409_CONFLICT)
+
+    def patch(self, request, upload_id):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': "An integer Upload-Offset header is required."})
+        if length <= 0:
+            raise ValidationError({'detail': "The chunk is empty."})
+        if length > settings.TRANSACTIONS_UPLOAD_MAX_CHUNK_SIZE:
+            raise ChunkTooLarge(f"Chunks are limited to {settings.TRANSACTIONS_UPLOAD_MAX_CHUNK_SIZE} bytes.")
+
+        upload = self.get_object()
+        conflict = self.conflict(upload, offset)
+        if conflict is not None:
+            return conflict
+        if upload.size is not None and offset + length > upload.size:
+            raise ValidationError({'detail': f"The chunk ends past the size of {upload.size} bytes."})
+        try:
+            name = uploads.save_part(upload, offset, request.stream, length)
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+
+        # Another request may have appended a chunk or finalized the upload meanwhile.
+        with transaction.atomic():
+            upload = generics.get_object_or_404(self.get_queryset().select_for_update(), pk=upload_id)
+            conflict = self.conflict(upload, offset)
+            if conflict is None:
+                uploads.append_part(upload, name, length)
+        if conflict is not None:
+            uploads.delete_part(name)
+            return conflict
+        return Response(self.get_serializer(upload).data)
+
+
+class ChunkedUploadFinalizeView(generics.GenericAPIView):
+    serializer_class = ChunkedUploadFinalizeSerializer
+    parser_classes = (JSONParser,)
+
+    def post(self, request, upload_id):
+        with transaction.atomic():
+            upload = generics.get_object_or_404(
+                ChunkedUpload.objects.filter(requested_by=request.user).select_for_update(), pk=upload_id,
+            )
+            finalized = upload.import_request_id is not None
+            serializer = self.get_serializer(upload, data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK if finalized else status.HTTP_201_CREATED)
+
+
+class FileImportStatusView(generics.RetrieveAPIView):
+    serializer_class = FileImportStatusSerializer
+    lookup_url_kwarg = 'import_request_id'
+
+    def get_queryset(self):
+        # The header precedes the first range, so it counts as processed once a range has started.
+        return FileImportRequest.objects.filter(requested_by=self.request.user).annotate(
+            bytes_processed=Min('checkpoints__start') + Sum(F('checkpoints__offset') - F('checkpoints__start')),
+            checkpoint_rows_read=Sum('checkpoints__rows_read'),
+            **{f'checkpoint_{counter}': Sum(f'checkpoints__{counter}') for counter in ROW_COUNTERS},
+        )
+
+
+class TransactionPaginationMixin:
     pagination_class = TransactionPagination
+    cursor_pagination_class = TransactionCursorPagination
+
+    @property
+    def paginator(self):
+        # Keyset pages are opt-in with ?pagination=cursor; their links keep that parameter.
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+
+class TransactionViewSet(TransactionPaginationMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     filter_backends = [filters.DjangoFilterBackend]
     filterset_fields = ("customer_id", "product_id",)
-    lookup_field = 'transaction_id'
+    lookup_field = 'id'
+    lookup_url_kwarg = 'transaction_id'
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    # The export format comes from the URL; errors are still rendered with the first renderer.
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class TransactionExportView(generics.GenericAPIView):
+    """Streams the filtered transactions as NDJSON or CSV in constant memory."""
+    queryset = Transaction.objects.all()
+    content_negotiation_class = IgnoreClientContentNegotiation
+    filter_backends = [filters.DjangoFilterBackend]
+    filterset_class = TransactionExportFilter
+
+    def get(self, request, export_format):
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = EXPORT_FORMATS[export_format].iter_chunks(queryset, settings.TRANSACTIONS_EXPORT_CHUNK_SIZE)
+        return self.export_response(chunks, export_format)
+
+    def export_response(self, chunks, export_format):
+        response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[export_format].content_type)
+        response.headers["Content-Disposition"] = f'attachment; filename="transactions.{export_format}"'
+        return response
+
+
+class FileImportFileView(generics.GenericAPIView):
+    """Base of the downloads of a file produced by an import of the requesting user."""
+    content_negotiation_class = IgnoreClientContentNegotiation
+    lookup_url_kwarg = 'import_request_id'
+
+    def get_queryset(self):
+        return FileImportRequest.objects.filter(requested_by=self.request.user)
+
+
+class FileImportRejectionsView(FileImportFileView):
+    """Downloads the rejected rows of an import as gzipped NDJSON (row, line and errors per row)."""
 
+    def get(self, request, import_request_id):
+        import_request = self.get_object()
+        if not import_request.rejections_file:
+            raise NotFound("The import has no rejected rows.")
+        return FileResponse(
+            import_request.rejections_file.open('rb'),
+            as_attachment=True,
+            filename=f'rejections-{import_request.id}.ndjson.gz',
+            content_type='application/gzip',
+        )
 
-class ReportCustomerSummaryView(generics.RetrieveAPIView):
+
+class FileImportProfileView(FileImportFileView):
+    """Downloads the cProfile profile of an import requested with `profile`, in the pstats format."""
+
+    def get(self, request, import_request_id):
+        import_request = self.get_object()
+        if not import_request.profile_file:
+            raise NotFound("The import has no profile.")
+        return FileResponse(
+            import_request.profile_file.open('rb'),
+            as_attachment=True,
+            filename=f'profile-{import_request.id}.prof',
+            content_type='application/octet-stream',
+        )
+
+
+class ReportSummariesView(generics.GenericAPIView):
+    """Returns the reports of many ids keyed by id, computing the uncached ones with grouped queries."""
+    serializer_class = ReportBatchSerializer
+    summary_serializer_class = None
+    report_kind = None
+
+    def get_summaries(self, ids, date_from, date_to):
+        raise NotImplementedError
+
+    def get_batch(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return (
+            serializer.validated_data["ids"],
+            serializer.validated_data["date_from"],
+            serializer.validated_data["date_to"],
+        )
+
+    def summaries_response(self, ids, summaries):
+        return Response({str(id_): self.summary_serializer_class(summaries[id_]).data for id_ in ids})
+
+    def post(self, request, *args, **kwargs):
+        ids, date_from, date_to = self.get_batch(request)
+        summaries = report_cache.get_or_compute_many(
+            self.report_kind, ids, date_from, date_to,
+            lambda missing: self.get_summaries(missing, date_from, date_to),
+        )
+        return self.summaries_response(ids, summaries)
+
+
+class ReportCustomerSummaryView(CachedReportMixin, generics.RetrieveAPIView):
     serializer_class = ReportCustomerSummarySerializer
     lookup_field = "customer_id"
-    filterset_class = RangeTransactionFilter
+    report_kind = report_cache.CUSTOMER
 
     def get_object(self):
-        return Transaction.objects.group_by_customer(self.kwargs["customer_id"])
+        return Transaction.objects.group_by_customer(self.kwargs["customer_id"], *self.date_range)
 
 
-class ReportProductSummaryView(generics.RetrieveAPIView):
+class ReportProductSummaryView(CachedReportMixin, generics.RetrieveAPIView):
     serializer_class = ReportProductSummarySerializer
     lookup_field = "product_id"
-    filterset_class = RangeTransactionFilter
+    report_kind = report_cache.PRODUCT
 
     def get_object(self):
-        return Transaction.objects.group_by_product(self.kwargs["product_id"])
+        return Transaction.objects.group_by_product(self.kwargs["product_id"], *self.date_range)
+
+
+class ReportCustomerSummariesView(ReportSummariesView):
+    summary_serializer_class = ReportCustomerSummarySerializer
+    report_kind = report_cache.CUSTOMER
+
+    def get_summaries(self, ids, date_from, date_to):
+        return Transaction.objects.group_by_customers(ids, date_from, date_to)
+
+
+class ReportProductSummariesView(ReportSummariesView):
+    summary_serializer_class = ReportProductSummarySerializer
+    report_kind = report_cache.PRODUCT
+
+    def get_summaries(self, ids, date_from, date_to):
+        return Transaction.objects.group_by_products(ids, date_from, date_to)
+
+
+class MetricsView(APIView):
+    """Request metrics of this server process in the Prometheus text format, for staff users."""
+    permission_classes = [IsAdminUser]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
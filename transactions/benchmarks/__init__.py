@@ -0,0 +1,21 @@
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@contextmanager
+def measure():
+    result = {'rss_before': peak_rss_bytes()}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - started
+        result['rss_after'] = peak_rss_bytes()
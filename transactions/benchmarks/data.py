@@ -0,0 +1,98 @@
+import csv
+import itertools
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from .. import rollups
+from ..choices import CurrencyChoices
+from ..models import Transaction
+from ..validators import RowValidator
+
+CSV_HEADER = [
+    'transaction_id',
+    'timestamp',
+    'amount',
+    'currency',
+    'customer_id',
+    'product_id',
+    'quantity',
+]
+
+# Dirty rows replace one column with one of these invalid values, or repeat the transaction_id
+# of an earlier row; the importer rejects each of them.
+DIRTY_VALUES = [
+    ('transaction_id', 'not-a-uuid'),
+    ('timestamp', '2024-02-30T10:00:00Z'),
+    ('amount', '-5.00'),
+    ('currency', 'XXX'),
+    ('customer_id', ''),
+    ('product_id', '12345'),
+    ('quantity', '0'),
+]
+
+
+def random_uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def chooser(rng, values, skew):
+    """Returns a function picking one of `values`, the k-th with a weight of 1 / k ** skew."""
+    if not skew:
+        return lambda: rng.choice(values)
+    cum_weights = list(itertools.accumulate(1 / rank ** skew for rank in range(1, len(values) + 1)))
+    return lambda: rng.choices(values, cum_weights=cum_weights)[0]
+
+
+def generate_rows(rows, customers=1000, products=1000, seed=0, start=None, max_interval=60, skew=0, dirty_ratio=0):
+    """
+    Yields CSV rows of random transactions. With `skew`, customer and product ids follow a
+    Zipf-like distribution of that exponent, so a few ids have most of the transactions;
+    `dirty_ratio` of the rows are made invalid as in DIRTY_VALUES.
+    """
+    rng = random.Random(seed)
+    customer_ids = [random_uuid(rng) for _ in range(customers)]
+    product_ids = [random_uuid(rng) for _ in range(products)]
+    choose_customer = chooser(rng, customer_ids, skew)
+    choose_product = chooser(rng, product_ids, skew)
+    currencies = list(CurrencyChoices.values)
+    timestamp = start or datetime(2024, 1, 1, tzinfo=timezone.utc)
+    previous_id = None
+
+    for _ in range(rows):
+        timestamp += timedelta(seconds=rng.randint(1, max_interval))
+        row = [
+            str(random_uuid(rng)),
+            timestamp.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            f'{rng.randint(1, 1000000) / 100:.2f}',
+            rng.choice(currencies),
+            str(choose_customer()),
+            str(choose_product()),
+            str(rng.randint(1, 10)),
+        ]
+        if dirty_ratio and rng.random() < dirty_ratio:
+            kind = rng.randrange(len(DIRTY_VALUES) + 1)
+            if kind < len(DIRTY_VALUES) or previous_id is None:
+                column, value = DIRTY_VALUES[kind % len(DIRTY_VALUES)]
+                row[CSV_HEADER.index(column)] = value
+            else:
+                row[0] = previous_id
+        else:
+            previous_id = row[0]
+        yield row
+
+
+def write_transactions_csv(fileobj, rows, **kwargs):
+    writer = csv.writer(fileobj, lineterminator='\n')
+    writer.writerow(CSV_HEADER)
+    writer.writerows(generate_rows(rows, **kwargs))
+
+
+def load_transactions(rows, batch_size=5000, **kwargs):
+    """Inserts generated (clean) transactions with bulk_create and rebuilds the rollups from them."""
+    validator = RowValidator()
+    for chunk in rollups.chunked(generate_rows(rows, **kwargs), batch_size):
+        Transaction.objects.bulk_create([
+            Transaction(**validator.validate(dict(zip(CSV_HEADER, values)))[0]) for values in chunk
+        ])
+    rollups.rebuild(batch_size=batch_size)
@@ -0,0 +1,91 @@
+import asyncio
+import itertools
+import statistics
+import time
+
+
+class LoadResult:
+    def __init__(self, duration):
+        self.duration = duration
+        self.latencies = []
+        self.errors = 0
+
+    @property
+    def throughput(self):
+        return len(self.latencies) / self.duration
+
+    def percentile(self, percent):
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0.0
+        return statistics.quantiles(self.latencies, n=100, method='inclusive')[percent - 1]
+
+
+def build_request(host, port, path, headers):
+    lines = [f'GET {path} HTTP/1.1', f'Host: {host}:{port}', *(f'{name}: {value}' for name, value in headers.items())]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+
+async def read_response(reader):
+    """Reads one response with a Content-Length body, returning its status and whether the server closes."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by the server.")
+    status = int(status_line.split()[1])
+    length, close = None, False
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.partition(b':')
+        name = name.strip().lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection':
+            close = value.strip().lower() == b'close'
+    if length is None:
+        raise ConnectionError("Response without Content-Length.")
+    await reader.readexactly(length)
+    return status, close
+
+
+async def client(host, port, requests, deadline, result):
+    """Sends `requests` in turn over one keep-alive connection until `deadline`, reconnecting after errors."""
+    reader = writer = None
+    try:
+        for request in requests:
+            if time.perf_counter() >= deadline:
+                return
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                started = time.perf_counter()
+                writer.write(request)
+                status, close = await read_response(reader)
+                elapsed = time.perf_counter() - started
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                result.errors += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+            if 200 <= status < 300:
+                result.latencies.append(elapsed)
+            else:
+                result.errors += 1
+            if close:
+                writer.close()
+                reader = writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def run_load(host, port, requests, concurrency, duration):
+    """
+    Keeps `concurrency` connections busy with GET `requests` (encoded by `build_request`) for
+    `duration` seconds; each connection starts at a different request of the list.
+    """
+    result = LoadResult(duration)
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        client(host, port, itertools.islice(itertools.cycle(requests), index, None), deadline, result)
+        for index in range(concurrency)
+    ))
+    return result
@@ -0,0 +1,176 @@
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.core.files import File
+from django.db import connection
+from django.db.models import Max, Min
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import measure
+from .. import report_cache
+from ..api.views import (
+    ReportCustomerSummaryView,
+    ReportProductSummaryView,
+    TransactionCursorPagination,
+    TransactionViewSet,
+)
+from ..importers import CSVImporter
+from ..models import FileImportRequest, Transaction
+
+SCENARIOS = ('import', 'list', 'reports')
+
+
+def higher_is_better(metric):
+    # Throughputs end in _per_second, every other metric is a latency in milliseconds or a memory size.
+    return metric.endswith('_per_second')
+
+
+def median_ms(seconds):
+    return statistics.median(seconds) * 1000
+
+
+def cursor_at(offset):
+    """Returns the cursor a client reaches after following next links past `offset` rows."""
+    previous_row = Transaction.objects.order_by('-timestamp', '-id')[offset - 1]
+    paginator = TransactionCursorPagination()
+    paginator.base_url = ''
+    link = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=paginator.get_position(previous_row)))
+    return parse_qs(urlparse(link).query)['cursor'][0]
+
+
+def time_view(view, user, requests):
+    """Returns the seconds taken by each (path, params, kwargs) request to `view`."""
+    factory = APIRequestFactory()
+    seconds = []
+    for path, params, kwargs in requests:
+        request = factory.get(path, params)
+        force_authenticate(request, user)
+        started = time.perf_counter()
+        response = view(request, **kwargs)
+        response.render()
+        seconds.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.data
+    return seconds
+
+
+def run_import(path, user, batch_size=None, engine=None):
+    """
+    Imports the CSV file at `path`, returning the rows read (inserted or rejected) per second,
+    the peak RSS of the process once imported, in MiB, and the request.
+    """
+    with open(path, 'rb') as fileobj:
+        import_request = FileImportRequest.objects.create(
+            requested_by=user,
+            file=File(fileobj, name=os.path.basename(path)),
+        )
+    with measure() as result:
+        with CSVImporter(import_request.id, batch_size=batch_size, engine=engine) as csv_importer:
+            csv_importer.import_file()
+    import_request.refresh_from_db()
+    rows = import_request.rows_inserted + import_request.rows_rejected
+    return {
+        'import_rows_per_second': rows / result['seconds'],
+        'import_peak_rss_mib': result['rss_after'] / 2 ** 20,
+    }, import_request
+
+
+def run_list(user, depths, page_size, repeat):
+    """Page latency at each depth for page number and keyset (cursor) pagination."""
+    view = TransactionViewSet.as_view({'get': 'list'})
+    rows = Transaction.objects.count()
+    metrics = {}
+    for depth in depths:
+        offset = (depth - 1) * page_size
+        if offset >= rows:
+            break
+        page_number = [('/', {'page': depth, 'page_size': page_size}, {})] * repeat
+        metrics[f'list_page_{depth}_ms'] = median_ms(time_view(view, user, page_number))
+
+        params = {'pagination': 'cursor', 'page_size': page_size}
+        if offset:
+            params['cursor'] = cursor_at(offset)
+        metrics[f'list_cursor_{depth}_ms'] = median_ms(time_view(view, user, [('/', params, {})] * repeat))
+    return metrics
+
+
+def run_reports(user, samples, seed):
+    """
+    Report latency per id over all time and over random ranges of up to 90 days with edges
+    inside days. Each sampled id is requested once with the report cache cleared, so every
+    request computes its report.
+    """
+    rng = random.Random(seed)
+    bounds = Transaction.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+    span = (bounds['last'] - bounds['first']).total_seconds()
+    metrics = {}
+    for kind, view_class, field in (
+        (report_cache.CUSTOMER, ReportCustomerSummaryView, 'customer_id'),
+        (report_cache.PRODUCT, ReportProductSummaryView, 'product_id'),
+    ):
+        view = view_class.as_view()
+        ids = sorted(Transaction.objects.order_by().values_list(field, flat=True).distinct())
+        sample = rng.sample(ids, min(samples, len(ids)))
+        ranges = []
+        for _ in sample:
+            date_from = bounds['first'] + timedelta(seconds=rng.uniform(0, span))
+            date_to = date_from + timedelta(seconds=rng.uniform(0, timedelta(days=90).total_seconds()))
+            ranges.append({'date_from': date_from.isoformat(), 'date_to': date_to.isoformat()})
+
+        report_cache.clear()
+        metrics[f'report_{kind}_ms'] = median_ms(time_view(view, user, [
+            ('/', {}, {field: id_}) for id_ in sample
+        ]))
+        metrics[f'report_{kind}_range_ms'] = median_ms(time_view(view, user, [
+            ('/', date_range, {field: id_}) for id_, date_range in zip(sample, ranges)
+        ]))
+    return metrics
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'database': connection.vendor,
+    }
+
+
+def load_baseline(path):
+    with open(path) as fileobj:
+        return json.load(fileobj)
+
+
+def save_baseline(path, parameters, metrics, threshold):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as fileobj:
+        json.dump({
+            'parameters': parameters,
+            'environment': environment(),
+            'threshold': threshold,
+            'metrics': metrics,
+        }, fileobj, indent=2, sort_keys=True)
+        fileobj.write('\n')
+
+
+def compare(baseline, metrics, threshold):
+    """
+    Returns a (metric, baseline value, value, relative change, regressed) row per metric; a
+    metric regresses when it is worse than its baseline by more than `threshold`.
+    """
+    rows = []
+    for metric, value in metrics.items():
+        base = baseline.get(metric)
+        if not base:
+            rows.append((metric, None, value, None, False))
+            continue
+        change = (value - base) / base
+        regressed = change < -threshold if higher_is_better(metric) else change > threshold
+        rows.append((metric, base, value, change, regressed))
+    return rows
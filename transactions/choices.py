@@ -5,3 +5,14 @@ class CurrencyChoices(models.TextChoices):
     PLN = "PLN", "PLN"
     EUR = "EUR", "EUR"
     USD = "USD", "USD"
+
+
+class DuplicatePolicyChoices(models.TextChoices):
+    SKIP = "skip", "Skip"
+    OVERWRITE = "overwrite", "Overwrite"
+    REJECT = "reject", "Reject row"
+
+
+class PeriodChoices(models.TextChoices):
+    DAY = "day", "Day"
+    MONTH = "month", "Month"
@@ -0,0 +1,291 @@
+import csv
+import uuid
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .rates import BASE_CURRENCY
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BLANK_LINES = frozenset(['', '\n', '\r\n'])
+UUID_HYPHENS = [8, 13, 18, 23]
+UUID_DIGITS = [index for index in range(36) if index not in UUID_HYPHENS]
+TIMESTAMP_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+TIMESTAMP_SEPARATORS = {4: '-', 7: '-', 10: 'T', 13: ':', 16: ':', 19: 'Z'}
+MICRO = 10 ** 6
+
+
+def as_codes(values, width):
+    """Returns the code points of `values` as an (n, width) array, zero padded; longer values are cut."""
+    return np.array(values, dtype=f'U{width}').view(np.uint32).reshape(len(values), width)
+
+
+def char_table(characters):
+    table = np.zeros(128, dtype=bool)
+    table[[ord(character) for character in characters]] = True
+    return table
+
+
+def lookup(table, codes):
+    return table[np.minimum(codes, 127)]
+
+
+def digits_value(codes, exponents, mask):
+    """Sums the digits of each row times ten to the power of their exponents, where `mask` is set."""
+    weights = np.where(mask, 10 ** np.clip(exponents, 0, 18), 0)
+    return ((codes.astype(np.int64) - 48) * weights).sum(axis=1)
+
+
+class ColumnarValidator:
+    """
+    Validates chunks of CSV lines column-wise with NumPy. Rows in the canonical
+    import format (unquoted, hyphenated UUIDs, `YYYY-MM-DDTHH:MM:SSZ` timestamps,
+    plain decimal amounts and integer quantities) are checked and converted a whole
+    column at a time; every other row is validated by the `fallback` RowValidator
+    one by one, so accepted rows, values and errors are the serializer's. Chunks
+    are parsed on their own, so like sharded imports a quoted field must not span lines.
+    """
+    hex_digits = char_table('0123456789abcdefABCDEF')
+    decimal_chars = char_table('0123456789.')
+
+    def __init__(self, fallback, rate_table):
+        if np is None:
+            raise ImproperlyConfigured(
+                "The columnar import engine requires NumPy, install requirements/columnar.txt."
+            )
+        self.fallback = fallback
+        self.rate_table = rate_table
+        fields = fallback.serializer.fields
+        self.names = ['transaction_id', 'timestamp', 'amount', 'currency', 'customer_id', 'product_id', 'quantity']
+        # Columns the fast path does not convert itself, like amount_in_pln, send their chunks to the fallback.
+        self.writable_names = {name for name, field in fields.items() if not field.read_only}
+        self.enabled = not fallback.run_serializer_validators and all(name in fields for name in self.names)
+        if not self.enabled:
+            return
+
+        timestamp = fields['timestamp']
+        self.timezone = timestamp.timezone if hasattr(timestamp, 'timezone') else timestamp.default_timezone()
+        amount = fields['amount']
+        self.amount_places = amount.decimal_places
+        self.amount_whole_digits = amount.max_whole_digits
+        self.amount_min = amount.min_value
+        self.amount_max = amount.max_value
+        quantity = fields['quantity']
+        self.quantity_min = quantity.min_value
+        self.quantity_max = quantity.max_value
+        self.currencies = fields['currency'].choice_strings_to_values
+        self.rates = {
+            currency: (np.array(dates, dtype='datetime64[D]'), [int(rate * MICRO) for rate in rates])
+            for currency, dates, rates in (
+                (currency, rate_table.dates[currency], rate_table.rates[currency]) for currency in rate_table.dates
+            )
+            if currency != BASE_CURRENCY and all(rate * MICRO == int(rate * MICRO) for rate in rates)
+        }
+        rate_timezone = getattr(rate_table.tz, 'key', str(rate_table.tz))
+        self.utc_days = rate_timezone in ('UTC', 'Etc/UTC')
+
+    def validate_chunk(self, lines, fieldnames):
+        """Returns `(line, validated_data, errors)` for each row of `lines`, in file order."""
+        text = ''.join(lines)
+        if (
+            not self.enabled
+            or '"' in text
+            or '\r' in text.replace('\r\n', '')
+            or not set(self.names) <= set(fieldnames)
+            or (set(fieldnames) & self.writable_names) - set(self.names)
+        ):
+            return self.validate_rows(lines, fieldnames)
+
+        lines = [line for line in lines if line not in BLANK_LINES]
+        rows = [line.rstrip('\r\n').split(',') for line in lines]
+        width = len(fieldnames)
+        fast = [index for index, row in enumerate(rows) if len(row) == width]
+        results = [None] * len(rows)
+        if fast:
+            columns = dict(zip(fieldnames, zip(*(rows[index] for index in fast))))
+            converted, valid = self.convert_columns(columns)
+            for position, index in enumerate(fast):
+                if valid[position]:
+                    results[index] = (lines[index], converted[position], None)
+
+        for index, row in enumerate(rows):
+            if results[index] is None:
+                results[index] = (lines[index], *self.fallback.validate(self.as_dict(row, fieldnames)))
+        return results
+
+    def validate_rows(self, lines, fieldnames):
+        reader = csv.DictReader(lines, fieldnames=fieldnames)
+        return [(lines[reader.line_num - 1], *self.fallback.validate(row)) for row in reader]
+
+    def as_dict(self, row, fieldnames):
+        # The same dict csv.DictReader builds from a row of another length.
+        data = dict(zip(fieldnames, row))
+        if len(row) > len(fieldnames):
+            data[None] = row[len(fieldnames):]
+        for name in fieldnames[len(row):]:
+            data[name] = None
+        return data
+
+    def convert_columns(self, columns):
+        """Returns the validated data of each row and a mask of the rows the fast path accepted."""
+        valid = np.ones(len(columns['amount']), dtype=bool)
+        uuid_columns = {}
+        for name in ('transaction_id', 'customer_id', 'product_id'):
+            valid &= self.uuid_mask(columns[name])
+        epoch_seconds, timestamp_valid = self.parse_timestamps(columns['timestamp'])
+        valid &= timestamp_valid
+        cents, amount_valid = self.parse_amounts(columns['amount'])
+        valid &= amount_valid
+        quantities, quantity_valid = self.parse_quantities(columns['quantity'])
+        valid &= quantity_valid
+        currencies = np.array(columns['currency'], dtype=object)
+        valid &= np.isin(currencies, list(self.currencies))
+        pln_cents, rate_valid = self.convert_to_pln(currencies, cents, epoch_seconds, valid)
+        valid &= rate_valid
+
+        for name in ('transaction_id', 'customer_id', 'product_id'):
+            # Customers and products repeat within a chunk, so each distinct id is parsed once.
+            values = np.array(columns[name], dtype=object)[valid].tolist()
+            parsed = {value: uuid.UUID(value) for value in set(values)}
+            uuid_columns[name] = [parsed.get(value) for value in columns[name]]
+        timestamps = [
+            moment.replace(tzinfo=dt_timezone.utc).astimezone(self.timezone)
+            for moment in epoch_seconds.astype('datetime64[s]').tolist()
+        ]
+        converted = [
+            {
+                'id': transaction_id,
+                'timestamp': timestamp,
+                'amount': Decimal(cent).scaleb(-self.amount_places),
+                'currency': self.currencies[currency],
+                'customer_id': customer_id,
+                'product_id': product_id,
+                'quantity': quantity,
+                'amount_in_pln': Decimal(pln_cent).scaleb(-2),
+            } if is_valid else None
+            for is_valid, transaction_id, timestamp, cent, currency, customer_id, product_id, quantity, pln_cent in zip(
+                valid.tolist(),
+                uuid_columns['transaction_id'],
+                timestamps,
+                cents.tolist(),
+                currencies.tolist(),
+                uuid_columns['customer_id'],
+                uuid_columns['product_id'],
+                quantities.tolist(),
+                pln_cents.tolist(),
+            )
+        ]
+        return converted, valid.tolist()
+
+    def uuid_mask(self, values):
+        codes = as_codes(values, 37)
+        return (
+            (codes[:, 36] == 0)
+            & (codes[:, UUID_HYPHENS] == ord('-')).all(axis=1)
+            & lookup(self.hex_digits, codes[:, UUID_DIGITS]).all(axis=1)
+        )
+
+    def parse_timestamps(self, values):
+        codes = as_codes(values, 21)
+        valid = codes[:, 20] == 0
+        for index, separator in TIMESTAMP_SEPARATORS.items():
+            valid &= codes[:, index] == ord(separator)
+        digits = codes[:, TIMESTAMP_DIGITS].astype(np.int64) - 48
+        valid &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+        digits = np.where(valid[:, None], digits, 0)
+        year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+        month = digits[:, 4] * 10 + digits[:, 5]
+        day = digits[:, 6] * 10 + digits[:, 7]
+        hour = digits[:, 8] * 10 + digits[:, 9]
+        minute = digits[:, 10] * 10 + digits[:, 11]
+        second = digits[:, 12] * 10 + digits[:, 13]
+        # Years at the ends of the datetime range may overflow when converted to the field time zone.
+        valid &= (year > 1) & (year < 9999) & (month >= 1) & (month <= 12)
+        month = np.where(valid, month, 1)
+        year = np.where(valid, year, 1970)
+        first_days = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1)
+        days_in_month = ((first_days + 1).astype('datetime64[D]') - first_days.astype('datetime64[D]')).astype(np.int64)
+        valid &= (day >= 1) & (day <= days_in_month) & (hour <= 23) & (minute <= 59) & (second <= 59)
+        day = np.where(valid, day, 1)
+        epoch_days = (first_days.astype('datetime64[D]') + (day - 1)).astype(np.int64)
+        return epoch_days * 86400 + hour * 3600 + minute * 60 + second, valid
+
+    def parse_amounts(self, values):
+        width = self.amount_whole_digits + self.amount_places + 2
+        codes = as_codes(values, width)
+        filled = codes != 0
+        lengths = filled.sum(axis=1)
+        is_dot = codes == ord('.')
+        dots = is_dot.sum(axis=1)
+        dot_at = np.where(dots > 0, is_dot.argmax(axis=1), lengths)
+        places = np.where(dots > 0, lengths - dot_at - 1, 0)
+        valid = (
+            (codes[:, -1] == 0)
+            & (lengths > 0)
+            & (lookup(self.decimal_chars, codes) | ~filled).all(axis=1)
+            & (dots <= 1)
+            & (codes[:, 0] != ord('.'))
+            & (dot_at <= self.amount_whole_digits)
+            & ((dots == 0) | ((places >= 1) & (places <= self.amount_places)))
+        )
+        # Counting in units of the last decimal place turns every amount into an integer.
+        positions = np.arange(width)
+        exponents = np.where(
+            positions < dot_at[:, None], dot_at[:, None] - 1 - positions, dot_at[:, None] - positions,
+        ) + self.amount_places
+        cents = digits_value(codes, exponents, filled & ~is_dot & valid[:, None])
+        if self.amount_min is not None:
+            valid &= cents >= self.amount_min * 10 ** self.amount_places
+        if self.amount_max is not None:
+            valid &= cents <= self.amount_max * 10 ** self.amount_places
+        return np.where(valid, cents, 0), valid
+
+    def parse_quantities(self, values):
+        codes = as_codes(values, 19)
+        is_digit = (codes >= 48) & (codes <= 57)
+        valid = (codes[:, -1] == 0) & (codes[:, 0] != 0) & (is_digit | (codes == 0)).all(axis=1)
+        lengths = is_digit.sum(axis=1)
+        quantities = digits_value(codes, lengths[:, None] - 1 - np.arange(codes.shape[1]), is_digit & valid[:, None])
+        if self.quantity_min is not None:
+            valid &= quantities >= self.quantity_min
+        if self.quantity_max is not None:
+            valid &= quantities <= self.quantity_max
+        return quantities, valid
+
+    def convert_to_pln(self, currencies, cents, epoch_seconds, valid):
+        """
+        Multiplies the amounts by the rate effective on their day in integer micro-units,
+        rounding half up like `rates.to_pln`. Rows without a rate, or whose currency has
+        rates with more than six places, are left to the fallback.
+        """
+        pln_cents = np.zeros(len(cents), dtype=np.int64)
+        converted = np.zeros(len(cents), dtype=bool)
+        if self.utc_days:
+            days = (epoch_seconds // 86400).astype('datetime64[D]')
+        else:
+            days = np.array([
+                self.rate_table.day(moment.replace(tzinfo=dt_timezone.utc)) if is_valid else moment.date()
+                for moment, is_valid in zip(epoch_seconds.astype('datetime64[s]').tolist(), valid.tolist())
+            ], dtype='datetime64[D]')
+        scale = 10 ** self.amount_places
+        for currency, (dates, rates) in self.rates.items():
+            rows = valid & (currencies == currency)
+            if not rows.any():
+                continue
+            indexes = np.searchsorted(dates, days[rows], side='right') - 1
+            has_rate = indexes >= 0
+            micro_rates = np.array(rates, dtype=object)[np.maximum(indexes, 0)]
+            products = cents[rows].astype(object) * micro_rates
+            # Half up to cents, the amounts being non-negative.
+            values = (products * 100 + scale * MICRO // 2) // (scale * MICRO)
+            pln_cents[rows] = np.where(has_rate, values, 0).astype(np.int64)
+            converted[rows] = has_rate
+        base = valid & (currencies == BASE_CURRENCY)
+        pln_cents[base] = cents[base] * 100 // scale
+        converted |= base
+        return pln_cents, converted
@@ -0,0 +1,39 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def report_cache(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        settings.TRANSACTIONS_REPORT_CACHE: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reports',
+        },
+    }
+    cache = caches[settings.TRANSACTIONS_REPORT_CACHE]
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    # Uploaded files and import artifacts are written under a per-test directory.
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture(autouse=True)
+def metrics_cache(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        settings.TRANSACTIONS_METRICS_CACHE: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'metrics',
+        },
+    }
+    cache = caches[settings.TRANSACTIONS_METRICS_CACHE]
+    cache.clear()
+    yield cache
+    cache.clear()
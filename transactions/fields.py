@@ -0,0 +1,63 @@
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import models
+
+
+def compact_storage(connection):
+    """
+    Whether UUIDs and amounts are stored compactly on `connection`: only SQLite has neither
+    a UUID nor a decimal type, so TRANSACTIONS_COMPACT_STORAGE has no effect elsewhere.
+    """
+    return settings.TRANSACTIONS_COMPACT_STORAGE and connection.vendor == 'sqlite'
+
+
+class CompactUUIDField(models.UUIDField):
+    """UUIDField stored as 16 bytes instead of 32 hex characters with TRANSACTIONS_COMPACT_STORAGE."""
+
+    def get_internal_type(self):
+        # Keeps the backend's hex converter from running on the bytes.
+        return 'CompactUUIDField' if settings.TRANSACTIONS_COMPACT_STORAGE else super().get_internal_type()
+
+    def db_type(self, connection):
+        # SQLite stores a BLOB in any column, so the column keeps its declared type.
+        return connection.data_types['UUIDField']
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None or not compact_storage(connection):
+            return super().get_db_prep_value(value, connection, prepared)
+        return self.to_python(value).bytes
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, bytes):
+            return uuid.UUID(bytes=value)
+        if isinstance(value, str):
+            return uuid.UUID(value)
+        return value
+
+
+class AmountField(models.DecimalField):
+    """
+    DecimalField stored as an integer number of minor units (grosze, cents) with
+    TRANSACTIONS_COMPACT_STORAGE, rounded half away from zero to `decimal_places`.
+    Sums of such columns are exact integers; aggregates read back through an
+    AmountField output field are converted to decimals like the column.
+    """
+
+    def get_internal_type(self):
+        # Keeps SQLite from casting expressions to NUMERIC and converting integers as decimals.
+        return 'AmountField' if settings.TRANSACTIONS_COMPACT_STORAGE else super().get_internal_type()
+
+    def db_type(self, connection):
+        return connection.data_types['DecimalField'] % self.db_type_parameters(connection)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None or hasattr(value, 'as_sql') or not compact_storage(connection):
+            return super().get_db_prep_value(value, connection, prepared)
+        return int(self.to_python(value).scaleb(self.decimal_places).quantize(1, rounding=ROUND_HALF_UP))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or not compact_storage(connection):
+            return value
+        return Decimal(round(value)).scaleb(-self.decimal_places)
@@ -0,0 +1,146 @@
+"""
+Phase timings and counters of CSV imports, and their optional cProfile profiles. Both are kept
+per checkpoint, so resumed and sharded imports add up, and totalled on the request once it
+completes.
+"""
+import os
+import pstats
+import tempfile
+import time
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+PHASES = ('read', 'parse', 'validate', 'lookup', 'insert', 'rollups', 'commit')
+# Writing a batch: the duplicate lookup, the insert and the rollup updates, followed by the
+# commit with the checkpoint.
+DB_PHASES = ('lookup', 'insert', 'rollups')
+BATCH_DB_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKET_NAMES = [str(bound) for bound in BATCH_DB_BUCKETS] + ['+Inf']
+# Totalled on the request from the counters of its checkpoints.
+CHECKPOINT_COUNTERS = ('rows_read', 'rows_inserted', 'rows_updated', 'rows_skipped', 'rows_rejected')
+
+
+class ImportStats:
+    """
+    Seconds spent per phase of one range of an import, the number of valid rows and the
+    batches written with a histogram of their database time up to the commit. Reading lines and validating rows
+    are timed as they happen; parsing is the rest of the time spent producing batches, which
+    the columnar engine spends chunking lines as it parses them while validating.
+    """
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.rows_validated = data.get('rows_validated', 0)
+        self.batches = data.get('batches', 0)
+        self.seconds = {phase: data.get('seconds', {}).get(phase, 0) for phase in PHASES}
+        self.batch_db_seconds = {name: data.get('batch_db_seconds', {}).get(name, 0) for name in BUCKET_NAMES}
+        self.charged = self.seconds['read'] + self.seconds['validate']
+
+    def charge_production(self, seconds):
+        """Charges to parsing the part of `seconds` producing a batch not spent reading or validating."""
+        charged = self.seconds['read'] + self.seconds['validate']
+        self.seconds['parse'] += max(seconds - (charged - self.charged), 0)
+        self.charged = charged
+
+    def add_batch(self, phases):
+        """Adds a batch written in the laps of a PhaseClock, before its commit."""
+        self.batches += 1
+        for phase, seconds in phases.items():
+            self.seconds[phase] += seconds
+        db_seconds = sum(phases.values())
+        for bound, name in zip(BATCH_DB_BUCKETS, BUCKET_NAMES):
+            if db_seconds <= bound:
+                break
+        else:
+            name = '+Inf'
+        self.batch_db_seconds[name] += 1
+
+    def as_dict(self):
+        return {
+            'rows_validated': self.rows_validated,
+            'batches': self.batches,
+            'seconds': {phase: round(seconds, 6) for phase, seconds in self.seconds.items()},
+            'batch_db_seconds': dict(self.batch_db_seconds),
+        }
+
+
+class PhaseClock:
+    """Splits the time since it started between the phases named by `lap`."""
+
+    def __init__(self):
+        self.phases = {}
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last
+        self.last = now
+
+
+def total(stats_list):
+    result = ImportStats()
+    for data in stats_list:
+        stats = ImportStats(data)
+        result.rows_validated += stats.rows_validated
+        result.batches += stats.batches
+        for phase in PHASES:
+            result.seconds[phase] += stats.seconds[phase]
+        for name in BUCKET_NAMES:
+            result.batch_db_seconds[name] += stats.batch_db_seconds[name]
+    return result.as_dict()
+
+
+def complete_stats(import_request):
+    """
+    Totals the stats and counters of every range on the request, including the ranges
+    of earlier attempts.
+    """
+    checkpoints = list(import_request.checkpoints.all())
+    stats = total(checkpoint.stats for checkpoint in checkpoints)
+    stats['bytes_read'] = sum(checkpoint.offset - checkpoint.start for checkpoint in checkpoints)
+    for counter in CHECKPOINT_COUNTERS:
+        stats[counter] = sum(getattr(checkpoint, counter) for checkpoint in checkpoints)
+    import_request.stats = stats
+
+
+def describe(stats):
+    """Summarizes the seconds per phase of request `stats` for the completion log, e.g. `read 0.12 s, ...`."""
+    return ', '.join(f"{phase} {stats.get('seconds', {}).get(phase, 0):.2f} s" for phase in PHASES)
+
+
+def profile_part_name(import_request_id, start, offset):
+    return f'import_profiles/parts/{import_request_id}/{start}-{offset}.prof'
+
+
+def save_profile(checkpoint, profiler):
+    """Saves the profile of an attempt at the checkpoint's range, merged into the request's artifact on completion."""
+    name = profile_part_name(checkpoint.import_request_id, checkpoint.start, checkpoint.offset)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    with tempfile.NamedTemporaryFile(suffix='.prof') as part:
+        pstats.Stats(profiler).dump_stats(part.name)
+        checkpoint.profile_parts = [*checkpoint.profile_parts, default_storage.save(name, File(part))]
+    checkpoint.save(update_fields=['profile_parts'])
+
+
+def complete_profile(import_request):
+    """Merges the profile parts of every range into the request's pstats artifact."""
+    checkpoints = list(import_request.checkpoints.order_by('start'))
+    parts = [name for checkpoint in checkpoints for name in checkpoint.profile_parts]
+    if not parts:
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for index, name in enumerate(parts):
+            paths.append(os.path.join(directory, f'{index}.prof'))
+            with default_storage.open(name, 'rb') as part, open(paths[-1], 'wb') as copy:
+                copy.write(part.read())
+        merged = os.path.join(directory, 'merged.prof')
+        pstats.Stats(*paths).dump_stats(merged)
+        with open(merged, 'rb') as artifact:
+            import_request.profile_file.save(f'{import_request.id}.prof', File(artifact), save=False)
+    import_request.checkpoints.update(profile_parts=[])
+    for name in parts:
+        default_storage.delete(name)
@@ -1,61 +1,89 @@
+import cProfile
 import csv
-import io
 import logging
-from decimal import Decimal
+import time
 
 from celery import states
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 
-from rest_framework import serializers
-
-from .consts import EXCHANGE_RATES
-from .models import FileImportRequest, Transaction
+from . import import_stats, metrics, rollups
+from .choices import DuplicatePolicyChoices
+from .columnar import ColumnarValidator
+from .loaders import get_loader
+from .models import FileImportRequest, ImportCheckpoint, Transaction
+from .rates import RateTable
+from .rejections import DUPLICATE_ERRORS, RejectionSink, complete_rejections
+from .validators import RowValidator
 
 logger = logging.getLogger(__name__)
 
+ROWS_ENGINE = 'rows'
+COLUMNAR_ENGINE = 'columnar'
+ROW_COUNTERS = ('rows_inserted', 'rows_updated', 'rows_skipped', 'rows_rejected')
+OVERWRITE_FIELDS = [
+    'timestamp',
+    'amount',
+    'amount_in_pln',
+    'currency',
+    'customer_id',
+    'product_id',
+    'quantity',
+]
 
-class ImportTransactionSerializer(serializers.ModelSerializer):
-    amount_in_pln = serializers.DecimalField(
-        max_digits=10,
-        decimal_places=2,
-        required=False,
-        read_only=False
-    )
-
-    transaction_id = serializers.UUIDField(required=True, source='id')
-
-    class Meta:
-        model = Transaction
-        fields = [
-            'transaction_id',
-            'timestamp',
-            'amount',
-            'amount_in_pln',
-            'currency',
-            'customer_id',
-            'product_id',
-            'quantity',
-        ]
 
-    def validate(self, data):
-        data['amount_in_pln'] = self.get_amount_in_pln(data['currency'], data['amount'])
-        return data
-
-    def get_amount_in_pln(self, currency, amount):
-        if currency not in EXCHANGE_RATES:
-            logger.warning('Currency "%s" no exchange rate', currency)
-        return amount * EXCHANGE_RATES.get(currency, Decimal("1.0"))
+def split_into_ranges(fileobj, size, count):
+    """
+    Splits the rows following the CSV header into at most `count` byte ranges,
+    each starting at the beginning of a line. Quoted fields spanning lines are
+    not supported, which the import format never produces.
+    """
+    fileobj.seek(0)
+    header_end = len(fileobj.readline())
+    boundaries = [header_end]
+    for index in range(1, count):
+        target = header_end + (size - header_end) * index // count
+        # Reading the rest of the line from one byte before the target lands on a line start.
+        fileobj.seek(max(target, boundaries[-1]) - 1)
+        fileobj.readline()
+        boundaries.append(min(fileobj.tell(), size))
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
 
 
 class CSVImporter:
-    def __init__(self, import_request_id):
+    validator_class = RowValidator
+
+    def __init__(self, import_request_id, batch_size=None, engine=None):
         self.import_request_id = import_request_id
+        self.batch_size = batch_size or settings.TRANSACTIONS_IMPORT_BATCH_SIZE
+        self.engine = engine or settings.TRANSACTIONS_IMPORT_ENGINE
+        self.loader = get_loader()
+        self.rows_inserted = 0
+        self.rows_updated = 0
+        self.rows_skipped = 0
+        self.rows_rejected = 0
+        self.rows_read = 0
+        self.position = 0
+        self.line = ''
+        self.checkpoint = None
+        self.rejections = None
+        self.stats = import_stats.ImportStats()
+        self.deferred = False
 
     def __enter__(self):
         self.import_request = FileImportRequest.objects.get(pk=self.import_request_id)
         return self
 
+    def mark_started(self):
+        """Marks the request STARTED, clearing the failure of an earlier attempt."""
+        self.import_request.status = states.STARTED
+        self.import_request.exception_meta = {}
+        if self.import_request.started_at is None:
+            self.import_request.started_at = timezone.now()
+        self.import_request.save(update_fields=['status', 'exception_meta', 'started_at'])
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type:
             self.import_request.status = states.FAILURE
@@ -63,24 +91,297 @@ class CSVImporter:
                 'exception_type': str(exc_type),
                 'exception_value': str(exc_val),
             }
+        elif self.deferred:
+            # The counters and completion are written by `complete_sharded_import`.
+            self.import_request.status = states.STARTED
+            self.import_request.save(update_fields=['status'])
+            return True
         else:
             self.import_request.status = states.SUCCESS
-        self.import_request.completed_at = timezone.now()
+        for counter in ROW_COUNTERS:
+            setattr(self.import_request, counter, getattr(self, counter))
+        complete_import(self.import_request)
         self.import_request.save()
         return True
 
+    def get_shards(self):
+        file = self.import_request.file
+        count = min(
+            settings.TRANSACTIONS_IMPORT_MAX_SHARDS,
+            -(-file.size // settings.TRANSACTIONS_IMPORT_SHARD_SIZE),
+        )
+        if count <= 1:
+            return [(0, None)]
+        with file.open('rb') as raw_file:
+            return split_into_ranges(raw_file, file.size, count)
+
+    def defer(self, shards):
+        """
+        Leaves the request STARTED, to be completed by `complete_sharded_import`, and creates
+        the checkpoints of its `shards` so a redelivered task does not split it again.
+        """
+        for start, end in shards:
+            ImportCheckpoint.objects.get_or_create(
+                import_request=self.import_request,
+                start=start,
+                defaults={'end': end, 'offset': start},
+            )
+        self.deferred = True
+
     def import_file(self):
-        file_content = self.import_request.file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(file_content))
+        self.import_range(0, None)
+
+    def import_range(self, start, end):
+        """
+        Imports the rows between the `start` and `end` byte offsets, resuming after the
+        last batch committed by an earlier attempt at the same range. With `profile` set
+        on the request, the attempt runs under cProfile.
+        """
+        if not self.import_request.profile:
+            return self.import_rows(start, end)
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(self.import_rows, start, end)
+        finally:
+            if self.checkpoint is not None:
+                import_stats.save_profile(self.checkpoint, profiler)
 
-        valid_transactions = []
-        for line in csv_reader:
-            serializer = ImportTransactionSerializer(data=line)
-            if not serializer.is_valid():
-                logger.warning(f"Invalid data: %s, file_request: %s", line, self.import_request_id)
-                continue
+    def import_rows(self, start, end):
+        with self.import_request.file.open('rb') as raw_file:
+            fieldnames = next(csv.reader([raw_file.readline().decode('utf-8')]), None)
+            start = max(start, raw_file.tell())
+            self.checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+                import_request=self.import_request,
+                start=start,
+                defaults={'end': end, 'offset': start},
+            )
+            self.restore_checkpoint()
+            if self.checkpoint.finished:
+                return
+            self.rejections = RejectionSink(self.checkpoint)
+            started = time.perf_counter()
+            for batch, sources in self.iter_batches(self.iter_lines(raw_file, self.position, end), fieldnames):
+                self.stats.charge_production(time.perf_counter() - started)
+                self.save_batch(batch, sources)
+                started = time.perf_counter()
+            self.stats.charge_production(time.perf_counter() - started)
+            self.save_checkpoint(finished=True)
+
+    def restore_checkpoint(self):
+        self.position = self.checkpoint.offset
+        self.rows_read = self.checkpoint.rows_read
+        self.stats = import_stats.ImportStats(self.checkpoint.stats)
+        for counter in ROW_COUNTERS:
+            setattr(self, counter, getattr(self.checkpoint, counter))
+
+    def save_checkpoint(self, finished=False):
+        if self.checkpoint is None:
+            return
+        self.rejections.flush(self.checkpoint.offset)
+        self.checkpoint.offset = self.position
+        self.checkpoint.rows_read = self.rows_read
+        self.checkpoint.stats = self.stats.as_dict()
+        self.checkpoint.finished = finished
+        for counter in ROW_COUNTERS:
+            setattr(self.checkpoint, counter, getattr(self, counter))
+        self.checkpoint.save()
+
+    def iter_lines(self, raw_file, start, end):
+        # DictReader consumes one line at a time, so `position` is the end of the last row read.
+        raw_file.seek(start)
+        self.position = start
+        seconds = self.stats.seconds
+        while end is None or self.position < end:
+            started = time.perf_counter()
+            line = raw_file.readline()
+            if not line:
+                break
+            self.position += len(line)
+            self.line = line.decode('utf-8')
+            seconds['read'] += time.perf_counter() - started
+            yield self.line
+
+    def iter_batches(self, lines, fieldnames):
+        """
+        Yields batches of valid transactions with the `(row, line)` source of each one,
+        adding invalid rows to the rejections of the range.
+        """
+        # Rates are loaded once per import, so conversion is a lookup in memory per row.
+        rate_table = RateTable.load()
+        validator = self.validator_class(context={'rate_table': rate_table})
+        if self.engine == COLUMNAR_ENGINE:
+            yield from self.iter_columnar_batches(lines, fieldnames, ColumnarValidator(validator, rate_table))
+            return
+
+        batch = []
+        sources = []
+        seconds = self.stats.seconds
+        for row in csv.DictReader(lines, fieldnames=fieldnames):
+            started = time.perf_counter()
+            validated_data, errors = validator.validate(row)
+            seconds['validate'] += time.perf_counter() - started
+            if self.add_row(batch, sources, self.line, validated_data, errors) and len(batch) >= self.batch_size:
+                yield batch, sources
+                batch = []
+                sources = []
+        if batch:
+            yield batch, sources
+
+    def iter_columnar_batches(self, lines, fieldnames, validator):
+        # A batch ends with its chunk, so `position` is the end of its last row when it is saved.
+        for chunk in rollups.chunked(lines, self.batch_size):
+            batch = []
+            sources = []
+            started = time.perf_counter()
+            rows = list(validator.validate_chunk(chunk, fieldnames))
+            self.stats.seconds['validate'] += time.perf_counter() - started
+            for line, validated_data, errors in rows:
+                self.add_row(batch, sources, line, validated_data, errors)
+            if batch:
+                yield batch, sources
+
+    def add_row(self, batch, sources, line, validated_data, errors):
+        """Adds a validated row to the batch, or to the rejections; returns whether it was valid."""
+        self.rows_read += 1
+        if errors:
+            self.rows_rejected += 1
+            self.rejections.add(self.rows_read, line.rstrip('\r\n'), errors)
+            return False
+        self.stats.rows_validated += 1
+        batch.append(Transaction(**validated_data))
+        sources.append((self.rows_read, line))
+        return True
 
-            valid_transactions.append(Transaction(**serializer.validated_data))
+    def save_batch(self, batch, sources):
+        """
+        Inserts a batch according to the request's duplicate policy. Existing ids
+        are found with one query per batch and conflicts are resolved by the
+        database, so re-importing a file costs the same as importing it. Rows are
+        written by the TRANSACTIONS_IMPORT_LOADER loader of the backend. The
+        checkpoint is saved in the same transaction, so a resumed import neither
+        skips nor repeats the batch; its stats miss only the commit of the batch.
+        """
+        policy = self.import_request.duplicate_policy
+        unique_batch = {}
+        for instance in batch:
+            if policy == DuplicatePolicyChoices.OVERWRITE or instance.id not in unique_batch:
+                unique_batch[instance.id] = instance
+        duplicates_in_batch = len(batch) - len(unique_batch)
 
+        clock = import_stats.PhaseClock()
         with transaction.atomic():
-            Transaction.objects.bulk_create(valid_transactions)
+            self.loader.lock_ids(unique_batch)
+            if policy == DuplicatePolicyChoices.OVERWRITE:
+                stored = list(Transaction.objects.filter(id__in=unique_batch))
+                existing_ids = {instance.id for instance in stored}
+                clock.lap('lookup')
+                self.loader.insert(list(unique_batch.values()), update_fields=OVERWRITE_FIELDS)
+                clock.lap('insert')
+                rollups.apply_changes(added=unique_batch.values(), removed=stored)
+            else:
+                existing_ids = set(
+                    Transaction.objects.filter(id__in=unique_batch).values_list('id', flat=True)
+                )
+                clock.lap('lookup')
+                new_transactions = [
+                    instance for instance in unique_batch.values() if instance.id not in existing_ids
+                ]
+                # Rows committed by a concurrent import since the lookup are skipped by the insert.
+                new_transactions = self.loader.insert(
+                    new_transactions, ignore_conflicts=policy == DuplicatePolicyChoices.SKIP,
+                )
+                clock.lap('insert')
+                rollups.apply_changes(added=new_transactions)
+            clock.lap('rollups')
+
+            if policy == DuplicatePolicyChoices.OVERWRITE:
+                self.rows_inserted += len(unique_batch) - len(existing_ids)
+                self.rows_updated += len(existing_ids) + duplicates_in_batch
+            elif policy == DuplicatePolicyChoices.SKIP:
+                self.rows_inserted += len(new_transactions)
+                self.rows_skipped += len(unique_batch) - len(new_transactions) + duplicates_in_batch
+            else:
+                self.rows_inserted += len(new_transactions)
+                if existing_ids or duplicates_in_batch:
+                    self.reject_duplicates(batch, sources, existing_ids)
+            self.stats.add_batch(clock.phases)
+            self.save_checkpoint()
+        clock.lap('commit')
+        self.stats.seconds['commit'] += clock.phases['commit']
+
+    def reject_duplicates(self, batch, sources, existing_ids):
+        # The first row of an id new to the table is the one inserted.
+        inserted_ids = set()
+        for instance, (row, line) in zip(batch, sources):
+            if instance.id in existing_ids or instance.id in inserted_ids:
+                self.rows_rejected += 1
+                self.rejections.add(row, line.rstrip('\r\n'), DUPLICATE_ERRORS)
+            else:
+                inserted_ids.add(instance.id)
+
+
+class CSVShardImporter(CSVImporter):
+    """
+    Imports one byte range of a sharded request. Failures are reported in
+    `result` instead of on the request, which is completed once all shards finish.
+    """
+
+    def __init__(self, import_request_id, start, end, batch_size=None, engine=None):
+        super().__init__(import_request_id, batch_size=batch_size, engine=engine)
+        self.start = start
+        self.end = end
+        self.errors = []
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            logger.exception("Shard %s-%s failed, file_request: %s", self.start, self.end, self.import_request_id)
+            self.errors.append({
+                'exception_type': str(exc_type),
+                'exception_value': str(exc_val),
+            })
+        return True
+
+    def import_shard(self):
+        self.import_range(self.start, self.end)
+
+    @property
+    def result(self):
+        return {
+            'start': self.start,
+            'end': self.end,
+            'errors': self.errors,
+            **{counter: getattr(self, counter) for counter in ROW_COUNTERS},
+        }
+
+
+def complete_sharded_import(import_request_id, shard_results):
+    import_request = FileImportRequest.objects.get(pk=import_request_id)
+    for counter in ROW_COUNTERS:
+        setattr(import_request, counter, sum(result.get(counter, 0) for result in shard_results))
+    shard_errors = [
+        dict(error, start=result['start'], end=result['end'])
+        for result in shard_results
+        for error in result['errors']
+    ]
+    if shard_errors:
+        import_request.status = states.FAILURE
+        import_request.exception_meta = {'shard_errors': shard_errors}
+    else:
+        import_request.status = states.SUCCESS
+    complete_import(import_request)
+    import_request.save()
+    return import_request
+
+
+def complete_import(import_request):
+    """
+    Completes a request with its final status: merges the rejected rows and profiles of
+    its ranges into artifacts, totals their stats and adds them to the import metrics.
+    """
+    if import_request.status == states.SUCCESS:
+        complete_rejections(import_request)
+    import_stats.complete_profile(import_request)
+    previous_stats = import_request.stats
+    import_stats.complete_stats(import_request)
+    metrics.record_import(import_request.status, import_request.stats, previous_stats)
+    import_request.processed_at = timezone.now()
@@ -0,0 +1,220 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import cached_property
+
+from . import partitions
+from .models import Transaction
+
+STAGING_LOADER = 'staging'
+BULK_CREATE_LOADER = 'bulk_create'
+
+
+class BulkCreateLoader:
+    """Inserts instances with `bulk_create`; the reference loader and the one of backends without a staging loader."""
+    name = BULK_CREATE_LOADER
+
+    def __init__(self, model=Transaction, using=DEFAULT_DB_ALIAS):
+        self.model = model
+        self.using = using
+        self.connection = connections[using]
+
+    def lock_ids(self, ids):
+        """
+        Makes concurrent imports of `ids` wait for the current transaction before they look
+        them up. Nothing to do where the primary key is `id`, which the database keeps unique.
+        """
+
+    def insert(self, instances, ignore_conflicts=False, update_fields=None):
+        """
+        Inserts `instances`, skipping or updating the rows whose primary key already exists if
+        asked to, and returns the instances written: without those skipped as conflicts, which
+        may have been committed by another transaction after the caller looked them up.
+        """
+        self.model.objects.using(self.using).bulk_create(
+            instances,
+            ignore_conflicts=ignore_conflicts,
+            update_conflicts=bool(update_fields),
+            unique_fields=[self.model._meta.pk.name] if update_fields else None,
+            update_fields=update_fields,
+        )
+        if not ignore_conflicts:
+            return list(instances)
+        # bulk_create does not tell the skipped rows apart; the creation time set on the
+        # instances identifies the rows written by this call.
+        pk = self.model._meta.pk
+        created = dict(
+            self.model.objects.using(self.using)
+            .filter(pk__in=[instance.pk for instance in instances]).values_list(pk.name, 'created_at')
+        )
+        return [instance for instance in instances if created.get(pk.to_python(instance.pk)) == instance.created_at]
+
+
+class StagingLoader(BulkCreateLoader):
+    """
+    Loads instances into a temporary staging table with the fastest mechanism of the
+    backend, then moves them into the model's table with a single INSERT ... SELECT,
+    which resolves primary key conflicts set-based. The staging table is emptied after
+    each insert, inside the caller's transaction.
+    """
+    name = STAGING_LOADER
+
+    def __init__(self, model=Transaction, using=DEFAULT_DB_ALIAS):
+        super().__init__(model, using)
+        quote_name = self.connection.ops.quote_name
+        self.fields = model._meta.concrete_fields
+        self.table = quote_name(model._meta.db_table)
+        self.staging_table = quote_name(f'{model._meta.db_table}_staging')
+        self.columns = ', '.join(quote_name(field.column) for field in self.fields)
+        self.pk_column = quote_name(model._meta.pk.column)
+
+    def insert(self, instances, ignore_conflicts=False, update_fields=None):
+        if not instances:
+            return []
+        rows = [
+            tuple(field.get_db_prep_save(field.pre_save(instance, True), self.connection) for field in self.fields)
+            for instance in instances
+        ]
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.create_staging_table_sql())
+            self.load(cursor, rows)
+            *statements, insert = self.insert_sql(ignore_conflicts, update_fields)
+            for sql in statements:
+                cursor.execute(sql)
+            if ignore_conflicts:
+                cursor.execute(f'{insert} RETURNING {self.pk_column}')
+                written = {bytes(value) if isinstance(value, memoryview) else value for value, in cursor.fetchall()}
+            else:
+                cursor.execute(insert)
+            cursor.execute(f'DELETE FROM {self.staging_table}')
+        if ignore_conflicts:
+            # The returned keys are compared in their database representation, that of the staged rows.
+            pk_index = self.fields.index(self.model._meta.pk)
+            instances = [instance for instance, row in zip(instances, rows) if row[pk_index] in written]
+        for instance in instances:
+            instance._state.adding = False
+            instance._state.db = self.using
+        return list(instances)
+
+    def create_staging_table_sql(self):
+        raise NotImplementedError
+
+    def load(self, cursor, rows):
+        raise NotImplementedError
+
+    def insert_sql(self, ignore_conflicts, update_fields):
+        """Returns the statements moving the staged rows into the model's table."""
+        # WHERE true keeps SQLite from reading ON CONFLICT as a join constraint of the SELECT.
+        sql = f'INSERT INTO {self.table} ({self.columns}) SELECT {self.columns} FROM {self.staging_table} WHERE true'
+        if update_fields:
+            assignments = ', '.join(f'{column} = EXCLUDED.{column}' for column in self.update_columns(update_fields))
+            return [f'{sql} ON CONFLICT ({self.pk_column}) DO UPDATE SET {assignments}']
+        if ignore_conflicts:
+            return [f'{sql} ON CONFLICT DO NOTHING']
+        return [sql]
+
+    def update_columns(self, update_fields):
+        quote_name = self.connection.ops.quote_name
+        return [quote_name(self.model._meta.get_field(name).column) for name in update_fields]
+
+
+class SQLiteStagingLoader(StagingLoader):
+    """Fills the staging table with `executemany` of a single-row INSERT, which SQLite runs as one prepared statement."""
+
+    def create_staging_table_sql(self):
+        return (
+            f'CREATE TEMP TABLE IF NOT EXISTS {self.staging_table} AS '
+            f'SELECT {self.columns} FROM {self.table} WHERE false'
+        )
+
+    def load(self, cursor, rows):
+        placeholders = ', '.join(['%s'] * len(self.fields))
+        cursor.executemany(f'INSERT INTO {self.staging_table} ({self.columns}) VALUES ({placeholders})', rows)
+
+
+class PostgreSQLStagingLoader(StagingLoader):
+    """
+    Fills the staging table with COPY FROM STDIN, streaming rows without parsing any
+    INSERT statement. On the partitioned transactions table, whose primary key includes
+    the partition key, conflicts on `id` are resolved with UPDATE ... FROM and INSERT
+    ... WHERE NOT EXISTS, the monthly partitions of the rows being created first. These
+    do not see rows of uncommitted transactions, so concurrent imports of the same ids
+    are serialized by `lock_ids`.
+    """
+
+    @cached_property
+    def partitioned(self):
+        return self.model._meta.db_table == partitions.TABLE and partitions.is_partitioned(self.connection)
+
+    def lock_ids(self, ids):
+        if self.partitioned:
+            partitions.lock_ids(ids, self.connection)
+
+    def insert(self, instances, ignore_conflicts=False, update_fields=None):
+        if instances and self.partitioned:
+            partitions.ensure_partitions(
+                {partitions.month_start(instance.timestamp) for instance in instances}, self.connection,
+            )
+        return super().insert(instances, ignore_conflicts=ignore_conflicts, update_fields=update_fields)
+
+    def create_staging_table_sql(self):
+        return (
+            f'CREATE TEMP TABLE IF NOT EXISTS {self.staging_table} '
+            f'(LIKE {self.table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+        )
+
+    def load(self, cursor, rows):
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        sql = f'COPY {self.staging_table} ({self.columns}) FROM STDIN'
+        if is_psycopg3:
+            with cursor.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            # An unquoted empty field is NULL in the CSV format.
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(f'{sql} WITH (FORMAT csv)', buffer)
+
+    def insert_sql(self, ignore_conflicts, update_fields):
+        if not self.partitioned:
+            return super().insert_sql(ignore_conflicts, update_fields)
+        insert = (
+            f'INSERT INTO {self.table} ({self.columns}) SELECT {self.columns} FROM {self.staging_table} staged'
+        )
+        missing = f' WHERE NOT EXISTS (SELECT 1 FROM {self.table} stored WHERE stored.{self.pk_column} = staged.{self.pk_column})'
+        if update_fields:
+            # An updated timestamp moves the row to the partition of its new month.
+            assignments = ', '.join(f'{column} = staged.{column}' for column in self.update_columns(update_fields))
+            return [
+                f'UPDATE {self.table} stored SET {assignments} FROM {self.staging_table} staged '
+                f'WHERE stored.{self.pk_column} = staged.{self.pk_column}',
+                insert + missing,
+            ]
+        if ignore_conflicts:
+            return [insert + missing]
+        return [insert]
+
+
+STAGING_LOADERS = {
+    'sqlite': SQLiteStagingLoader,
+    'postgresql': PostgreSQLStagingLoader,
+}
+
+
+def get_loader(name=None, model=Transaction, using=DEFAULT_DB_ALIAS):
+    """
+    Returns the `name` loader, TRANSACTIONS_IMPORT_LOADER by default, for the backend of
+    `using`. The partitioned transactions table always gets the staging loader, as it has
+    no unique constraint on `id` for `bulk_create` to resolve conflicts with.
+    """
+    name = name or settings.TRANSACTIONS_IMPORT_LOADER
+    connection = connections[using]
+    if model._meta.db_table == partitions.TABLE and partitions.is_partitioned(connection):
+        name = STAGING_LOADER
+    loader_class = STAGING_LOADERS.get(connection.vendor) if name == STAGING_LOADER else None
+    return (loader_class or BulkCreateLoader)(model, using)
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from ...benchmarks.data import CSV_HEADER, generate_rows
+from ...loaders import BULK_CREATE_LOADER, STAGING_LOADER, get_loader
+from ...models import Transaction
+from ...rollups import chunked
+from ...validators import RowValidator
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/s of the import loaders on the configured database, committing one batch at a time. "
+        "Rows are inserted and deleted again, so run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--loaders', nargs='+', default=[BULK_CREATE_LOADER, STAGING_LOADER],
+                            choices=[BULK_CREATE_LOADER, STAGING_LOADER])
+
+    def handle(self, *args, **options):
+        validator = RowValidator()
+        rows = [validator.validate(dict(zip(CSV_HEADER, values)))[0]
+                for values in generate_rows(options['rows'], seed=options['seed'])]
+        batches = list(chunked(rows, options['batch_size']))
+
+        self.stdout.write(f"backend: {connection.vendor}")
+        for name in options['loaders']:
+            loader = get_loader(name)
+            instances = [[Transaction(**data) for data in batch] for batch in batches]
+            # DEBUG keeps every executed statement in memory.
+            try:
+                with override_settings(DEBUG=False):
+                    started = time.perf_counter()
+                    for batch in instances:
+                        with transaction.atomic():
+                            loader.insert(batch)
+                    elapsed = time.perf_counter() - started
+            finally:
+                for batch in batches:
+                    Transaction.objects.filter(id__in=[data['id'] for data in batch])._raw_delete(connection.alias)
+            self.stdout.write(f"{type(loader).__name__:<24}{elapsed:8.2f} s {len(rows) / elapsed:12.0f} rows/s")
@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from ...benchmarks import measure
+from ...benchmarks.data import write_transactions_csv
+from ...importers import CSVImporter
+from ...models import FileImportRequest, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure CSVImporter throughput and peak memory over a generated CSV file. "
+        "Rows are inserted into the configured database, so run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--file', help="Import an existing CSV file instead of generating one.")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--engine', choices=['rows', 'columnar'], default=None,
+                            help="Validation engine, TRANSACTIONS_IMPORT_ENGINE by default.")
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not path:
+            fd, path = tempfile.mkstemp(suffix='.csv')
+            with os.fdopen(fd, 'w', newline='') as fileobj:
+                write_transactions_csv(fileobj, options['rows'], seed=options['seed'])
+
+        try:
+            self.run_import(path, options['batch_size'], options['engine'])
+        finally:
+            if not options['file']:
+                os.remove(path)
+
+    def run_import(self, path, batch_size, engine):
+        user, _ = get_user_model().objects.get_or_create(username='benchmark')
+        with open(path, 'rb') as fileobj:
+            import_request = FileImportRequest.objects.create(
+                requested_by=user,
+                file=File(fileobj, name=os.path.basename(path)),
+            )
+
+        transactions_before = Transaction.objects.count()
+        # DEBUG keeps every executed statement in memory, which would dominate the RSS figures.
+        with override_settings(DEBUG=False), measure() as result:
+            with CSVImporter(import_request.id, batch_size=batch_size, engine=engine) as csv_importer:
+                csv_importer.import_file()
+        imported = Transaction.objects.count() - transactions_before
+
+        import_request.refresh_from_db()
+        self.stdout.write(f"status:        {import_request.status}")
+        self.stdout.write(f"engine:        {csv_importer.engine}")
+        self.stdout.write(f"file size:     {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        self.stdout.write(f"rows imported: {imported}")
+        self.stdout.write(f"elapsed:       {result['seconds']:.2f} s")
+        self.stdout.write(f"throughput:    {imported / result['seconds']:.0f} rows/s")
+        self.stdout.write(f"peak RSS:      {result['rss_after'] / 2 ** 20:.1f} MiB "
+                          f"(+{(result['rss_after'] - result['rss_before']) / 2 ** 20:.1f} MiB during import)")
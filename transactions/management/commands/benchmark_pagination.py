@@ -0,0 +1,73 @@
+import statistics
+import time
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ...api.views import TransactionCursorPagination, TransactionViewSet
+from ...benchmarks.data import load_transactions
+from ...models import Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare transaction list latency at increasing page depths for page number and keyset "
+        "(cursor) pagination. With --rows, generated transactions are inserted first, so run it "
+        "against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--depths', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # DEBUG keeps every executed statement in memory and slows down the timed loops.
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            if options['rows']:
+                load_transactions(options['rows'], seed=options['seed'])
+            self.run_pages(options)
+
+    def run_pages(self, options):
+        user, _ = get_user_model().objects.get_or_create(username='benchmark')
+        view = TransactionViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        page_size = options['page_size']
+        rows = Transaction.objects.count()
+
+        def timed(params):
+            seconds = []
+            for _ in range(options['repeat']):
+                request = factory.get('/api/v1.0/transactions/', params)
+                force_authenticate(request, user)
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                seconds.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.data
+            return statistics.median(seconds) * 1000
+
+        self.stdout.write(f"{rows} rows, {page_size} per page")
+        self.stdout.write(f"{'page':>8}{'page number ms':>18}{'cursor ms':>12}")
+        for depth in options['depths']:
+            offset = (depth - 1) * page_size
+            if offset >= rows:
+                break
+            page_number = timed({'page': depth, 'page_size': page_size})
+
+            params = {'pagination': 'cursor', 'page_size': page_size}
+            if offset:
+                # The cursor a client reaches after following `depth - 1` next links.
+                previous_row = Transaction.objects.order_by('-timestamp', '-id')[offset - 1]
+                paginator = TransactionCursorPagination()
+                paginator.base_url = ''
+                link = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=paginator.get_position(previous_row)))
+                params['cursor'] = parse_qs(urlparse(link).query)['cursor'][0]
+            cursor = timed(params)
+            self.stdout.write(f"{depth:>8}{page_number:>18.2f}{cursor:>12.2f}")
@@ -0,0 +1,119 @@
+import csv
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from ...benchmarks.data import write_transactions_csv
+from ...importers import CSVImporter
+from ...models import FileImportRequest, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure customer report latency while idle and while a CSV import writes to the same SQLite "
+        "database. Reports are computed from the database, bypassing the report cache. Rows are "
+        "inserted into the configured database, so run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--file', help="Import an existing CSV file instead of generating one.")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--idle-seconds', type=float, default=5)
+        parser.add_argument('--read-interval', type=float, default=0.01,
+                            help="Seconds between reads, so the reader does not starve the import of the GIL.")
+        parser.add_argument('--without-profile', action='store_true',
+                            help="Use the SQLite defaults (rollback journal) instead of settings.SQLITE_PRAGMAS.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError("This benchmark needs a file-backed SQLite database.")
+        if options['without_profile']:
+            # Connections are opened per thread from these settings; the journal mode is stored in the file.
+            connections.settings[DEFAULT_DB_ALIAS]['OPTIONS'] = {'init_command': 'PRAGMA journal_mode=DELETE'}
+            connection.close()
+
+        path = options['file']
+        if not path:
+            fd, path = tempfile.mkstemp(suffix='.csv')
+            with os.fdopen(fd, 'w', newline='') as fileobj:
+                write_transactions_csv(fileobj, options['rows'], seed=options['seed'])
+        try:
+            # DEBUG keeps every executed statement in memory.
+            with override_settings(DEBUG=False):
+                self.run(path, options['idle_seconds'], options['read_interval'])
+        finally:
+            if not options['file']:
+                os.remove(path)
+
+    def run(self, path, idle_seconds, read_interval):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.stdout.write(f"journal mode:  {cursor.fetchone()[0]}")
+        with open(path, newline='') as fileobj:
+            customer_ids = sorted({row['customer_id'] for row, _ in zip(csv.DictReader(fileobj), range(10000))})
+
+        deadline = time.perf_counter() + idle_seconds
+        self.report("idle", *self.read_reports(customer_ids, read_interval, lambda: time.perf_counter() < deadline))
+
+        user, _ = get_user_model().objects.get_or_create(username='benchmark')
+        with open(path, 'rb') as fileobj:
+            import_request = FileImportRequest.objects.create(
+                requested_by=user,
+                file=File(fileobj, name=os.path.basename(path)),
+            )
+        transactions_before = Transaction.objects.count()
+        importer = threading.Thread(target=self.run_import, args=(import_request.id,))
+        started = time.perf_counter()
+        importer.start()
+        self.report("during import", *self.read_reports(customer_ids, read_interval, importer.is_alive))
+        importer.join()
+        elapsed = time.perf_counter() - started
+
+        import_request.refresh_from_db()
+        imported = Transaction.objects.count() - transactions_before
+        self.stdout.write(f"import:        {import_request.status}, {imported} rows in {elapsed:.1f} s "
+                          f"({imported / elapsed:.0f} rows/s)")
+
+    def run_import(self, import_request_id):
+        try:
+            with CSVImporter(import_request_id) as csv_importer:
+                csv_importer.import_file()
+        finally:
+            connection.close()
+
+    def read_reports(self, customer_ids, read_interval, running):
+        latencies = []
+        errors = 0
+        index = 0
+        while running():
+            time.sleep(read_interval)
+            customer_id = customer_ids[index % len(customer_ids)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                Transaction.objects.group_by_customer(customer_id)
+            except OperationalError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    def report(self, phase, latencies, errors):
+        if len(latencies) < 2:
+            self.stdout.write(f"{phase + ':':<15}{len(latencies)} reads, {errors} errors")
+            return
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{phase + ':':<15}{len(latencies)} reads, {errors} errors, "
+            f"p50 {percentiles[49] * 1000:.2f} ms, p95 {percentiles[94] * 1000:.2f} ms, "
+            f"p99 {percentiles[98] * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms"
+        )
@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from ... import reports
+from ...benchmarks.data import load_transactions
+from ...models import Transaction
+from ...rollups import CENT
+
+YEAR = timedelta(days=365)
+
+
+def quantized(summary):
+    return {
+        field: value.quantize(CENT) if isinstance(value, Decimal) else value
+        for field, value in summary.items()
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare customer and product report latency over 1-year and 5-year ranges served from "
+        "daily and monthly buckets against aggregating transactions. With --rows, generated "
+        "transactions spanning --years are inserted first, so run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--samples', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # DEBUG keeps every executed statement in memory and slows down the timed loops.
+        with override_settings(DEBUG=False):
+            if options['rows']:
+                self.load_transactions(options)
+            self.run_reports(options)
+
+    def load_transactions(self, options):
+        started = time.perf_counter()
+        load_transactions(
+            options['rows'],
+            batch_size=options['batch_size'],
+            customers=options['customers'],
+            products=options['products'],
+            seed=options['seed'],
+            max_interval=max(int(options['years'] * YEAR.total_seconds() * 2 / options['rows']), 2),
+        )
+        self.stdout.write(f"loaded {options['rows']} rows in {time.perf_counter() - started:.1f} s")
+
+    def run_reports(self, options):
+        latest = Transaction.objects.order_by('-timestamp').values_list('timestamp', flat=True).first()
+        if latest is None:
+            self.stderr.write("No transactions to report on, pass --rows to generate some.")
+            return
+
+        rng = random.Random(options['seed'])
+        customer_ids = list(Transaction.objects.order_by().values_list('customer_id', flat=True).distinct())
+        product_ids = list(Transaction.objects.order_by().values_list('product_id', flat=True).distinct())
+        scenarios = [
+            ('customer', customer_ids, reports.customer_summaries, 'customer_id', 'summarize_customers'),
+            ('product', product_ids, reports.product_summaries, 'product_id', 'summarize_products'),
+        ]
+        self.stdout.write(f"{'report':<10}{'range':>7}{'source':>9}{'p50 ms':>10}{'p95 ms':>10}")
+        for years in (1, 5):
+            # The range starts mid-day, so edge days are answered from transactions too.
+            date_from = latest - years * YEAR + timedelta(hours=7)
+            for name, ids, summaries, key, summarize in scenarios:
+                sample = rng.sample(ids, min(options['samples'], len(ids)))
+                timings = {'buckets': [], 'raw': []}
+                for id_ in sample:
+                    started = time.perf_counter()
+                    from_buckets = summaries([id_], date_from, latest)[id_]
+                    timings['buckets'].append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    from_raw = list(getattr(Transaction.objects.filter(
+                        **{key: id_, 'timestamp__gte': date_from, 'timestamp__lte': latest},
+                    ), summarize)().values(*from_buckets))
+                    timings['raw'].append(time.perf_counter() - started)
+
+                    # sqlite sums decimals as floats, so totals over many raw rows drift below a cent.
+                    if from_raw and quantized(from_raw[0]) != quantized(from_buckets):
+                        self.stderr.write(f"{name} {id_}: buckets {from_buckets} != transactions {from_raw}")
+                for source, seconds in timings.items():
+                    p95 = statistics.quantiles(seconds, n=20)[-1] if len(seconds) > 1 else seconds[0]
+                    self.stdout.write(
+                        f"{name:<10}{years:>6}y{source:>9}"
+                        f"{statistics.median(seconds) * 1000:>10.2f}{p95 * 1000:>10.2f}"
+                    )
@@ -0,0 +1,148 @@
+import asyncio
+import importlib.util
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from ...benchmarks.data import load_transactions
+from ...benchmarks.load import build_request, run_load
+from ...models import Transaction
+
+HOST = '127.0.0.1'
+SERVERS = ('wsgi', 'asgi')
+ENDPOINTS = ('list', 'detail', 'report')
+
+
+@contextmanager
+def running(command, env, cwd, port):
+    """Runs a server process for the duration of the block, once it accepts connections on `port`."""
+    process = subprocess.Popen(command, env=env, cwd=cwd)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise CommandError(f"{' '.join(command)} exited with {process.returncode}.")
+            try:
+                socket.create_connection((HOST, port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise CommandError(f"{' '.join(command)} did not listen on port {port}.")
+                time.sleep(0.2)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput and latency of the transaction list, detail and report endpoints "
+        "served by gunicorn (sync WSGI views, gthread workers) and by uvicorn (async ASGI views) at "
+        "increasing numbers of concurrent connections. Needs requirements/servers.txt and the report "
+        "cache of the settings; with --rows generated transactions are inserted first, so run it "
+        "against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+        parser.add_argument('--duration', type=float, default=10, help="Seconds of load per run.")
+        parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+        parser.add_argument('--workers', type=int, default=1, help="Server processes.")
+        parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker.")
+        parser.add_argument('--samples', type=int, default=1000, help="Distinct URLs per endpoint.")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for server in options['servers']:
+            module = {'wsgi': 'gunicorn', 'asgi': 'uvicorn'}[server]
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f"{module} is not installed, install requirements/servers.txt.")
+        if options['rows']:
+            load_transactions(options['rows'], seed=options['seed'])
+        if not Transaction.objects.exists():
+            raise CommandError("No transactions to request, pass --rows to generate some.")
+
+        user, _ = get_user_model().objects.get_or_create(username='benchmark')
+        token, _ = Token.objects.get_or_create(user=user)
+        paths = self.sample_paths(options)
+        requests = [
+            build_request(HOST, options['port'], path, {'Authorization': f'Token {token.key}'}) for path in paths
+        ]
+
+        self.stdout.write(f"{len(paths)} URLs over {', '.join(options['endpoints'])}, "
+                          f"{options['workers']} worker(s), {options['duration']:g} s per run")
+        self.stdout.write(f"{'server':<8}{'connections':>12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for server in options['servers']:
+            with self.serve(server, options):
+                # Opens connections and fills the caches of the server before measuring.
+                asyncio.run(run_load(HOST, options['port'], requests, max(options['concurrency']), 2))
+                for concurrency in options['concurrency']:
+                    result = asyncio.run(run_load(HOST, options['port'], requests, concurrency, options['duration']))
+                    self.stdout.write(
+                        f"{server:<8}{concurrency:>12}{result.throughput:>10.0f}{result.percentile(50) * 1000:>10.1f}"
+                        f"{result.percentile(99) * 1000:>10.1f}{result.errors:>8}"
+                    )
+
+    def sample_paths(self, options):
+        rng = random.Random(options['seed'])
+        samples = options['samples']
+        rows = list(Transaction.objects.order_by().values_list('id', 'customer_id'))
+        ids = rng.sample(rows, min(samples, len(rows)))
+        bounds = Transaction.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+        span = (bounds['last'] - bounds['first']).total_seconds()
+
+        paths = []
+        for index in range(samples):
+            transaction_id, customer_id = ids[index % len(ids)]
+            if 'list' in options['endpoints']:
+                query = urlencode({'customer_id': customer_id, 'page_size': 20})
+                paths.append(f"{reverse('transactions:transaction-list')}?{query}")
+            if 'detail' in options['endpoints']:
+                paths.append(reverse('transactions:transaction-detail', args=(transaction_id,)))
+            if 'report' in options['endpoints']:
+                # Ranges with edges inside days read buckets and transactions, and rarely repeat in the cache.
+                date_from = bounds['first'] + timedelta(seconds=rng.uniform(0, span))
+                date_to = date_from + timedelta(seconds=rng.uniform(0, span / 4))
+                query = urlencode({'date_from': date_from.isoformat(), 'date_to': date_to.isoformat()})
+                paths.append(f"{reverse('transactions:report-customer-summary', args=(customer_id,))}?{query}")
+        rng.shuffle(paths)
+        return paths
+
+    def serve(self, server, options):
+        address = f"{HOST}:{options['port']}"
+        if server == 'wsgi':
+            command = [
+                '-m', 'gunicorn', 'transaction_api.wsgi:application', '--bind', address,
+                '--workers', str(options['workers']), '--worker-class', 'gthread',
+                '--threads', str(options['threads']), '--log-level', 'warning',
+            ]
+        else:
+            command = [
+                '-m', 'uvicorn', 'transaction_api.asgi:application', '--host', HOST,
+                '--port', str(options['port']), '--workers', str(options['workers']),
+                '--log-level', 'warning', '--no-access-log',
+            ]
+        env = dict(os.environ, TRANSACTIONS_SERVER=server)
+        return running([sys.executable, *command], env, settings.BASE_DIR, options['port'])
+
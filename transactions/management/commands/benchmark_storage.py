@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from ... import storage
+from ...benchmarks.data import load_transactions
+from ...models import Transaction
+from ...rollups import CENT
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the size of the transactions table and its indexes and the speed of report aggregates "
+        "between the default and the compact SQLite storage. Every row of the database is converted "
+        "back and forth, and with --rows generated transactions are inserted first, so run it against "
+        "a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0)
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--samples', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Runs of the whole-table aggregate, the median is reported.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError("This benchmark needs a file-backed SQLite database.")
+        # DEBUG keeps every executed statement in memory and slows down the timed loops.
+        try:
+            with override_settings(DEBUG=False, TRANSACTIONS_COMPACT_STORAGE=False):
+                storage.convert(False)
+                if options['rows']:
+                    load_transactions(
+                        options['rows'],
+                        batch_size=options['batch_size'],
+                        customers=options['customers'],
+                        products=options['products'],
+                        seed=options['seed'],
+                    )
+                rng = random.Random(options['seed'])
+                customer_ids = list(Transaction.objects.order_by().values_list('customer_id', flat=True).distinct())
+                sample = rng.sample(customer_ids, min(options['samples'], len(customer_ids)))
+            if not sample:
+                raise CommandError("No transactions to measure, pass --rows to generate some.")
+
+            results = {}
+            for compact in (False, True):
+                with override_settings(DEBUG=False, TRANSACTIONS_COMPACT_STORAGE=compact):
+                    storage.convert(compact)
+                    self.vacuum()
+                    results[compact] = self.measure(sample, options['repeat'])
+        finally:
+            storage.convert(settings.TRANSACTIONS_COMPACT_STORAGE)
+        self.report(results)
+
+    def vacuum(self):
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+
+    def sizes(self):
+        """Returns the bytes used by the transactions table and each of its indexes."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = %s) GROUP BY name ORDER BY name",
+                [Transaction._meta.db_table],
+            )
+            return dict(cursor.fetchall())
+
+    def measure(self, sample, repeat):
+        whole_table = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            totals = {row['customer_id']: row for row in Transaction.objects.summarize_customers()}
+            whole_table.append(time.perf_counter() - started)
+
+        per_customer = []
+        for customer_id in sample:
+            started = time.perf_counter()
+            list(Transaction.objects.for_customer(customer_id).summarize_customers())
+            per_customer.append(time.perf_counter() - started)
+        return {
+            'sizes': self.sizes(),
+            'whole_table': statistics.median(whole_table),
+            'per_customer': statistics.median(per_customer),
+            'totals': totals,
+        }
+
+    def report(self, results):
+        default, compact = results[False], results[True]
+        self.stdout.write(f"{'object':<46}{'default':>14}{'compact':>14}{'change':>9}")
+        rows = [(name, default['sizes'][name], compact['sizes'].get(name, 0)) for name in default['sizes']]
+        rows.append(('total', sum(default['sizes'].values()), sum(compact['sizes'].values())))
+        for name, before, after in rows:
+            self.stdout.write(f"{name:<46}{before:>14,}{after:>14,}{(after - before) / before:>+9.0%}")
+        for key, label in (('whole_table', "summarize_customers, all rows"),
+                           ('per_customer', "summarize_customers, one customer")):
+            before, after = default[key] * 1000, compact[key] * 1000
+            self.stdout.write(f"{label + ' (ms)':<46}{before:>14.2f}{after:>14.2f}{(after - before) / before:>+9.0%}")
+
+        # Default storage sums floats, so its totals may drift from the exact compact sums by under a cent.
+        mismatched = [
+            customer_id for customer_id, row in default['totals'].items()
+            if abs(row['total_cost_in_pln'] - compact['totals'][customer_id]['total_cost_in_pln']) >= CENT
+            or row['count_distinct_product'] != compact['totals'][customer_id]['count_distinct_product']
+        ]
+        self.stdout.write(f"customers with different aggregates: {len(mismatched)}")
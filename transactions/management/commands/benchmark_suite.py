@@ -0,0 +1,127 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from ...benchmarks import suite
+from ...benchmarks.data import write_transactions_csv
+from ...models import Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the performance regression suite: import a generated CSV file (skewed ids, a ratio of "
+        "dirty rows), then time transaction list pages at increasing depths and reports per id and "
+        "per date range. Results are compared with the stored baseline and the command fails when a "
+        "metric is worse by more than the threshold; --save-baseline records them instead. The import "
+        "needs an empty transactions table, so run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help="Zipf exponent of the customer and product distributions, 0 for uniform.")
+        parser.add_argument('--dirty-ratio', type=float, default=0.01, help="Fraction of invalid rows.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--engine', choices=['rows', 'columnar'], default='rows')
+        parser.add_argument('--depths', type=int, nargs='+', default=[1, 10, 100])
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5, help="Requests per list page, the median is kept.")
+        parser.add_argument('--samples', type=int, default=100, help="Ids requested per report scenario.")
+        parser.add_argument('--scenarios', nargs='+', choices=suite.SCENARIOS, default=list(suite.SCENARIOS))
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Store the results as the new baseline instead of comparing them.")
+        parser.add_argument('--threshold', type=float, default=None,
+                            help="Tolerated relative slowdown, the one stored with the baseline by default (0.25).")
+
+    def handle(self, *args, **options):
+        parameters = {
+            name: options[name] for name in (
+                'rows', 'customers', 'products', 'skew', 'dirty_ratio', 'seed', 'batch_size', 'engine',
+                'depths', 'page_size', 'repeat', 'samples',
+            )
+        }
+        baseline = None
+        if not options['save_baseline'] and os.path.exists(options['baseline']):
+            baseline = suite.load_baseline(options['baseline'])
+            if baseline['parameters'] != parameters:
+                raise CommandError(
+                    f"The baseline in {options['baseline']} was recorded with {baseline['parameters']}, "
+                    f"rerun with the same parameters or record a new one with --save-baseline."
+                )
+        if 'import' in options['scenarios'] and Transaction.objects.exists():
+            raise CommandError("The import scenario needs an empty transactions table.")
+
+        # DEBUG keeps every executed statement in memory and slows down the timed loops; reports
+        # are cached in the local memory cache, which the scenario clears.
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'], TRANSACTIONS_REPORT_CACHE='default'):
+            metrics = self.run_scenarios(options)
+
+        if options['save_baseline']:
+            threshold = 0.25 if options['threshold'] is None else options['threshold']
+            suite.save_baseline(options['baseline'], parameters, metrics, threshold)
+            self.report(suite.compare({}, metrics, threshold))
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+        elif baseline is None:
+            self.report(suite.compare({}, metrics, 0))
+            self.stdout.write(f"No baseline in {options['baseline']}, record one with --save-baseline.")
+        else:
+            self.compare(baseline, metrics, options)
+
+    def run_scenarios(self, options):
+        user, _ = get_user_model().objects.get_or_create(username='benchmark')
+        metrics = {}
+        if 'import' in options['scenarios']:
+            fd, path = tempfile.mkstemp(suffix='.csv')
+            try:
+                with os.fdopen(fd, 'w', newline='') as fileobj:
+                    write_transactions_csv(
+                        fileobj,
+                        options['rows'],
+                        customers=options['customers'],
+                        products=options['products'],
+                        seed=options['seed'],
+                        skew=options['skew'],
+                        dirty_ratio=options['dirty_ratio'],
+                    )
+                import_metrics, import_request = suite.run_import(path, user, options['batch_size'], options['engine'])
+            finally:
+                os.remove(path)
+            metrics.update(import_metrics)
+            self.stdout.write(f"imported {import_request.rows_inserted} rows, rejected {import_request.rows_rejected}")
+        if not Transaction.objects.exists():
+            raise CommandError("No transactions to read, include the import scenario.")
+        if 'list' in options['scenarios']:
+            metrics.update(suite.run_list(user, options['depths'], options['page_size'], options['repeat']))
+        if 'reports' in options['scenarios']:
+            metrics.update(suite.run_reports(user, options['samples'], options['seed']))
+        return metrics
+
+    def compare(self, baseline, metrics, options):
+        threshold = baseline['threshold'] if options['threshold'] is None else options['threshold']
+        if baseline['environment'] != suite.environment():
+            self.stderr.write(
+                f"The baseline was recorded on {baseline['environment']}, this run is on {suite.environment()}."
+            )
+        rows = suite.compare(baseline['metrics'], metrics, threshold)
+        self.report(rows)
+        regressed = [metric for metric, _, _, _, is_regressed in rows if is_regressed]
+        if regressed:
+            raise CommandError(
+                f"{len(regressed)} metric(s) regressed by more than {threshold:.0%}: {', '.join(regressed)}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"No metric regressed by more than {threshold:.0%}."))
+
+    def report(self, rows):
+        self.stdout.write(f"{'metric':<28}{'baseline':>12}{'current':>12}{'change':>9}")
+        for metric, base, value, change, regressed in rows:
+            base = f"{base:>12.2f}" if base is not None else f"{'-':>12}"
+            change = f"{change:>+9.0%}" if change is not None else f"{'':>9}"
+            self.stdout.write(f"{metric:<28}{base}{value:>12.2f}{change}{'  REGRESSED' if regressed else ''}")
@@ -0,0 +1,52 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...benchmarks.data import CSV_HEADER, generate_rows
+from ...columnar import ColumnarValidator, np
+from ...rates import RateTable
+from ...rollups import chunked
+from ...validators import RowValidator, SerializerRowValidator
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/s of the compiled RowValidator and the NumPy columnar engine against "
+        "ImportTransactionSerializer. Times include parsing the CSV lines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        lines = [','.join(values) + '\n' for values in generate_rows(options['rows'], seed=options['seed'])]
+        context = {'rate_table': RateTable.load()}
+        engines = [
+            ('serializer', lambda: self.validate_rows(SerializerRowValidator(context=context), lines)),
+            ('compiled', lambda: self.validate_rows(RowValidator(context=context), lines)),
+        ]
+        if np is not None:
+            validator = ColumnarValidator(RowValidator(context=context), context['rate_table'])
+            engines.append(('columnar', lambda: [
+                validated_data
+                for chunk in chunked(lines, options['chunk_size'])
+                for _, validated_data, _ in validator.validate_chunk(chunk, CSV_HEADER)
+            ]))
+        else:
+            self.stderr.write("NumPy is not installed, skipping the columnar engine.")
+
+        results = {}
+        for name, validate in engines:
+            started = time.perf_counter()
+            results[name] = validate()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{name:<12}{elapsed:8.2f} s {len(lines) / elapsed:12.0f} rows/s")
+
+        if any(result != results['serializer'] for result in results.values()):
+            self.stderr.write("Validators produced different results.")
+
+    def validate_rows(self, validator, lines):
+        return [validator.validate(row)[0] for row in csv.DictReader(lines, fieldnames=CSV_HEADER)]
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ... import storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite stored UUIDs and amounts in the representation selected by TRANSACTIONS_COMPACT_STORAGE, "
+        "after changing it on a migrated SQLite database. Rows already converted are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vacuum', action='store_true', help="Rebuild the database file to release freed pages.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Compact storage only applies to SQLite.")
+        compact = settings.TRANSACTIONS_COMPACT_STORAGE
+        converted = storage.convert(compact)
+        self.stdout.write(f"{converted} rows converted to the {'compact' if compact else 'default'} representation.")
+        if options['vacuum']:
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
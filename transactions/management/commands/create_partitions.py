@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import partitions
+
+
+class Command(BaseCommand):
+    help = "Create the monthly partitions of the transactions table for this month and the months ahead."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=None,
+                            help="Defaults to TRANSACTIONS_PARTITION_MONTHS_AHEAD.")
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            raise CommandError("The transactions table is not partitioned; partitioning requires PostgreSQL.")
+        created = partitions.ensure_upcoming_partitions(options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"created {name}")
+        self.stdout.write(f"{len(created)} partitions created.")
@@ -0,0 +1,49 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...rates import read_rates, recompute_amounts_in_pln, save_rates
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a currency,effective_date,rate CSV file and/or recompute "
+        "amount_in_pln of the transactions in a date range from the stored rates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--load', metavar='PATH', help="CSV file of rates to insert or correct.")
+        parser.add_argument(
+            '--recompute',
+            action='store_true',
+            help="Recompute amount_in_pln and the rollups; after --load, from the earliest loaded date "
+                 "of the loaded currencies unless --date-from is given.",
+        )
+        parser.add_argument('--date-from', type=date.fromisoformat)
+        parser.add_argument('--date-to', type=date.fromisoformat)
+        parser.add_argument('--currency', action='append', dest='currencies', metavar='CURRENCY')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not options['load'] and not options['recompute']:
+            raise CommandError("Pass --load, --recompute or both.")
+
+        date_from, currencies = options['date_from'], options['currencies']
+        if options['load']:
+            with open(options['load'], newline='') as fileobj:
+                try:
+                    rates = read_rates(fileobj)
+                except ValueError as exc:
+                    raise CommandError(f"{options['load']}: {exc}")
+            save_rates(rates, batch_size=options['batch_size'])
+            self.stdout.write(f"Loaded {len(rates)} exchange rates.")
+            if not rates:
+                return
+            date_from = date_from or min(rate.effective_date for rate in rates)
+            currencies = currencies or sorted({rate.currency for rate in rates})
+
+        if options['recompute']:
+            updated = recompute_amounts_in_pln(
+                date_from, options['date_to'], currencies, batch_size=options['batch_size'],
+            )
+            self.stdout.write(f"Recomputed amount_in_pln of {updated} transactions.")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from ...benchmarks.data import write_transactions_csv
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic transactions CSV file in the import format."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--skew', type=float, default=0,
+                            help="Zipf exponent of the customer and product distributions, 0 for uniform.")
+        parser.add_argument('--dirty-ratio', type=float, default=0, help="Fraction of invalid rows.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'w', newline='') as fileobj:
+            write_transactions_csv(
+                fileobj,
+                options['rows'],
+                customers=options['customers'],
+                products=options['products'],
+                seed=options['seed'],
+                skew=options['skew'],
+                dirty_ratio=options['dirty_ratio'],
+            )
+        self.stdout.write(f"Written {options['rows']} rows to {options['path']}")
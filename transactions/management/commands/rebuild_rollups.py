@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the customer and product rollup tables from transactions, or verify them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Only report rollups that differ from transactions.")
+        parser.add_argument('--customer', action='append', dest='customer_ids', metavar='CUSTOMER_ID')
+        parser.add_argument('--product', action='append', dest='product_ids', metavar='PRODUCT_ID')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = rollups.verify()
+            for model_name, object_id in mismatches:
+                self.stdout.write(f"{model_name} {object_id} differs from transactions")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} rollups differ from transactions.")
+            self.stdout.write("Rollups match transactions.")
+            return
+
+        rollups.rebuild(options['customer_ids'], options['product_ids'], batch_size=options['batch_size'])
+        self.stdout.write("Rollups rebuilt.")
@@ -1,49 +1,118 @@
+from decimal import Decimal
+
 from django.db import models
-from django.db.models import Count, Max, F, Sum, DecimalField
-from django.db.models.functions import Coalesce
+from django.db.models import Count, Max, F, Sum, Value
+from django.db.models.functions import Coalesce, Round, Trunc
+from django.utils import timezone
+
+from .fields import AmountField
+
+EMPTY_CUSTOMER_SUMMARY = {
+    'total_cost_in_pln': Decimal('0.00'),
+    'count_distinct_product': 0,
+    'last_transaction_datetime': None,
+}
+EMPTY_PRODUCT_SUMMARY = {
+    'sum_quantity': 0,
+    'count_distinct_customer': 0,
+    'total_income_in_pln': Decimal('0.00'),
+}
+
+
+def total_in_pln():
+    # amount_in_pln rounded to its stored precision, the same way rollups.total_in_pln rounds it.
+    # An AmountField output reads the sum back from minor units when they are stored.
+    output_field = AmountField(max_digits=20, decimal_places=2)
+    return Coalesce(
+        Sum(Round('amount_in_pln', 2) * F('quantity')),
+        Value(Decimal('0.00'), output_field=output_field),
+        output_field=output_field,
+    )
+
+
+class TransactionQuerySet(models.QuerySet):
+    def summarize_customers(self):
+        return self.order_by().values('customer_id').annotate(
+            total_cost_in_pln=total_in_pln(),
+            count_distinct_product=Count('product_id', distinct=True),
+            last_transaction_datetime=Max('timestamp'),
+        )
+
+    def summarize_products(self):
+        return self.order_by().values('product_id').annotate(
+            sum_quantity=Sum('quantity'),
+            total_income_in_pln=total_in_pln(),
+            count_distinct_customer=Count('customer_id', distinct=True),
+        )
+
+    def summarize_customer_products(self):
+        return self.order_by().values('customer_id', 'product_id').annotate(transactions=Count('id'))
 
+    def with_period_start(self, period):
+        # Periods are named after the Trunc kinds, evaluated in the default time zone like rollups.period_starts.
+        return self.order_by().annotate(start=Trunc(
+            'timestamp',
+            period,
+            output_field=models.DateField(),
+            tzinfo=timezone.get_default_timezone(),
+        ))
 
-class TransactionManager(models.Manager):
+    def summarize_customer_periods(self, period):
+        return self.with_period_start(period).values('customer_id', 'start').annotate(
+            transactions=Count('id'),
+            total_cost_in_pln=total_in_pln(),
+            last_transaction_datetime=Max('timestamp'),
+        )
+
+    def summarize_product_periods(self, period):
+        return self.with_period_start(period).values('product_id', 'start').annotate(
+            transactions=Count('id'),
+            sum_quantity=Sum('quantity'),
+            total_income_in_pln=total_in_pln(),
+        )
+
+    def summarize_customer_product_periods(self, period):
+        return self.with_period_start(period).values('customer_id', 'product_id', 'start').annotate(
+            transactions=Count('id'),
+        )
+
+
+class TransactionManager(models.Manager.from_queryset(TransactionQuerySet)):
     def for_customer(self, customer_id):
         return self.filter(customer_id=customer_id)
 
     def for_product(self, product_id):
         return self.filter(product_id=product_id)
 
-    def group_by_customer(self, customer_id):
-        transactions = self.for_customer(customer_id)
+    def group_by_customer(self, customer_id, date_from=None, date_to=None):
+        return self.group_by_customers([customer_id], date_from, date_to).popitem()[1]
 
-        aggregated = transactions.aggregate(
-            count_distinct_product=Coalesce(Count('product_id', distinct=True), 0),
-            last_transaction_datetime=Max('timestamp'),
-            total_cost_in_pln=Coalesce(
-                Sum(F('amount_in_pln') * F('quantity')),
-                0.0,
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            ),
-        )
+    def group_by_product(self, product_id, date_from=None, date_to=None):
+        return self.group_by_products([product_id], date_from, date_to).popitem()[1]
 
-        return {
-            'total_cost_in_pln': aggregated['total_cost_in_pln'],
-            'count_distinct_product': aggregated['count_distinct_product'],
-            'last_transaction_datetime': aggregated['last_transaction_datetime'],
-        }
-
-    def group_by_product(self, product_id):
-        transactions = self.for_product(product_id)
-
-        aggregated = transactions.aggregate(
-            sum_quantity=Coalesce(Sum('quantity'), 0),
-            count_distinct_customer=Coalesce(Count('customer_id', distinct=True), 0),
-            total_income_in_pln=Coalesce(
-                Sum(F('amount_in_pln') * F('quantity')),
-                0.0,
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            ),
-        )
+    def group_by_customers(self, customer_ids, date_from=None, date_to=None):
+        # Imported here, reports reads the rollup models defined next to Transaction.
+        from .reports import customer_summaries
+
+        return customer_summaries(customer_ids, date_from, date_to)
+
+    def group_by_products(self, product_ids, date_from=None, date_to=None):
+        from .reports import product_summaries
+
+        return product_summaries(product_ids, date_from, date_to)
+
+    async def agroup_by_customer(self, customer_id, date_from=None, date_to=None):
+        return (await self.agroup_by_customers([customer_id], date_from, date_to)).popitem()[1]
+
+    async def agroup_by_product(self, product_id, date_from=None, date_to=None):
+        return (await self.agroup_by_products([product_id], date_from, date_to)).popitem()[1]
+
+    async def agroup_by_customers(self, customer_ids, date_from=None, date_to=None):
+        from .reports import acustomer_summaries
+
+        return await acustomer_summaries(customer_ids, date_from, date_to)
+
+    async def agroup_by_products(self, product_ids, date_from=None, date_to=None):
+        from .reports import aproduct_summaries
 
-        return {
-            'sum_quantity': aggregated['sum_quantity'],
-            'count_distinct_customer': aggregated['count_distinct_customer'],
-            'total_income_in_pln': aggregated['total_income_in_pln'],
-        }
+        return await aproduct_summaries(product_ids, date_from, date_to)
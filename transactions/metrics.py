@@ -0,0 +1,348 @@
+"""
+Request latency, SQL query count and database time per view, import counters and import queues,
+rendered in the Prometheus text format. Request values live in the memory of each server process,
+so with several workers every process is a separate target (or the values are summed when scraped
+behind one address); import counters and waits are shared through the TRANSACTIONS_METRICS_CACHE
+cache, and queue depths are read from the import requests.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+
+from celery import states
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.utils import timezone
+
+from . import import_stats, report_cache, scheduling
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('transactions.slow_queries')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+WAIT_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 7200)
+
+# QueryStats of the request being served; asgiref copies the context into the threads of
+# sync_to_async, so queries of async views are counted too.
+current_stats = contextvars.ContextVar('transactions_query_stats', default=None)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, label_values, value=1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + value
+
+    def samples(self):
+        with self.lock:
+            series = sorted(self.series.items())
+        for label_values, value in series:
+            yield f'{self.name}{format_labels(self.labels, label_values)} {value}'
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+
+    def observe(self, label_values, value):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                # Observations per bucket (the last one above every bound), sum and count.
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            series = sorted((label_values, [list(counts), total, count])
+                            for label_values, (counts, total, count) in self.series.items())
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, observations in zip((*self.buckets, '+Inf'), counts):
+                cumulative += observations
+                labels = format_labels((*self.labels, 'le'), (*label_values, bound))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {total}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+REQUESTS = Counter(
+    'transactions_http_requests_total', "Requests served, per view, method and status code.",
+    ('view', 'method', 'status'),
+)
+REQUEST_SECONDS = Histogram(
+    'transactions_http_request_duration_seconds', "Time to produce the response, per view.",
+    ('view', 'method'),
+)
+REQUEST_QUERIES = Histogram(
+    'transactions_http_request_queries', "SQL queries executed per request, per view.",
+    ('view', 'method'), QUERY_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    'transactions_http_request_db_duration_seconds', "Time spent executing SQL queries per request, per view.",
+    ('view', 'method'),
+)
+METRICS = (REQUESTS, REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_DB_SECONDS)
+
+IMPORT_STATUSES = (states.SUCCESS, states.FAILURE)
+IMPORT_ROW_STAGES = ('read', 'validated', 'inserted', 'updated', 'skipped', 'rejected')
+
+
+class QueryStats:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0
+
+
+def observe_request(request, response, seconds, stats):
+    match = request.resolver_match
+    view = match.view_name if match else '<unmatched>'
+    REQUESTS.inc((view, request.method, response.status_code))
+    REQUEST_SECONDS.observe((view, request.method), seconds)
+    REQUEST_QUERIES.observe((view, request.method), stats.queries)
+    REQUEST_DB_SECONDS.observe((view, request.method), stats.seconds)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection, counting the queries of the current request."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - started
+        stats.queries += 1
+        stats.seconds += seconds
+    threshold = settings.TRANSACTIONS_SLOW_QUERY_MS
+    if threshold is not None and seconds * 1000 >= threshold:
+        log_slow_query(context, sql, params, many, seconds)
+    return result
+
+
+def explain(connection, sql, params):
+    token = current_stats.set(None)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as exc:
+        return f'EXPLAIN failed: {exc}'
+    finally:
+        current_stats.reset(token)
+
+
+def log_slow_query(context, sql, params, many, seconds):
+    connection = context['connection']
+    if many:
+        query, plan = sql, None
+    else:
+        query = connection.ops.last_executed_query(context['cursor'], sql, params)
+        plan = explain(connection, sql, params) if sql.lstrip()[:6].upper() == 'SELECT' else None
+    slow_query_logger.warning(
+        "Slow query (%.1f ms): %s%s", seconds * 1000, query, f'\n{plan}' if plan else '',
+        extra={'duration': seconds, 'sql': query, 'plan': plan},
+    )
+
+
+def install(connection, **kwargs):
+    """connection_created receiver adding record_query to the execute wrappers of `connection`."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_shared_cache():
+    return caches[settings.TRANSACTIONS_METRICS_CACHE]
+
+
+def shared_key(name):
+    return f'metrics:import:{name}'
+
+
+def import_counters(stats):
+    """Integer counters of the stats of an import request, with seconds counted in microseconds."""
+    counters = {'bytes_read': stats.get('bytes_read', 0), 'batches': stats.get('batches', 0)}
+    for stage in IMPORT_ROW_STAGES:
+        counters[f'rows:{stage}'] = stats.get(f'rows_{stage}', 0)
+    for phase, seconds in stats.get('seconds', {}).items():
+        counters[f'seconds:{phase}'] = round(seconds * 1000000)
+    for bucket, count in stats.get('batch_db_seconds', {}).items():
+        counters[f'batch_db:{bucket}'] = count
+    return counters
+
+
+def record_import(status, stats, previous_stats):
+    """
+    Adds a completed import request to the import counters, which live in the
+    TRANSACTIONS_METRICS_CACHE cache as imports run in Celery workers. A request completed
+    again after a failure only adds what its stats grew by since.
+    """
+    previous = import_counters(previous_stats)
+    deltas = {name: value - previous.get(name, 0) for name, value in import_counters(stats).items()}
+    deltas[f'requests:{status}'] = 1
+    try:
+        add_shared(deltas)
+    except Exception:
+        # Metrics must not fail the import.
+        logger.exception("Could not record the metrics of a %s import.", status)
+
+
+def add_shared(deltas):
+    cache = get_shared_cache()
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        key = shared_key(name)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Evicted between add() and incr().
+            cache.add(key, delta, timeout=None)
+
+
+def wait_bucket(seconds):
+    index = bisect.bisect_left(WAIT_BUCKETS, seconds)
+    return str(WAIT_BUCKETS[index]) if index < len(WAIT_BUCKETS) else '+Inf'
+
+
+def record_import_wait(queue, seconds):
+    """Adds the time an import request waited from its creation to its start to the histogram of its queue."""
+    try:
+        add_shared({
+            f'wait:{queue}:{wait_bucket(seconds)}': 1,
+            f'wait_sum:{queue}': round(seconds * 1000000),
+            f'wait_count:{queue}': 1,
+        })
+    except Exception:
+        logger.exception("Could not record the wait of an import in queue %s.", queue)
+
+
+def render_queue_metrics(lines):
+    """Queue depth and age of the oldest request, read from the requests, and the recorded waits per queue."""
+    queues = scheduling.queue_stats()
+    now = timezone.now()
+    name = 'transactions_import_queue_depth'
+    lines.append(f'# HELP {name} Import requests waiting for a slot of their user, queued in Celery or running.')
+    lines.append(f'# TYPE {name} gauge')
+    for queue, stats in sorted(queues.items()):
+        for state in ('waiting', 'queued', 'running'):
+            lines.append(f'{name}{format_labels(("queue", "state"), (queue, state))} {stats[state]}')
+    name = 'transactions_import_queue_oldest_wait_seconds'
+    lines.append(f'# HELP {name} Time since the oldest import request not started was created.')
+    lines.append(f'# TYPE {name} gauge')
+    for queue, stats in sorted(queues.items()):
+        age = (now - stats['oldest']).total_seconds() if stats['oldest'] else 0
+        lines.append(f'{name}{format_labels(("queue",), (queue,))} {age}')
+
+    buckets = [*(str(bound) for bound in WAIT_BUCKETS), '+Inf']
+    names = [f'wait:{queue}:{bucket}' for queue in queues for bucket in buckets]
+    names += [f'wait_{part}:{queue}' for queue in queues for part in ('sum', 'count')]
+    stored = get_shared_cache().get_many([shared_key(name) for name in names])
+    values = {name: stored.get(shared_key(name), 0) for name in names}
+    name = 'transactions_import_wait_seconds'
+    lines.append(f'# HELP {name} Time from the creation of import requests to their start, per queue.')
+    lines.append(f'# TYPE {name} histogram')
+    for queue in sorted(queues):
+        cumulative = 0
+        for bucket in buckets:
+            cumulative += values[f'wait:{queue}:{bucket}']
+            lines.append(f'{name}_bucket{format_labels(("queue", "le"), (queue, bucket))} {cumulative}')
+        lines.append(f'{name}_sum{format_labels(("queue",), (queue,))} {values[f"wait_sum:{queue}"] / 1000000}')
+        lines.append(f'{name}_count{format_labels(("queue",), (queue,))} {values[f"wait_count:{queue}"]}')
+
+
+def render_import_metrics(lines):
+    names = [f'requests:{status}' for status in IMPORT_STATUSES] + [
+        'bytes_read', 'batches',
+        *(f'rows:{stage}' for stage in IMPORT_ROW_STAGES),
+        *(f'seconds:{phase}' for phase in import_stats.PHASES),
+        *(f'batch_db:{bucket}' for bucket in import_stats.BUCKET_NAMES),
+    ]
+    stored = get_shared_cache().get_many([shared_key(name) for name in names])
+    values = {name: stored.get(shared_key(name), 0) for name in names}
+
+    def counter(name, description, samples):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{labels} {value}' for labels, value in samples)
+
+    counter('transactions_import_requests_total', "Import requests completed, per status.", [
+        (format_labels(('status',), (status,)), values[f'requests:{status}']) for status in IMPORT_STATUSES
+    ])
+    counter('transactions_import_bytes_read_total', "Bytes of CSV rows read by imports.", [
+        ('', values['bytes_read']),
+    ])
+    counter('transactions_import_rows_total', "Rows of imports, per stage.", [
+        (format_labels(('stage',), (stage,)), values[f'rows:{stage}']) for stage in IMPORT_ROW_STAGES
+    ])
+    counter('transactions_import_phase_seconds_total', "Time spent by imports, per phase.", [
+        (format_labels(('phase',), (phase,)), values[f'seconds:{phase}'] / 1000000)
+        for phase in import_stats.PHASES
+    ])
+
+    name = 'transactions_import_batch_db_duration_seconds'
+    lines.append(f'# HELP {name} Time to look up duplicates, insert and update rollups per import batch.')
+    lines.append(f'# TYPE {name} histogram')
+    cumulative = 0
+    for bucket in import_stats.BUCKET_NAMES:
+        cumulative += values[f'batch_db:{bucket}']
+        lines.append(f'{name}_bucket{format_labels(("le",), (bucket,))} {cumulative}')
+    db_seconds = sum(values[f'seconds:{phase}'] for phase in import_stats.DB_PHASES) / 1000000
+    lines.append(f'{name}_sum {db_seconds}')
+    lines.append(f'{name}_count {values["batches"]}')
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.description}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    render_import_metrics(lines)
+    render_queue_metrics(lines)
+
+    # The report cache counts hits and misses in the cache itself, shared by every process.
+    stats = report_cache.stats()
+    for outcome in ('hits', 'misses'):
+        name = f'transactions_report_cache_{outcome}_total'
+        lines.append(f'# HELP {name} Report cache {outcome}, per report kind.')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{format_labels(("kind",), (kind,))} {stats[kind][outcome]}' for kind in stats)
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for metric in METRICS:
+        with metric.lock:
+            metric.series.clear()
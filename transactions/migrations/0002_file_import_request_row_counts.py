@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='rows_inserted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='rows_rejected',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
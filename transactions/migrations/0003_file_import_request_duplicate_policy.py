@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_file_import_request_row_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='duplicate_policy',
+            field=models.CharField(choices=[('skip', 'Skip'), ('overwrite', 'Overwrite'), ('reject', 'Reject row')], default='reject', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='rows_skipped',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='rows_updated',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
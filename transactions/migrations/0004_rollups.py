@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_file_import_request_duplicate_policy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSummary',
+            fields=[
+                ('customer_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('total_cost_in_pln', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('count_distinct_product', models.PositiveIntegerField(default=0)),
+                ('last_transaction_datetime', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductSummary',
+            fields=[
+                ('product_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('sum_quantity', models.PositiveBigIntegerField(default=0)),
+                ('total_income_in_pln', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('count_distinct_customer', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_id', models.UUIDField()),
+                ('product_id', models.UUIDField()),
+                ('transactions', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_id'], name='transaction_product_ab470a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('customer_id', 'product_id'), name='unique_customer_product')],
+            },
+        ),
+    ]
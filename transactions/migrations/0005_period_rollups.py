@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerPeriodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_id', models.UUIDField()),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('start', models.DateField()),
+                ('transactions', models.PositiveIntegerField(default=0)),
+                ('total_cost_in_pln', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('last_transaction_datetime', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('customer_id', 'period', 'start'), name='unique_customer_period')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerProductPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_id', models.UUIDField()),
+                ('product_id', models.UUIDField()),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('start', models.DateField()),
+                ('transactions', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_id', 'period', 'start'], name='transaction_product_ed9730_idx')],
+                'constraints': [models.UniqueConstraint(fields=('customer_id', 'period', 'start', 'product_id'), name='unique_customer_product_period')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductPeriodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.UUIDField()),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('start', models.DateField()),
+                ('transactions', models.PositiveIntegerField(default=0)),
+                ('sum_quantity', models.PositiveBigIntegerField(default=0)),
+                ('total_income_in_pln', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product_id', 'period', 'start'), name='unique_product_period')],
+            },
+        ),
+    ]
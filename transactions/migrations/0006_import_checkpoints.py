@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_period_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.PositiveBigIntegerField()),
+                ('end', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('offset', models.PositiveBigIntegerField()),
+                ('rows_read', models.PositiveBigIntegerField(default=0)),
+                ('rows_inserted', models.PositiveIntegerField(default=0)),
+                ('rows_updated', models.PositiveIntegerField(default=0)),
+                ('rows_skipped', models.PositiveIntegerField(default=0)),
+                ('rows_rejected', models.PositiveIntegerField(default=0)),
+                ('finished', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('import_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='transactions.fileimportrequest')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('import_request', 'start'), name='unique_import_checkpoint')],
+            },
+        ),
+    ]
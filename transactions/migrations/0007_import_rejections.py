@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_import_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='rejection_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='rejections_file',
+            field=models.FileField(blank=True, max_length=150, upload_to='import_rejections/%Y/%m'),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='rejection_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='rejection_parts',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 19:22
+
+import datetime
+from decimal import Decimal
+
+import django.core.validators
+from django.db import migrations, models
+
+# The rates previously hard-coded and applied to transactions of any date.
+INITIAL_RATES = {
+    'EUR': Decimal('4.3'),
+    'USD': Decimal('4.0'),
+}
+
+
+def create_initial_rates(apps, schema_editor):
+    ExchangeRate = apps.get_model('transactions', 'ExchangeRate')
+    ExchangeRate.objects.bulk_create([
+        ExchangeRate(currency=currency, effective_date=datetime.date(1970, 1, 1), rate=rate)
+        for currency, rate in INITIAL_RATES.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_import_rejections'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('PLN', 'PLN'), ('EUR', 'EUR'), ('USD', 'USD')], max_length=3)),
+                ('effective_date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=12, validators=[django.core.validators.MinValueValidator(0)])),
+            ],
+            options={
+                'ordering': ['currency', 'effective_date'],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'effective_date'), name='unique_exchange_rate')],
+            },
+        ),
+        migrations.RunPython(create_initial_rates, migrations.RunPython.noop),
+    ]
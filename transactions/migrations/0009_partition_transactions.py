@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import migrations
+
+from transactions import partitions
+
+
+def partition_transactions(apps, schema_editor):
+    # Partitioning is the PostgreSQL deployment mode; other backends keep the plain table.
+    if schema_editor.connection.vendor == 'postgresql':
+        partitions.partition_table(
+            schema_editor.connection,
+            partitions.months_ahead(settings.TRANSACTIONS_PARTITION_MONTHS_AHEAD),
+        )
+
+
+def unpartition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        partitions.unpartition_table(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_exchange_rates'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_transactions, unpartition_transactions),
+    ]
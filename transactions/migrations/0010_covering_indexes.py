@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_partition_transactions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_custome_bf8a66_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_product_decb82_idx',
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='customer_id',
+            field=models.UUIDField(),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='product_id',
+            field=models.UUIDField(),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['customer_id', 'timestamp'], include=('amount_in_pln', 'quantity', 'product_id'), name='transaction_customer_cover_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['product_id', 'timestamp'], include=('amount_in_pln', 'quantity', 'customer_id'), name='transaction_product_cover_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2 on 2026-10-18 20:23
+
+import django.core.validators
+import transactions.fields
+import uuid
+from django.db import migrations
+
+from transactions import storage
+from transactions.fields import compact_storage
+
+
+def compact(apps, schema_editor):
+    if compact_storage(schema_editor.connection):
+        storage.convert(True, schema_editor.connection)
+
+
+def expand(apps, schema_editor):
+    storage.convert(False, schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0010_covering_indexes'),
+    ]
+
+    operations = [
+        # Column types are unchanged; with TRANSACTIONS_COMPACT_STORAGE on SQLite the stored values are rewritten.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='customerperiodsummary',
+                    name='customer_id',
+                    field=transactions.fields.CompactUUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='customerproduct',
+                    name='customer_id',
+                    field=transactions.fields.CompactUUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='customerproduct',
+                    name='product_id',
+                    field=transactions.fields.CompactUUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='customerproductperiod',
+                    name='customer_id',
+                    field=transactions.fields.CompactUUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='customerproductperiod',
+                    name='product_id',
+                    field=transactions.fields.CompactUUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='customersummary',
+                    name='customer_id',
+                    field=transactions.fields.CompactUUIDField(primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='productperiodsummary',
+                    name='product_id',
+                    field=transactions.fields.CompactUUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='productsummary',
+                    name='product_id',
+                    field=transactions.fields.CompactUUIDField(primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='amount',
+                    field=transactions.fields.AmountField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(0)]),
+                ),
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='amount_in_pln',
+                    field=transactions.fields.AmountField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(0)]),
+                ),
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='customer_id',
+                    field=transactions.fields.CompactUUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='id',
+                    field=transactions.fields.CompactUUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='product_id',
+                    field=transactions.fields.CompactUUIDField(),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(compact, expand),
+            ],
+        ),
+    ]
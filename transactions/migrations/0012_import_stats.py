@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0011_compact_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='profile',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='profile_file',
+            field=models.FileField(blank=True, max_length=150, upload_to='import_profiles/%Y/%m'),
+        ),
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='profile_parts',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 21:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0012_import_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=100)),
+                ('size', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('parts', models.JSONField(blank=True, default=list)),
+                ('checksum', models.CharField(blank=True, max_length=64)),
+                ('duplicate_policy', models.CharField(choices=[('skip', 'Skip'), ('overwrite', 'Overwrite'), ('reject', 'Reject row')], default='reject', max_length=10)),
+                ('profile', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('import_request', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='transactions.fileimportrequest')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 21:27
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_dispatched(apps, schema_editor):
+    # Earlier requests were sent to Celery when they were created.
+    FileImportRequest = apps.get_model('transactions', 'FileImportRequest')
+    FileImportRequest.objects.update(dispatched_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0013_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fileimportrequest',
+            name='queue',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='fileimportrequest',
+            index=models.Index(fields=['status', 'queue'], name='import_request_queue_idx'),
+        ),
+        migrations.RunPython(mark_dispatched, migrations.RunPython.noop),
+    ]
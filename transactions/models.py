@@ -6,32 +6,33 @@ from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
 
-from .choices import CurrencyChoices
+from .choices import CurrencyChoices, DuplicatePolicyChoices, PeriodChoices
+from .fields import AmountField, CompactUUIDField
 from .managers import TransactionManager
 
 logger = logging.getLogger(__name__)
 
 
 class Transaction(models.Model):
-    id = models.UUIDField(
+    id = CompactUUIDField(
         primary_key=True,
         default=uuid.uuid4,
         editable=False
     )
     timestamp = models.DateTimeField(db_index=True)
-    amount = models.DecimalField(
+    amount = AmountField(
         max_digits=12,
         decimal_places=2,
         validators=[MinValueValidator(0)]
     )
-    amount_in_pln = models.DecimalField(
+    amount_in_pln = AmountField(
         max_digits=12,
         decimal_places=2,
         validators=[MinValueValidator(0)]
     )
     currency = models.CharField(max_length=3, choices=CurrencyChoices.choices)
-    customer_id = models.UUIDField(db_index=True)
-    product_id = models.UUIDField(db_index=True)
+    customer_id = CompactUUIDField()
+    product_id = CompactUUIDField()
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -40,15 +41,137 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        # customer_id and product_id lookups use the leading column of these indexes. The
+        # included columns let PostgreSQL answer the report queries from the index alone;
+        # SQLite ignores INCLUDE and reads them from the table.
         indexes = [
-            models.Index(fields=['customer_id', 'timestamp']),
-            models.Index(fields=['product_id', 'timestamp']),
+            models.Index(
+                fields=['customer_id', 'timestamp'],
+                include=['amount_in_pln', 'quantity', 'product_id'],
+                name='transaction_customer_cover_idx',
+            ),
+            models.Index(
+                fields=['product_id', 'timestamp'],
+                include=['amount_in_pln', 'quantity', 'customer_id'],
+                name='transaction_product_cover_idx',
+            ),
         ]
 
     def __str__(self):
         return f"Transaction[{self.id}] {self.amount} {self.currency}"
 
 
+class ExchangeRate(models.Model):
+    """PLN value of one unit of `currency` for transactions from `effective_date` until the next rate."""
+    currency = models.CharField(max_length=3, choices=CurrencyChoices.choices)
+    effective_date = models.DateField()
+    rate = models.DecimalField(max_digits=12, decimal_places=6, validators=[MinValueValidator(0)])
+
+    class Meta:
+        ordering = ['currency', 'effective_date']
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'effective_date'], name='unique_exchange_rate'),
+        ]
+
+    def __str__(self):
+        return f"ExchangeRate[{self.currency} {self.effective_date}] {self.rate}"
+
+
+class CustomerSummary(models.Model):
+    customer_id = CompactUUIDField(primary_key=True)
+    total_cost_in_pln = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    count_distinct_product = models.PositiveIntegerField(default=0)
+    last_transaction_datetime = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"CustomerSummary[{self.customer_id}]"
+
+
+class ProductSummary(models.Model):
+    product_id = CompactUUIDField(primary_key=True)
+    sum_quantity = models.PositiveBigIntegerField(default=0)
+    total_income_in_pln = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    count_distinct_customer = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"ProductSummary[{self.product_id}]"
+
+
+class CustomerProduct(models.Model):
+    """Distinct (customer, product) pairs backing the distinct counts of the summaries."""
+    customer_id = CompactUUIDField()
+    product_id = CompactUUIDField()
+    transactions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer_id', 'product_id'], name='unique_customer_product'),
+        ]
+        indexes = [
+            models.Index(fields=['product_id']),
+        ]
+
+    def __str__(self):
+        return f"CustomerProduct[{self.customer_id}, {self.product_id}]"
+
+
+class CustomerPeriodSummary(models.Model):
+    customer_id = CompactUUIDField()
+    period = models.CharField(max_length=5, choices=PeriodChoices.choices)
+    start = models.DateField()
+    transactions = models.PositiveIntegerField(default=0)
+    total_cost_in_pln = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    last_transaction_datetime = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer_id', 'period', 'start'], name='unique_customer_period'),
+        ]
+
+    def __str__(self):
+        return f"CustomerPeriodSummary[{self.customer_id} {self.period} {self.start}]"
+
+
+class ProductPeriodSummary(models.Model):
+    product_id = CompactUUIDField()
+    period = models.CharField(max_length=5, choices=PeriodChoices.choices)
+    start = models.DateField()
+    transactions = models.PositiveIntegerField(default=0)
+    sum_quantity = models.PositiveBigIntegerField(default=0)
+    total_income_in_pln = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_id', 'period', 'start'], name='unique_product_period'),
+        ]
+
+    def __str__(self):
+        return f"ProductPeriodSummary[{self.product_id} {self.period} {self.start}]"
+
+
+class CustomerProductPeriod(models.Model):
+    """Distinct (customer, product) pairs per period, for distinct counts over date ranges."""
+    customer_id = CompactUUIDField()
+    product_id = CompactUUIDField()
+    period = models.CharField(max_length=5, choices=PeriodChoices.choices)
+    start = models.DateField()
+    transactions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['customer_id', 'period', 'start', 'product_id'],
+                name='unique_customer_product_period',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['product_id', 'period', 'start']),
+        ]
+
+    def __str__(self):
+        return f"CustomerProductPeriod[{self.customer_id}, {self.product_id} {self.period} {self.start}]"
+
+
 class FileImportRequest(models.Model):
     ALL_STATES = sorted(states.ALL_STATES)
     TASK_STATE_CHOICES = sorted(zip(ALL_STATES, ALL_STATES))
@@ -68,11 +191,107 @@ class FileImportRequest(models.Model):
         blank=True,
         max_length=150,
     )
+    duplicate_policy = models.CharField(
+        max_length=10,
+        choices=DuplicatePolicyChoices.choices,
+        default=DuplicatePolicyChoices.REJECT,
+    )
     exception_meta = models.JSONField(blank=True, default=dict)
+    rows_inserted = models.PositiveIntegerField(default=0)
+    rows_updated = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    rejection_counts = models.JSONField(blank=True, default=dict)
+    rejections_file = models.FileField(
+        upload_to='import_rejections/%Y/%m',
+        blank=True,
+        max_length=150,
+    )
+    stats = models.JSONField(blank=True, default=dict)
+    profile = models.BooleanField(default=False)
+    profile_file = models.FileField(
+        upload_to='import_profiles/%Y/%m',
+        blank=True,
+        max_length=150,
+    )
+    # Celery queue picked by file size, and when the import was sent to it; PENDING requests
+    # without `dispatched_at` wait for a slot of their user (see transactions.scheduling).
+    queue = models.CharField(max_length=50, blank=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'queue'], name='import_request_queue_idx'),
+        ]
+
     def __str__(self):
         return (
             f'FileImportRequest[id={self.id} status={self.status}'
         )
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of one byte range of an import, saved in the transaction committing each
+    batch so a retried import resumes after the last committed row.
+    """
+    import_request = models.ForeignKey(FileImportRequest, on_delete=models.CASCADE, related_name='checkpoints')
+    start = models.PositiveBigIntegerField()
+    end = models.PositiveBigIntegerField(null=True, blank=True)
+    offset = models.PositiveBigIntegerField()
+    rows_read = models.PositiveBigIntegerField(default=0)
+    rows_inserted = models.PositiveIntegerField(default=0)
+    rows_updated = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    rejection_counts = models.JSONField(blank=True, default=dict)
+    rejection_parts = models.JSONField(blank=True, default=list)
+    stats = models.JSONField(blank=True, default=dict)
+    profile_parts = models.JSONField(blank=True, default=list)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['import_request', 'start'], name='unique_import_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"ImportCheckpoint[{self.import_request_id} {self.start}-{self.end} at {self.offset}]"
+
+
+class ChunkedUpload(models.Model):
+    """
+    A CSV file (optionally gzipped) uploaded in chunks, each saved to storage as a part. Once
+    finalized, the import task assembles the parts into the file of `import_request`.
+    """
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    filename = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    offset = models.PositiveBigIntegerField(default=0)
+    parts = models.JSONField(blank=True, default=list)
+    checksum = models.CharField(max_length=64, blank=True)
+    duplicate_policy = models.CharField(
+        max_length=10,
+        choices=DuplicatePolicyChoices.choices,
+        default=DuplicatePolicyChoices.REJECT,
+    )
+    profile = models.BooleanField(default=False)
+    import_request = models.OneToOneField(
+        FileImportRequest,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='upload',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"ChunkedUpload[{self.id} {self.filename} at {self.offset}]"
@@ -0,0 +1,198 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+# Not read from the model, so migrations importing this module do not depend on the current models.
+TABLE = 'transactions_transaction'
+PARTITION_KEY = 'timestamp'
+DEFAULT_PARTITION = f'{TABLE}_default'
+# Serializes partition creation between concurrent imports; any constant unique to this module.
+ADVISORY_LOCK_ID = 0x7472616e73
+# First key of the two-key advisory locks taken per transaction id by `lock_ids`; the two-key
+# space does not overlap with single-key locks such as ADVISORY_LOCK_ID.
+ID_LOCK_NAMESPACE = 0x7472
+
+
+def month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def months_ahead(count, today=None):
+    """Returns the current month and the `count` months after it."""
+    month = month_start(today or timezone.now())
+    months = [month]
+    for _ in range(count):
+        months.append(next_month(months[-1]))
+    return months
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned(connection=default_connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def existing_partitions(cursor):
+    cursor.execute(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(%s)",
+        [TABLE],
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def bounds(month):
+    # Literals, as DDL statements take no parameters; the values are always datetimes built here.
+    return f"'{month.isoformat()}'", f"'{next_month(month).isoformat()}'"
+
+
+def ensure_partitions(months, connection=default_connection):
+    """
+    Creates the missing monthly partitions of `months`, moving rows of those months
+    out of the default partition first. Returns the names of the partitions created.
+    """
+    quote_name = connection.ops.quote_name
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        existing = existing_partitions(cursor)
+        missing = sorted({month for month in months if partition_name(month) not in existing})
+        if not missing:
+            return created
+        # The lock is held until the caller's transaction ends, so it is only taken when a partition is missing.
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ADVISORY_LOCK_ID])
+        existing = existing_partitions(cursor)
+        for month in missing:
+            name = partition_name(month)
+            if name in existing:
+                continue
+            lower, upper = bounds(month)
+            cursor.execute(
+                f'CREATE TABLE {quote_name(name)} '
+                f'(LIKE {quote_name(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+            )
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {quote_name(DEFAULT_PARTITION)} '
+                f'WHERE {quote_name(PARTITION_KEY)} >= {lower} AND {quote_name(PARTITION_KEY)} < {upper} '
+                f'RETURNING *) INSERT INTO {quote_name(name)} SELECT * FROM moved'
+            )
+            cursor.execute(
+                f'ALTER TABLE {quote_name(TABLE)} ATTACH PARTITION {quote_name(name)} '
+                f'FOR VALUES FROM ({lower}) TO ({upper})'
+            )
+            created.append(name)
+    return created
+
+
+def index_definitions(cursor, table):
+    cursor.execute(
+        'SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s',
+        [table, f'{table}_pkey'],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def id_lock_key(transaction_id):
+    """Folds a UUID into the signed 32-bit second key of its advisory lock."""
+    value = transaction_id.int
+    key = (value ^ value >> 32 ^ value >> 64 ^ value >> 96) & 0xFFFFFFFF
+    return key - (1 << 32) if key >= 1 << 31 else key
+
+
+def lock_ids(transaction_ids, connection=default_connection):
+    """
+    Locks `transaction_ids` until the current transaction ends. The partitioned table cannot
+    enforce the uniqueness of `id`, so an import takes these locks before it looks up the
+    existing ids of a batch: an import of the same ids in another transaction waits until the
+    first one commits, then finds its rows. Keys are locked in ascending order, so imports do
+    not deadlock on them; ids sharing a key only wait for each other.
+    """
+    keys = sorted({id_lock_key(transaction_id) for transaction_id in transaction_ids})
+    if not keys:
+        return
+    with connection.cursor() as cursor:
+        # unnest() returns the keys in array order, so they are locked one after another in that order.
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(%s, key) FROM unnest(%s::integer[]) AS key', [ID_LOCK_NAMESPACE, keys],
+        )
+
+
+def partition_table(connection, months=()):
+    """
+    Rebuilds the transactions table as a table range-partitioned by month of `timestamp`,
+    with a partition per month holding rows, one per month of `months` and a default
+    partition. The primary key becomes (id, timestamp), as PostgreSQL requires unique
+    constraints to include the partition key; `id` stays unique through the importer's
+    duplicate checks, serialized per id by `lock_ids`. Rows written outside imports (the
+    admin, the ORM) are not checked. Indexes are recreated under their names once the rows
+    are copied.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(TABLE)
+    old_table = quote_name(f'{TABLE}_unpartitioned')
+    with connection.cursor() as cursor:
+        indexes = index_definitions(cursor, TABLE)
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old_table}')
+        cursor.execute(f'ALTER TABLE {old_table} RENAME CONSTRAINT {quote_name(TABLE + "_pkey")} '
+                       f'TO {quote_name(TABLE + "_unpartitioned_pkey")}')
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ({quote_name(PARTITION_KEY)})'
+        )
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {quote_name(TABLE + "_pkey")} '
+                       f'PRIMARY KEY (id, {quote_name(PARTITION_KEY)})')
+        cursor.execute(f'CREATE TABLE {quote_name(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT')
+
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', {quote_name(PARTITION_KEY)} AT TIME ZONE 'UTC') FROM {old_table}"
+        )
+        data_months = {month_start(row[0].replace(tzinfo=dt_timezone.utc)) for row in cursor.fetchall()}
+        for month in sorted(data_months | set(months)):
+            lower, upper = bounds(month)
+            cursor.execute(
+                f'CREATE TABLE {quote_name(partition_name(month))} PARTITION OF {table} '
+                f'FOR VALUES FROM ({lower}) TO ({upper})'
+            )
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old_table}')
+        cursor.execute(f'DROP TABLE {old_table}')
+        for definition in indexes:
+            cursor.execute(definition)
+
+
+def unpartition_table(connection):
+    """Rebuilds the transactions table as a plain table with `id` as its primary key."""
+    quote_name = connection.ops.quote_name
+    table = quote_name(TABLE)
+    old_table = quote_name(f'{TABLE}_partitioned')
+    with connection.cursor() as cursor:
+        indexes = index_definitions(cursor, TABLE)
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old_table}')
+        cursor.execute(f'ALTER TABLE {old_table} RENAME CONSTRAINT {quote_name(TABLE + "_pkey")} '
+                       f'TO {quote_name(TABLE + "_partitioned_pkey")}')
+        cursor.execute(f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {quote_name(TABLE + "_pkey")} PRIMARY KEY (id)')
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old_table}')
+        cursor.execute(f'DROP TABLE {old_table} CASCADE')
+        for definition in indexes:
+            cursor.execute(definition)
+
+
+def ensure_upcoming_partitions(count=None, connection=default_connection):
+    """Creates the partitions of this month and the TRANSACTIONS_PARTITION_MONTHS_AHEAD months after it."""
+    if not is_partitioned(connection):
+        return []
+    if count is None:
+        count = settings.TRANSACTIONS_PARTITION_MONTHS_AHEAD
+    return ensure_partitions(months_ahead(count), connection)
@@ -0,0 +1,142 @@
+import csv
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Q, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from . import rollups
+from .choices import CurrencyChoices
+from .fields import compact_storage
+from .models import ExchangeRate, Transaction
+from .rollups import CENT, start_of_day
+
+BASE_CURRENCY = CurrencyChoices.PLN
+RATE_FIELDS = ['currency', 'effective_date', 'rate']
+
+
+def to_pln(amount, rate):
+    # Rounded half away from zero, like the ROUND() of `recompute_amounts_in_pln`.
+    return (amount * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class RateTable:
+    """
+    Exchange rates of each currency sorted by effective date. A rate applies from its
+    effective date, in the default time zone, until the next one, and is found by
+    bisecting the dates, so a lookup stays O(log n) in the number of rates.
+    """
+
+    def __init__(self, rates=()):
+        self.dates = defaultdict(list)
+        self.rates = defaultdict(list)
+        for currency, effective_date, rate in sorted(rates):
+            self.dates[currency].append(effective_date)
+            self.rates[currency].append(Decimal(rate))
+        self.tz = timezone.get_default_timezone()
+
+    @classmethod
+    def load(cls, currencies=None):
+        rates = ExchangeRate.objects.all()
+        if currencies is not None:
+            rates = rates.filter(currency__in=currencies)
+        return cls(rates.values_list('currency', 'effective_date', 'rate'))
+
+    def get_rate(self, currency, day):
+        """Returns the rate of `currency` effective on `day`, or None before its first rate."""
+        if currency == BASE_CURRENCY:
+            return Decimal(1)
+        index = bisect_right(self.dates.get(currency, ()), day) - 1
+        return self.rates[currency][index] if index >= 0 else None
+
+    def day(self, timestamp):
+        return timestamp.astimezone(self.tz).date()
+
+    def segments(self, currency):
+        """Yields `(first_day, end_day, rate)` for each rate of `currency`, the last one open-ended."""
+        dates = self.dates.get(currency, [])
+        for index, first_day in enumerate(dates):
+            end_day = dates[index + 1] if index + 1 < len(dates) else None
+            yield first_day, end_day, self.rates[currency][index]
+
+
+def read_rates(fileobj):
+    """
+    Parses a `currency,effective_date,rate` CSV file into unsaved ExchangeRate rows,
+    raising ValueError with the line number of the first invalid row.
+    """
+    rates = []
+    reader = csv.DictReader(fileobj)
+    if reader.fieldnames != RATE_FIELDS:
+        raise ValueError(f"Expected the header {','.join(RATE_FIELDS)}, got {reader.fieldnames}.")
+    for row in reader:
+        try:
+            if row['currency'] not in CurrencyChoices.values or row['currency'] == BASE_CURRENCY:
+                raise ValueError(f"unsupported currency {row['currency']!r}")
+            rate = Decimal(row['rate'])
+            if not rate.is_finite() or rate <= 0:
+                raise ValueError(f"rate must be positive, got {row['rate']!r}")
+            rates.append(ExchangeRate(
+                currency=row['currency'],
+                effective_date=date.fromisoformat(row['effective_date']),
+                rate=rate,
+            ))
+        except (InvalidOperation, TypeError, ValueError) as exc:
+            raise ValueError(f"Line {reader.line_num}: {exc}") from exc
+    return rates
+
+
+def save_rates(rates, batch_size=5000):
+    """Inserts `rates`, replacing the rate of existing (currency, effective_date) pairs."""
+    ExchangeRate.objects.bulk_create(
+        rates,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['currency', 'effective_date'],
+        update_fields=['rate'],
+    )
+
+
+def recompute_amounts_in_pln(date_from=None, date_to=None, currencies=None, batch_size=5000):
+    """
+    Recomputes `amount_in_pln` of the transactions between the `date_from` and inclusive
+    `date_to` days with one UPDATE per rate in effect, then rebuilds the rollups of the
+    customers and products involved. Returns the number of transactions updated.
+    """
+    table = RateTable.load(currencies)
+    # Compact amounts are already integer minor units, so the product is rounded to whole units.
+    places = 0 if compact_storage(connection) else 2
+    end_of_range = date_to + timedelta(days=1) if date_to is not None else None
+    updated = 0
+    customer_ids, product_ids = set(), set()
+    with transaction.atomic():
+        for currency in table.dates:
+            if currency == BASE_CURRENCY:
+                continue
+            for first_day, end_day, rate in table.segments(currency):
+                if date_from is not None:
+                    first_day = max(first_day, date_from)
+                if end_of_range is not None:
+                    end_day = end_of_range if end_day is None else min(end_day, end_of_range)
+                if end_day is not None and first_day >= end_day:
+                    continue
+                segment = Q(currency=currency, timestamp__gte=start_of_day(first_day))
+                if end_day is not None:
+                    segment &= Q(timestamp__lt=start_of_day(end_day))
+                transactions = Transaction.objects.filter(segment).order_by()
+                for customer_id, product_id in transactions.values_list('customer_id', 'product_id').distinct():
+                    customer_ids.add(customer_id)
+                    product_ids.add(product_id)
+                updated += transactions.update(amount_in_pln=Round(
+                    F('amount') * Value(rate, output_field=DecimalField()), places, output_field=DecimalField(),
+                ))
+
+        for chunk in rollups.chunked(customer_ids, batch_size):
+            rollups.rebuild(customer_ids=chunk, product_ids=[], batch_size=batch_size)
+        for chunk in rollups.chunked(product_ids, batch_size):
+            rollups.rebuild(customer_ids=[], product_ids=chunk, batch_size=batch_size)
+    return updated
@@ -0,0 +1,84 @@
+import gzip
+import json
+import tempfile
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import ErrorDetail
+
+DUPLICATE_ERRORS = {'transaction_id': [ErrorDetail('Transaction with this id already exists.', code='unique')]}
+
+
+def error_types(errors):
+    """Yields a `field:code` type per error detail, e.g. `amount:invalid`."""
+    for field, details in errors.items():
+        for detail in details if isinstance(details, list) else [details]:
+            yield f"{field}:{getattr(detail, 'code', 'invalid')}"
+
+
+def part_name(import_request_id, start, offset):
+    return f'import_rejections/parts/{import_request_id}/{start}-{offset}.ndjson.gz'
+
+
+class RejectionSink:
+    """
+    Collects the rejected rows of one byte range of an import. Rows are written as
+    one gzipped NDJSON part per committed batch, named after the offset the batch
+    started at, so the batch repeated by a resumed import replaces its part.
+    """
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        self.rows = []
+        self.counts = Counter(checkpoint.rejection_counts)
+        self.parts = list(checkpoint.rejection_parts)
+
+    def add(self, row, line, errors):
+        self.rows.append(json.dumps({'row': row, 'line': line, 'errors': errors}))
+        self.counts.update(error_types(errors))
+
+    def flush(self, offset):
+        """Writes the rows rejected since the checkpoint at `offset` and records them on the checkpoint."""
+        if self.rows:
+            name = part_name(self.checkpoint.import_request_id, self.checkpoint.start, offset)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            content = gzip.compress(('\n'.join(self.rows) + '\n').encode('utf-8'))
+            self.parts.append(default_storage.save(name, ContentFile(content)))
+            self.rows = []
+        self.checkpoint.rejection_counts = dict(self.counts)
+        self.checkpoint.rejection_parts = self.parts
+
+
+def complete_rejections(import_request):
+    """
+    Merges the rejection parts of every range into the request's gzipped NDJSON artifact,
+    numbering rows from the first one after the header, and totals the counts by error type.
+    """
+    checkpoints = list(import_request.checkpoints.order_by('start'))
+    counts = Counter()
+    for checkpoint in checkpoints:
+        counts.update(checkpoint.rejection_counts)
+    import_request.rejection_counts = dict(counts)
+    parts = [name for checkpoint in checkpoints for name in checkpoint.rejection_parts]
+    if not parts:
+        return
+
+    rows_before = 0
+    with tempfile.TemporaryFile() as artifact:
+        with gzip.GzipFile(fileobj=artifact, mode='wb') as output:
+            for checkpoint in checkpoints:
+                for name in checkpoint.rejection_parts:
+                    with default_storage.open(name, 'rb') as part, gzip.GzipFile(fileobj=part) as rows:
+                        for row in rows:
+                            rejection = json.loads(row)
+                            rejection['row'] += rows_before
+                            output.write(json.dumps(rejection).encode('utf-8') + b'\n')
+                rows_before += checkpoint.rows_read
+        artifact.seek(0)
+        import_request.rejections_file.save(f'{import_request.id}.ndjson.gz', File(artifact), save=False)
+    import_request.checkpoints.update(rejection_parts=[])
+    for name in parts:
+        default_storage.delete(name)
@@ -0,0 +1,190 @@
+import hashlib
+import logging
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER = 'customer'
+PRODUCT = 'product'
+KINDS = (CUSTOMER, PRODUCT)
+
+
+def get_cache():
+    return caches[settings.TRANSACTIONS_REPORT_CACHE]
+
+
+def version_key(kind, id_):
+    return f'report:{kind}:{uuid.UUID(str(id_))}:version'
+
+
+def entry_key(kind, id_, version, date_from=None, date_to=None):
+    date_from = date_from.isoformat() if date_from else ''
+    date_to = date_to.isoformat() if date_to else ''
+    return f'report:{kind}:{uuid.UUID(str(id_))}:{version}:{date_from}:{date_to}'
+
+
+def counter_key(kind, outcome):
+    return f'report:{kind}:{outcome}'
+
+
+def new_version():
+    return time.time_ns()
+
+
+def get_versions(kind, ids):
+    """Returns the current version of each of the `kind` ids, starting one for ids without."""
+    cache = get_cache()
+    keys = {version_key(kind, id_): id_ for id_ in ids}
+    versions = {keys[key]: version for key, version in cache.get_many(list(keys)).items()}
+    for key, id_ in keys.items():
+        if id_ not in versions:
+            version = new_version()
+            # Another request may have stored a version first.
+            versions[id_] = version if cache.add(key, version, timeout=None) else cache.get(key, version)
+    return versions
+
+
+def invalidate(kind, ids):
+    """Gives every report of the `kind` ids a new version, orphaning their cached entries."""
+    version = new_version()
+    get_cache().set_many({version_key(kind, id_): version for id_ in ids}, timeout=None)
+
+
+def invalidate_on_commit(customer_ids, product_ids):
+    def invalidate_touched():
+        invalidate(CUSTOMER, customer_ids)
+        invalidate(PRODUCT, product_ids)
+    # Robust, so an unavailable cache backend fails the invalidation and not the committed batch.
+    transaction.on_commit(invalidate_touched, robust=True)
+
+
+def clear():
+    get_cache().clear()
+
+
+def count(kind, outcome, delta=1):
+    if not delta:
+        return
+    cache = get_cache()
+    key = counter_key(kind, outcome)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.add(key, delta, timeout=None)
+
+
+def stats():
+    keys = {counter_key(kind, outcome): (kind, outcome) for kind in KINDS for outcome in ('hits', 'misses')}
+    values = get_cache().get_many(list(keys))
+    result = {kind: {'hits': 0, 'misses': 0} for kind in KINDS}
+    for key, (kind, outcome) in keys.items():
+        result[kind][outcome] = values.get(key, 0)
+    return result
+
+
+def lookup_many(kind, ids, date_from, date_to):
+    """Returns the entry keys of the `kind` ids and their cached reports keyed by id."""
+    cache = get_cache()
+    versions = get_versions(kind, ids)
+    keys = {id_: entry_key(kind, id_, versions[id_], date_from, date_to) for id_ in ids}
+    cached = cache.get_many(list(keys.values()))
+    reports = {id_: cached[key] for id_, key in keys.items() if key in cached}
+    count(kind, 'hits', len(reports))
+    count(kind, 'misses', len(ids) - len(reports))
+    return keys, reports
+
+
+def store_many(keys, reports):
+    get_cache().set_many(
+        {keys[id_]: report for id_, report in reports.items()},
+        timeout=settings.TRANSACTIONS_REPORT_CACHE_TIMEOUT,
+    )
+
+
+def get_or_compute_many(kind, ids, date_from, date_to, compute):
+    """
+    Returns the reports of the `kind` ids keyed by id, calling `compute` once with the
+    list of ids missing from the cache.
+    """
+    keys, reports = lookup_many(kind, ids, date_from, date_to)
+    missing = [id_ for id_ in ids if id_ not in reports]
+    if missing:
+        computed = compute(missing)
+        store_many(keys, computed)
+        reports.update(computed)
+    return reports
+
+
+# Django cache backends run their async methods in a thread, one switch per call, so the async
+# variants run each step of cache calls in a single switch instead.
+async def aget_or_compute_many(kind, ids, date_from, date_to, compute):
+    """Like `get_or_compute_many`, awaiting the coroutine function `compute`."""
+    keys, reports = await sync_to_async(lookup_many)(kind, ids, date_from, date_to)
+    missing = [id_ for id_ in ids if id_ not in reports]
+    if missing:
+        computed = await compute(missing)
+        await sync_to_async(store_many)(keys, computed)
+        reports.update(computed)
+    return reports
+
+
+class CachedReport:
+    """
+    A report of one customer or product over a date range. Entries are keyed by the
+    version of the id, which `invalidate` replaces when its transactions change, so
+    the version also serves as the ETag and Last-Modified of the report.
+    """
+
+    def __init__(self, kind, id_, date_from=None, date_to=None):
+        self.kind = kind
+        self.id = id_
+        self.date_from = date_from
+        self.date_to = date_to
+        self.cache = get_cache()
+        self.version = get_versions(kind, [id_])[id_]
+
+    @property
+    def key(self):
+        return entry_key(self.kind, self.id, self.version, self.date_from, self.date_to)
+
+    @property
+    def etag(self):
+        return hashlib.md5(self.key.encode(), usedforsecurity=False).hexdigest()
+
+    @property
+    def last_modified(self):
+        return self.version // 10 ** 9
+
+    @classmethod
+    async def acreate(cls, kind, id_, date_from=None, date_to=None):
+        return await sync_to_async(cls)(kind, id_, date_from, date_to)
+
+    def lookup(self):
+        report = self.cache.get(self.key)
+        count(self.kind, 'misses' if report is None else 'hits')
+        return report
+
+    def store(self, report):
+        self.cache.set(self.key, report, timeout=settings.TRANSACTIONS_REPORT_CACHE_TIMEOUT)
+
+    def get_or_compute(self, compute):
+        report = self.lookup()
+        if report is None:
+            report = compute()
+            self.store(report)
+        return report
+
+    async def aget_or_compute(self, compute):
+        report = await sync_to_async(self.lookup)()
+        if report is None:
+            report = await compute()
+            await sync_to_async(self.store)(report)
+        return report
@@ -0,0 +1,229 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, Exists, Max, OuterRef, Q, Sum
+from django.utils import timezone
+
+from .choices import PeriodChoices
+from .managers import EMPTY_CUSTOMER_SUMMARY, EMPTY_PRODUCT_SUMMARY, total_in_pln
+from .models import (
+    CustomerPeriodSummary,
+    CustomerProductPeriod,
+    CustomerSummary,
+    ProductPeriodSummary,
+    ProductSummary,
+    Transaction,
+)
+from .rollups import CENT, as_uuid, next_period_start, start_of_day
+
+
+def local_day(moment):
+    return timezone.localtime(moment, timezone.get_default_timezone()).date()
+
+
+def bucket_filter(period, first, end):
+    buckets = Q(period=period)
+    if first is not None:
+        buckets &= Q(start__gte=first)
+    if end is not None:
+        buckets &= Q(start__lt=end)
+    return buckets
+
+
+def split_range(date_from=None, date_to=None):
+    """
+    Splits the inclusive `date_from`..`date_to` range (None meaning unbounded) into
+    whole months and days answered by bucket rows and partial days at the edges
+    answered by transactions. Returns a list of filters for each.
+    """
+    lower = date_from
+    upper = date_to + timedelta(microseconds=1) if date_to is not None else None
+    if lower is not None and upper is not None and lower >= upper:
+        return [], []
+
+    first_day = end_day = None
+    if lower is not None:
+        first_day = local_day(lower)
+        if start_of_day(first_day) < lower:
+            first_day += timedelta(days=1)
+    if upper is not None:
+        end_day = local_day(upper)
+    if first_day is not None and end_day is not None and first_day >= end_day:
+        return [], [Q(timestamp__gte=lower, timestamp__lt=upper)]
+
+    raw = []
+    if lower is not None and lower < start_of_day(first_day):
+        raw.append(Q(timestamp__gte=lower, timestamp__lt=start_of_day(first_day)))
+    if upper is not None and start_of_day(end_day) < upper:
+        raw.append(Q(timestamp__gte=start_of_day(end_day), timestamp__lt=upper))
+
+    first_month = end_month = None
+    if first_day is not None:
+        first_month = first_day if first_day.day == 1 else next_period_start(PeriodChoices.MONTH, first_day)
+    if end_day is not None:
+        end_month = end_day.replace(day=1)
+    if first_month is not None and end_month is not None and first_month >= end_month:
+        return [bucket_filter(PeriodChoices.DAY, first_day, end_day)], raw
+
+    buckets = [bucket_filter(PeriodChoices.MONTH, first_month, end_month)]
+    if first_day is not None and first_day < first_month:
+        buckets.append(bucket_filter(PeriodChoices.DAY, first_day, first_month))
+    if end_day is not None and end_month < end_day:
+        buckets.append(bucket_filter(PeriodChoices.DAY, end_month, end_day))
+    return buckets, raw
+
+
+def any_of(parts, **filters):
+    # Repeating `filters` in every alternative keeps each one a single index range scan.
+    combined = Q()
+    for part in parts:
+        combined |= Q(part, **filters)
+    return combined
+
+
+# Reports are computed by plans: generators yielding the querysets they read and receiving
+# their rows, so the same code runs on the sync and on the async ORM.
+def run(plan):
+    """Runs a report plan, evaluating each queryset it yields and sending back its rows."""
+    try:
+        queryset = next(plan)
+        while True:
+            queryset = plan.send(list(queryset))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun(plan):
+    """Runs a report plan like `run`, evaluating its querysets with async iteration."""
+    try:
+        queryset = next(plan)
+        while True:
+            queryset = plan.send([row async for row in queryset])
+    except StopIteration as stop:
+        return stop.value
+
+
+def plan_distinct_counts(key, other, ids, buckets, raw):
+    """
+    Counts distinct `other` ids per `key` id from pair buckets, adding the pairs only
+    seen in the raw edges of the range, with grouped queries.
+    """
+    parts = []
+    if buckets:
+        parts.append(CustomerProductPeriod.objects.filter(any_of(buckets, **{f'{key}__in': ids})))
+    if raw:
+        transactions = Transaction.objects.filter(any_of(raw, **{f'{key}__in': ids})).order_by()
+        if buckets:
+            transactions = transactions.exclude(Exists(CustomerProductPeriod.objects.filter(
+                any_of(buckets, **{key: OuterRef(key), other: OuterRef(other)}),
+            )))
+        parts.append(transactions)
+
+    counts = defaultdict(int)
+    for part in parts:
+        rows = yield part.values(key).annotate(count=Count(other, distinct=True)).values_list(key, 'count')
+        for id_, count in rows:
+            counts[id_] += count
+    return counts
+
+
+def customer_summaries(customer_ids, date_from=None, date_to=None):
+    """
+    Returns report values for each of `customer_ids` over the inclusive date range,
+    with one grouped query per source table whatever the number of ids.
+    """
+    return run(plan_customer_summaries(customer_ids, date_from, date_to))
+
+
+async def acustomer_summaries(customer_ids, date_from=None, date_to=None):
+    return await arun(plan_customer_summaries(customer_ids, date_from, date_to))
+
+
+def plan_customer_summaries(customer_ids, date_from=None, date_to=None):
+    customer_ids = [as_uuid(customer_id) for customer_id in customer_ids]
+    summaries = {customer_id: dict(EMPTY_CUSTOMER_SUMMARY) for customer_id in customer_ids}
+    if date_from is None and date_to is None:
+        for row in (yield CustomerSummary.objects.filter(customer_id__in=customer_ids).values(
+            'customer_id', *EMPTY_CUSTOMER_SUMMARY,
+        )):
+            summaries[row.pop('customer_id')] = row
+        return summaries
+
+    buckets, raw = split_range(date_from, date_to)
+    parts = []
+    if buckets:
+        parts.append(CustomerPeriodSummary.objects.filter(any_of(buckets, customer_id__in=customer_ids)).values(
+            'customer_id',
+        ).annotate(
+            total=Sum('total_cost_in_pln'),
+            last=Max('last_transaction_datetime'),
+        ).order_by())
+    if raw:
+        parts.append(Transaction.objects.filter(any_of(raw, customer_id__in=customer_ids)).order_by().values(
+            'customer_id',
+        ).annotate(
+            total=total_in_pln(),
+            last=Max('timestamp'),
+        ))
+    for part in parts:
+        for row in (yield part):
+            summary = summaries[row['customer_id']]
+            summary['total_cost_in_pln'] = (summary['total_cost_in_pln'] + (row['total'] or 0)).quantize(CENT)
+            last = summary['last_transaction_datetime']
+            if last is None or (row['last'] is not None and row['last'] > last):
+                summary['last_transaction_datetime'] = row['last']
+
+    counts = yield from plan_distinct_counts('customer_id', 'product_id', customer_ids, buckets, raw)
+    for customer_id, count in counts.items():
+        summaries[customer_id]['count_distinct_product'] = count
+    return summaries
+
+
+def product_summaries(product_ids, date_from=None, date_to=None):
+    """
+    Returns report values for each of `product_ids` over the inclusive date range,
+    with one grouped query per source table whatever the number of ids.
+    """
+    return run(plan_product_summaries(product_ids, date_from, date_to))
+
+
+async def aproduct_summaries(product_ids, date_from=None, date_to=None):
+    return await arun(plan_product_summaries(product_ids, date_from, date_to))
+
+
+def plan_product_summaries(product_ids, date_from=None, date_to=None):
+    product_ids = [as_uuid(product_id) for product_id in product_ids]
+    summaries = {product_id: dict(EMPTY_PRODUCT_SUMMARY) for product_id in product_ids}
+    if date_from is None and date_to is None:
+        for row in (yield ProductSummary.objects.filter(product_id__in=product_ids).values(
+            'product_id', *EMPTY_PRODUCT_SUMMARY,
+        )):
+            summaries[row.pop('product_id')] = row
+        return summaries
+
+    buckets, raw = split_range(date_from, date_to)
+    parts = []
+    if buckets:
+        parts.append(ProductPeriodSummary.objects.filter(any_of(buckets, product_id__in=product_ids)).values(
+            'product_id',
+        ).annotate(
+            units=Sum('sum_quantity'),
+            total=Sum('total_income_in_pln'),
+        ).order_by())
+    if raw:
+        parts.append(Transaction.objects.filter(any_of(raw, product_id__in=product_ids)).order_by().values(
+            'product_id',
+        ).annotate(
+            units=Sum('quantity'),
+            total=total_in_pln(),
+        ))
+    for part in parts:
+        for row in (yield part):
+            summary = summaries[row['product_id']]
+            summary['sum_quantity'] += row['units'] or 0
+            summary['total_income_in_pln'] = (summary['total_income_in_pln'] + (row['total'] or 0)).quantize(CENT)
+
+    counts = yield from plan_distinct_counts('product_id', 'customer_id', product_ids, buckets, raw)
+    for product_id, count in counts.items():
+        summaries[product_id]['count_distinct_customer'] = count
+    return summaries
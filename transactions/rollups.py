@@ -0,0 +1,413 @@
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import report_cache
+from .choices import PeriodChoices
+from .models import (
+    CustomerPeriodSummary,
+    CustomerProduct,
+    CustomerProductPeriod,
+    CustomerSummary,
+    ProductPeriodSummary,
+    ProductSummary,
+    Transaction,
+)
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+# Rows written per statement by `increment_rows`, and keys selected per query by `key_filter`.
+INCREMENT_CHUNK_SIZE = 1000
+KEY_FILTER_CHUNK_SIZE = 500
+
+
+def as_uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def total_in_pln(instance):
+    # Rounded to the stored precision half away from zero, like SQL ROUND() in TransactionQuerySet.
+    return Decimal(instance.amount_in_pln).quantize(CENT, rounding=ROUND_HALF_UP) * instance.quantity
+
+
+def period_starts(timestamp):
+    day = timezone.localtime(timestamp, timezone.get_default_timezone()).date()
+    return ((PeriodChoices.DAY, day), (PeriodChoices.MONTH, day.replace(day=1)))
+
+
+def next_period_start(period, start):
+    if period == PeriodChoices.DAY:
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+
+
+def period_bounds(period, start):
+    return start_of_day(start), start_of_day(next_period_start(period, start))
+
+
+def apply_changes(added=(), removed=()):
+    """
+    Folds inserted (`added`) and deleted (`removed`) transactions into the rollup
+    tables. Must be called after the change, in the database transaction making it.
+    """
+    changes = [(1, instance) for instance in added] + [(-1, instance) for instance in removed]
+    if not changes:
+        return
+
+    with transaction.atomic():
+        pair_deltas = defaultdict(lambda: new_delta('transactions'))
+        for sign, instance in changes:
+            delta = pair_deltas[as_uuid(instance.customer_id), as_uuid(instance.product_id)]
+            delta['transactions'] += sign
+            track_latest(delta, sign, instance.timestamp)
+        appeared, vanished = increment_rows(CustomerProduct, ('customer_id', 'product_id'), pair_deltas)
+        update_customer_summaries(changes, appeared, vanished)
+        update_product_summaries(changes, appeared, vanished)
+        update_period_summaries(changes)
+        report_cache.invalidate_on_commit(
+            {customer_id for customer_id, _ in pair_deltas},
+            {product_id for _, product_id in pair_deltas},
+        )
+
+
+def new_delta(*fields):
+    """Returns zero increments of the `fields` of a rollup row, with its latest added and removed timestamps."""
+    return {**dict.fromkeys(fields, 0), 'added': None, 'removed': None}
+
+
+def track_latest(delta, sign, timestamp):
+    key = 'added' if sign > 0 else 'removed'
+    if delta[key] is None or timestamp > delta[key]:
+        delta[key] = timestamp
+
+
+def key_filter(key_fields, keys):
+    """Selects the rows of exactly `keys`; a filter per field would select every combination of their values."""
+    condition = Q(pk__in=[])
+    for key in keys:
+        condition |= Q(**dict(zip(key_fields, key)))
+    return condition
+
+
+def increment_rows(model, key_fields, deltas, counter='transactions', latest=None, latest_source=None):
+    """
+    Adds `deltas`, keyed by `key_fields` values, to the rows of `model`, whose `counter` field
+    counts the transactions or pairs a row aggregates. The database computes the sums: keys only
+    added to are inserted or incremented with INSERT ... ON CONFLICT DO UPDATE, so concurrent
+    imports creating the same row do not conflict, and keys with removals, whose rows exist,
+    are updated with UPDATE ... FROM. Rows are written in key order, so concurrent imports lock
+    them in the same order, and deleted once their counter drops to zero.
+
+    `latest` names a datetime field kept at the latest added timestamp; when the latest one was
+    removed it is recomputed from the transactions queryset `latest_source(*key)`. Returns the
+    keys of the created and of the deleted rows.
+    """
+    fields = [field for field in next(iter(deltas.values()), {}) if field not in ('added', 'removed')]
+    added = {key: delta for key, delta in deltas.items() if delta['removed'] is None}
+    removed = {key: delta for key, delta in deltas.items() if delta['removed'] is not None}
+    counts, stale = {}, set()
+    if added:
+        sql, value_fields = upsert_sql(model, key_fields, fields, counter, latest)
+        rows = [
+            (key, [delta[field] for field in fields] + ([delta['added']] if latest else []))
+            for key, delta in added.items()
+        ]
+        run_increments(model, sql, key_fields, value_fields, rows, counts, stale)
+    if removed:
+        sql, value_fields = decrement_sql(model, key_fields, fields, counter, latest)
+        rows = [
+            (key, [delta[field] for field in fields] + ([delta['added'], delta['removed']] if latest else []))
+            for key, delta in removed.items()
+        ]
+        run_increments(model, sql, key_fields, value_fields, rows, counts, stale)
+
+    created = [key for key, count in counts.items() if key in added and 0 < count == added[key][counter]]
+    deleted = [key for key, count in counts.items() if count <= 0]
+    for chunk in chunked(deleted, KEY_FILTER_CHUNK_SIZE):
+        model.objects.filter(key_filter(key_fields, chunk)).delete()
+    for key in stale.difference(deleted):
+        last = latest_source(*key).aggregate(last=Max('timestamp'))['last']
+        model.objects.filter(**dict(zip(key_fields, key))).update(**{latest: last})
+    return created, [key for key in deleted if key in removed]
+
+
+def greatest_sql():
+    return 'MAX' if connection.vendor == 'sqlite' else 'GREATEST'
+
+
+def upsert_sql(model, key_fields, fields, counter, latest):
+    """
+    Returns the INSERT ... ON CONFLICT DO UPDATE adding its VALUES to the rows of their keys,
+    returning the keys and counters, and the fields of its VALUES, `latest` taking the latest
+    added timestamp.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    value_fields = [*key_fields, *fields, *([latest] if latest else [])]
+    columns = {field: quote_name(model._meta.get_field(field).column) for field in (*key_fields, *fields)}
+    keys = ', '.join(columns[field] for field in key_fields)
+    assignments = [f'{columns[field]} = {table}.{columns[field]} + EXCLUDED.{columns[field]}' for field in fields]
+    inserted = [columns[field] for field in (*key_fields, *fields)]
+    if latest:
+        column = quote_name(model._meta.get_field(latest).column)
+        inserted.append(column)
+        assignments.append(
+            f'{column} = {greatest_sql()}(COALESCE({table}.{column}, EXCLUDED.{column}), '
+            f'COALESCE(EXCLUDED.{column}, {table}.{column}))'
+        )
+    sql = (
+        f'INSERT INTO {table} ({", ".join(inserted)}) VALUES {{values}} '
+        f'ON CONFLICT ({keys}) DO UPDATE SET {", ".join(assignments)} '
+        f'RETURNING {keys}, {columns[counter]}'
+    )
+    return sql, value_fields
+
+
+def decrement_sql(model, key_fields, fields, counter, latest):
+    """
+    Returns the UPDATE ... FROM (VALUES ...) adding its VALUES to the existing rows of their keys,
+    the counter not dropping below zero, and the fields of its VALUES. `latest` is set to NULL,
+    returned, when the latest removed timestamp is not older than it nor than the added ones.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    value_fields = [*key_fields, *fields, *([latest, latest] if latest else [])]
+    # VALUES columns are named column1, column2, ... on both SQLite and PostgreSQL.
+    values = {field: f'd.column{index}' for index, field in enumerate([*key_fields, *fields], 1)}
+    columns = {field: quote_name(model._meta.get_field(field).column) for field in (*key_fields, *fields)}
+    assignments = []
+    for field in fields:
+        increment = f'{table}.{columns[field]} + {values[field]}'
+        if field == counter:
+            increment = f'{greatest_sql()}({increment}, 0)'
+        assignments.append(f'{columns[field]} = {increment}')
+    returned = [columns[field] for field in (*key_fields, counter)]
+    if latest:
+        column = quote_name(model._meta.get_field(latest).column)
+        added, removed = f'd.column{len(values) + 1}', f'd.column{len(values) + 2}'
+        greatest = f'{greatest_sql()}(COALESCE({table}.{column}, {added}), COALESCE({added}, {table}.{column}))'
+        assignments.append(
+            f'{column} = CASE WHEN {removed} >= {table}.{column} AND ({added} IS NULL OR {added} < {removed}) '
+            f'THEN NULL ELSE {greatest} END'
+        )
+        # SQLite 3.40 evaluates expressions of RETURNING over the old row in UPDATE ... FROM;
+        # the column itself is returned as updated.
+        returned.append(column)
+    sql = (
+        f'UPDATE {table} SET {", ".join(assignments)} FROM (VALUES {{values}}) AS d '
+        f'WHERE {" AND ".join(f"{table}.{columns[field]} = {values[field]}" for field in key_fields)} '
+        f'RETURNING {", ".join(returned)}'
+    )
+    return sql, value_fields
+
+
+def run_increments(model, sql, key_fields, value_fields, rows, counts, stale):
+    """
+    Runs `sql` over `rows` of keys and values in key order, a chunk at a time, collecting the
+    returned counter of each key in `counts` and the keys whose latest timestamp to recompute in
+    `stale`.
+    """
+    fields = [model._meta.get_field(field) for field in value_fields]
+    if connection.vendor == 'sqlite':
+        placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    else:
+        # Typed, as a VALUES column of NULLs would be text.
+        placeholder = '(' + ', '.join(f'%s::{field.db_type(connection)}' for field in fields) + ')'
+    size = len(key_fields)
+    # Returned keys go through the converters of the ORM, which read them as the keys of `rows`.
+    columns = [field.get_col(model._meta.db_table) for field in fields[:size]]
+    converters = [connection.ops.get_db_converters(column) + column.get_db_converters(connection) for column in columns]
+    prepared = sorted((
+        [field.get_db_prep_save(value, connection) for field, value in zip(fields, (*key, *values))]
+        for key, values in rows
+    ), key=lambda params: params[:size])
+    with connection.cursor() as cursor:
+        for chunk in chunked(prepared, INCREMENT_CHUNK_SIZE):
+            cursor.execute(
+                sql.format(values=', '.join([placeholder] * len(chunk))),
+                [param for params in chunk for param in params],
+            )
+            for row in cursor.fetchall():
+                key = tuple(
+                    convert(value, column, column_converters)
+                    for value, column, column_converters in zip(row[:size], columns, converters)
+                )
+                counts[key] = row[size]
+                if row[size + 1:] == (None,):
+                    stale.add(key)
+
+
+def convert(value, column, converters):
+    for converter in converters:
+        value = converter(value, column, connection)
+    return value
+
+
+def update_customer_summaries(changes, appeared, vanished):
+    deltas = defaultdict(lambda: new_delta('count_distinct_product', 'total_cost_in_pln'))
+    for sign, instance in changes:
+        delta = deltas[(as_uuid(instance.customer_id),)]
+        delta['total_cost_in_pln'] += sign * total_in_pln(instance)
+        track_latest(delta, sign, instance.timestamp)
+    for customer_id, _ in appeared:
+        deltas[(customer_id,)]['count_distinct_product'] += 1
+    for customer_id, _ in vanished:
+        deltas[(customer_id,)]['count_distinct_product'] -= 1
+    increment_rows(
+        CustomerSummary,
+        ('customer_id',),
+        deltas,
+        'count_distinct_product',
+        'last_transaction_datetime',
+        Transaction.objects.for_customer,
+    )
+
+
+def update_product_summaries(changes, appeared, vanished):
+    deltas = defaultdict(lambda: new_delta('count_distinct_customer', 'sum_quantity', 'total_income_in_pln'))
+    for sign, instance in changes:
+        delta = deltas[(as_uuid(instance.product_id),)]
+        delta['sum_quantity'] += sign * instance.quantity
+        delta['total_income_in_pln'] += sign * total_in_pln(instance)
+        track_latest(delta, sign, instance.timestamp)
+    for _, product_id in appeared:
+        deltas[(product_id,)]['count_distinct_customer'] += 1
+    for _, product_id in vanished:
+        deltas[(product_id,)]['count_distinct_customer'] -= 1
+    increment_rows(ProductSummary, ('product_id',), deltas, 'count_distinct_customer')
+
+
+def update_period_summaries(changes):
+    customer_deltas = defaultdict(lambda: new_delta('transactions', 'total_cost_in_pln'))
+    product_deltas = defaultdict(lambda: new_delta('transactions', 'sum_quantity', 'total_income_in_pln'))
+    pair_deltas = defaultdict(lambda: new_delta('transactions'))
+    for sign, instance in changes:
+        customer_id = as_uuid(instance.customer_id)
+        product_id = as_uuid(instance.product_id)
+        for period, start in period_starts(instance.timestamp):
+            delta = customer_deltas[customer_id, period, start]
+            delta['transactions'] += sign
+            delta['total_cost_in_pln'] += sign * total_in_pln(instance)
+            track_latest(delta, sign, instance.timestamp)
+
+            delta = product_deltas[product_id, period, start]
+            delta['transactions'] += sign
+            delta['sum_quantity'] += sign * instance.quantity
+            delta['total_income_in_pln'] += sign * total_in_pln(instance)
+            track_latest(delta, sign, instance.timestamp)
+
+            delta = pair_deltas[customer_id, period, start, product_id]
+            delta['transactions'] += sign
+            track_latest(delta, sign, instance.timestamp)
+
+    def customer_period_transactions(customer_id, period, start):
+        lower, upper = period_bounds(period, start)
+        return Transaction.objects.for_customer(customer_id).filter(timestamp__gte=lower, timestamp__lt=upper)
+
+    increment_rows(
+        CustomerPeriodSummary,
+        ('customer_id', 'period', 'start'),
+        customer_deltas,
+        latest='last_transaction_datetime',
+        latest_source=customer_period_transactions,
+    )
+    increment_rows(ProductPeriodSummary, ('product_id', 'period', 'start'), product_deltas)
+    increment_rows(CustomerProductPeriod, ('customer_id', 'period', 'start', 'product_id'), pair_deltas)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def rollup_sources(customers=Q(), products=Q(), pairs=Q()):
+    """
+    Yields each rollup model with its key fields, a filter selecting its rows, the
+    constant fields of those rows and the grouped transactions query rebuilding them.
+    """
+    transactions = Transaction.objects
+    yield CustomerSummary, ('customer_id',), customers, {}, transactions.filter(customers).summarize_customers()
+    yield ProductSummary, ('product_id',), products, {}, transactions.filter(products).summarize_products()
+    yield (
+        CustomerProduct,
+        ('customer_id', 'product_id'),
+        pairs,
+        {},
+        transactions.filter(pairs).summarize_customer_products(),
+    )
+    for period in PeriodChoices.values:
+        constant = {'period': period}
+        yield (
+            CustomerPeriodSummary,
+            ('customer_id', 'period', 'start'),
+            customers & Q(**constant),
+            constant,
+            transactions.filter(customers).summarize_customer_periods(period),
+        )
+        yield (
+            ProductPeriodSummary,
+            ('product_id', 'period', 'start'),
+            products & Q(**constant),
+            constant,
+            transactions.filter(products).summarize_product_periods(period),
+        )
+        yield (
+            CustomerProductPeriod,
+            ('customer_id', 'product_id', 'period', 'start'),
+            pairs & Q(**constant),
+            constant,
+            transactions.filter(pairs).summarize_customer_product_periods(period),
+        )
+
+
+def rebuild(customer_ids=None, product_ids=None, batch_size=5000):
+    """
+    Recomputes the rollup tables from transactions with grouped queries. When ids
+    are given, only their rollups are rebuilt.
+    """
+    customers = products = pairs = Q()
+    if customer_ids is not None or product_ids is not None:
+        customers = Q(customer_id__in=list(customer_ids or []))
+        products = Q(product_id__in=list(product_ids or []))
+        pairs = customers | products
+
+    with transaction.atomic():
+        for model, _, selected, constant, rows in rollup_sources(customers, products, pairs):
+            model.objects.filter(selected).delete()
+            for chunk in chunked(rows.iterator(chunk_size=batch_size), batch_size):
+                model.objects.bulk_create([model(**row, **constant) for row in chunk])
+        if customer_ids is not None or product_ids is not None:
+            report_cache.invalidate_on_commit(customer_ids or [], product_ids or [])
+        else:
+            transaction.on_commit(report_cache.clear, robust=True)
+
+
+def verify():
+    """Compares the rollup tables with transactions and returns the rows that differ."""
+    mismatches = []
+    for model, key_fields, selected, constant, rows in rollup_sources():
+        value_fields = [field for field in rows.query.annotation_select if field not in key_fields]
+        stored = {
+            tuple(row[field] for field in key_fields): {field: row[field] for field in value_fields}
+            for row in model.objects.filter(selected).values(*key_fields, *value_fields).iterator()
+        }
+        for row in rows.iterator():
+            row.update(constant)
+            key = tuple(row[field] for field in key_fields)
+            if stored.pop(key, None) != {field: row[field] for field in value_fields}:
+                mismatches.append((model.__name__, key))
+        mismatches.extend((model.__name__, key) for key in stored)
+    return mismatches
@@ -0,0 +1,137 @@
+"""
+Routing of imports to Celery queues by file size, with at most TRANSACTIONS_IMPORT_USER_CONCURRENCY
+imports of each user sent to a queue at a time. Requests beyond the limit wait in the database
+(PENDING without `dispatched_at`) and are sent as imports complete, in fair order: the user with
+the fewest imports in the queue goes first, so one user's backlog does not hold up the others.
+"""
+import heapq
+from collections import deque
+from datetime import timedelta
+
+from celery import states
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, Min, OuterRef, Q
+from django.utils import timezone
+
+from .models import ChunkedUpload, FileImportRequest, ImportCheckpoint
+
+WAITING = Q(status=states.PENDING, dispatched_at__isnull=True)
+
+
+def active_filter():
+    """
+    Sent to a queue and not completed yet: waiting in the queue, or STARTED within the lease of
+    TRANSACTIONS_IMPORT_LEASE seconds, renewed by every batch committed. An import whose worker
+    was lost for good or whose shards never complete stops holding its user's slot once its
+    lease expires.
+    """
+    expired = timezone.now() - timedelta(seconds=settings.TRANSACTIONS_IMPORT_LEASE)
+    renewed = Exists(ImportCheckpoint.objects.filter(import_request=OuterRef('pk'), updated_at__gte=expired))
+    return (
+        Q(dispatched_at__isnull=False) & ~Q(status__in=states.READY_STATES)
+        & (~Q(status=states.STARTED) | Q(started_at__gte=expired) | Q(dispatched_at__gte=expired) | renewed)
+    )
+
+
+def file_size(import_request):
+    if import_request.file:
+        return import_request.file.size
+    upload = ChunkedUpload.objects.filter(import_request=import_request).first()
+    return upload.offset if upload else 0
+
+
+def classify(size):
+    """Returns the first of TRANSACTIONS_IMPORT_QUEUES whose size limit `size` is within."""
+    for queue, limit in settings.TRANSACTIONS_IMPORT_QUEUES:
+        if limit is None or size <= limit:
+            return queue
+    return settings.TRANSACTIONS_IMPORT_QUEUES[-1][0]
+
+
+def enqueue(import_request):
+    """Routes a new request to its queue and dispatches it, once the transaction commits, if its user has a slot."""
+    import_request.queue = classify(file_size(import_request))
+    import_request.save(update_fields=['queue'])
+    transaction.on_commit(dispatch)
+
+
+def fair_order(waiting, active, limit):
+    """
+    Yields the requests of `waiting` (oldest first) to dispatch: each time the oldest request of
+    the user with the fewest `active` imports, then of the user waiting longest, while the user is
+    below `limit`.
+    """
+    by_user = {}
+    for import_request in waiting:
+        by_user.setdefault(import_request.requested_by_id, deque()).append(import_request)
+    heap = [
+        (active.get(user_id, 0), requests[0].created_at, requests[0].id, user_id)
+        for user_id, requests in by_user.items()
+        if active.get(user_id, 0) < limit
+    ]
+    heapq.heapify(heap)
+    while heap:
+        count, _, _, user_id = heapq.heappop(heap)
+        requests = by_user[user_id]
+        yield requests.popleft()
+        count += 1
+        if requests and count < limit:
+            heapq.heappush(heap, (count, requests[0].created_at, requests[0].id, user_id))
+
+
+def dispatch():
+    """
+    Sends waiting requests to their queues in fair order, up to the limit per user and queue, and
+    returns their ids. The waiting rows are locked, so concurrent calls do not send a request twice.
+    """
+    from .tasks import import_csv_task
+
+    limit = settings.TRANSACTIONS_IMPORT_USER_CONCURRENCY
+    with transaction.atomic():
+        waiting = list(
+            FileImportRequest.objects.select_for_update().filter(WAITING)
+            .order_by('created_at', 'id').only('id', 'queue', 'requested_by_id', 'created_at')
+        )
+        if not waiting:
+            return []
+        active = {}
+        rows = (
+            FileImportRequest.objects.filter(active_filter())
+            .values('queue', 'requested_by').annotate(count=Count('id'))
+        )
+        for row in rows:
+            active[row['queue'], row['requested_by']] = row['count']
+
+        by_queue = {}
+        for import_request in waiting:
+            by_queue.setdefault(import_request.queue, []).append(import_request)
+        dispatched = []
+        for queue, requests in by_queue.items():
+            queue_active = {user_id: count for (name, user_id), count in active.items() if name == queue}
+            dispatched.extend(fair_order(requests, queue_active, limit))
+        if not dispatched:
+            return []
+
+        FileImportRequest.objects.filter(id__in=[r.id for r in dispatched]).update(dispatched_at=timezone.now())
+        for import_request in dispatched:
+            transaction.on_commit(lambda r=import_request: import_csv_task.apply_async((r.id,), queue=r.queue or None))
+    return [import_request.id for import_request in dispatched]
+
+
+def queue_stats():
+    """
+    Per queue: the requests waiting for a slot, sent and not started, and running, and the
+    creation time of the oldest request not started.
+    """
+    result = {queue: {'waiting': 0, 'queued': 0, 'running': 0, 'oldest': None}
+              for queue, _ in settings.TRANSACTIONS_IMPORT_QUEUES}
+    rows = FileImportRequest.objects.filter(status__in=(states.PENDING, states.STARTED)).values('queue').annotate(
+        waiting=Count('id', filter=WAITING),
+        queued=Count('id', filter=Q(status=states.PENDING, dispatched_at__isnull=False)),
+        running=Count('id', filter=Q(status=states.STARTED)),
+        oldest=Min('created_at', filter=Q(status=states.PENDING)),
+    )
+    for row in rows:
+        result[row.pop('queue')] = row
+    return result
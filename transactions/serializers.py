@@ -0,0 +1,51 @@
+import logging
+
+from django.utils.functional import cached_property
+from rest_framework import serializers
+
+from .models import Transaction
+from .rates import RateTable, to_pln
+
+logger = logging.getLogger(__name__)
+
+
+class ImportTransactionSerializer(serializers.ModelSerializer):
+    amount_in_pln = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        required=False,
+        read_only=False
+    )
+
+    transaction_id = serializers.UUIDField(required=True, source='id')
+
+    class Meta:
+        model = Transaction
+        fields = [
+            'transaction_id',
+            'timestamp',
+            'amount',
+            'amount_in_pln',
+            'currency',
+            'customer_id',
+            'product_id',
+            'quantity',
+        ]
+
+    @cached_property
+    def rate_table(self):
+        # Loaded once per serializer instance, i.e. once per import for the importer's validator.
+        return (self.context or {}).get('rate_table') or RateTable.load()
+
+    def validate(self, data):
+        data['amount_in_pln'] = self.get_amount_in_pln(data['currency'], data['amount'], data['timestamp'])
+        return data
+
+    def get_amount_in_pln(self, currency, amount, timestamp):
+        rate = self.rate_table.get_rate(currency, self.rate_table.day(timestamp))
+        if rate is None:
+            raise serializers.ValidationError(
+                {'currency': [f'No {currency} exchange rate effective on {self.rate_table.day(timestamp)}.']},
+                code='no_rate',
+            )
+        return to_pln(amount, rate)
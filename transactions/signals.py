@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import rollups
+from .models import Transaction
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_stored_transaction(sender, instance, raw, **kwargs):
+    instance._stored_transaction = None
+    if not raw and not instance._state.adding:
+        instance._stored_transaction = Transaction.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollups_on_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    stored = getattr(instance, '_stored_transaction', None)
+    rollups.apply_changes(added=[instance], removed=[stored] if stored else [])
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.apply_changes(removed=[instance])
@@ -0,0 +1,57 @@
+from django.db import connection as default_connection, transaction
+
+# Not read from the models, so migrations importing this module do not depend on the current models.
+# Tables with their UUID and amount columns; the first UUID column tells how a row is stored.
+COMPACT_COLUMNS = {
+    'transactions_transaction': (['id', 'customer_id', 'product_id'], ['amount', 'amount_in_pln']),
+    'transactions_customersummary': (['customer_id'], []),
+    'transactions_productsummary': (['product_id'], []),
+    'transactions_customerproduct': (['customer_id', 'product_id'], []),
+    'transactions_customerperiodsummary': (['customer_id'], []),
+    'transactions_productperiodsummary': (['product_id'], []),
+    'transactions_customerproductperiod': (['customer_id', 'product_id'], []),
+}
+# Amounts have two decimal places.
+MINOR_UNITS = 100
+
+
+def unhex(value):
+    return None if value is None else bytes.fromhex(value)
+
+
+def convert(compact, connection=default_connection):
+    """
+    Rewrites the stored UUIDs and amounts of SQLite tables to the compact representation
+    (16-byte BLOBs, integer minor units) or back to the default one (hex text, decimals).
+    Each row is converted with all its columns, and rows already in the target
+    representation are skipped, so an interrupted conversion can be run again. Column
+    types are left as they are, as SQLite stores any value in any column. Returns the
+    number of rows converted.
+    """
+    if connection.vendor != 'sqlite':
+        return 0
+    quote_name = connection.ops.quote_name
+    connection.ensure_connection()
+    # unhex() is only built into SQLite 3.41 and later.
+    connection.connection.create_function('transactions_unhex', 1, unhex, deterministic=True)
+    converted = 0
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for table, (uuid_columns, amount_columns) in COMPACT_COLUMNS.items():
+            uuid_columns = [quote_name(column) for column in uuid_columns]
+            amount_columns = [quote_name(column) for column in amount_columns]
+            if compact:
+                stored_as = 'text'
+                assignments = [f'{column} = transactions_unhex({column})' for column in uuid_columns] + [
+                    f'{column} = CAST(ROUND({column} * {MINOR_UNITS}) AS INTEGER)' for column in amount_columns
+                ]
+            else:
+                stored_as = 'blob'
+                assignments = [f'{column} = lower(hex({column}))' for column in uuid_columns] + [
+                    f'{column} = {column} / {MINOR_UNITS}.0' for column in amount_columns
+                ]
+            cursor.execute(
+                f'UPDATE {quote_name(table)} SET {", ".join(assignments)} WHERE typeof({uuid_columns[0]}) = %s',
+                [stored_as],
+            )
+            converted += cursor.rowcount
+    return converted
@@ -1,14 +1,79 @@
 import logging
 
-from celery import shared_task
+from celery import chord, shared_task, states
 
-from .importers import CSVImporter
+from . import import_stats, metrics, partitions, scheduling, uploads
+from .importers import CSVImporter, CSVShardImporter, complete_sharded_import
+from .models import FileImportRequest
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task()
+# Import tasks are acknowledged once they finish, so the task of a lost worker is delivered
+# again and resumes from the checkpoints of its committed batches.
+@shared_task(acks_late=True, reject_on_worker_lost=True)
 def import_csv_task(import_log_id):
+    if FileImportRequest.objects.filter(pk=import_log_id, status=states.SUCCESS).exists():
+        logger.info(f"CSV already imported for file request: {import_log_id}")
+        return
+    if FileImportRequest.objects.filter(
+        pk=import_log_id, status=states.STARTED, checkpoints__end__isnull=False,
+    ).exists():
+        # A redelivered task of a request whose shards were sent already; they resume from their checkpoints.
+        logger.info(f"CSV already split into shards for file request: {import_log_id}")
+        return
+
     with CSVImporter(import_log_id) as csv_importer:
-        csv_importer.import_file()
-    logger.info(f"CSV completed for file request: {import_log_id}")
\ No newline at end of file
+        import_request = csv_importer.import_request
+        first_start = import_request.started_at is None
+        csv_importer.mark_started()
+        if first_start and import_request.queue:
+            waited = import_request.started_at - import_request.created_at
+            metrics.record_import_wait(import_request.queue, waited.total_seconds())
+        uploads.prepare_file(import_request)
+        shards = csv_importer.get_shards()
+        if len(shards) > 1:
+            csv_importer.defer(shards)
+        else:
+            csv_importer.import_file()
+
+    if import_request.status == states.STARTED:
+        # Sent once the request is saved as deferred, so that save cannot overwrite the completion
+        # of the shards. The shards and their completion run in the queue of the request.
+        options = {'queue': import_request.queue} if import_request.queue else {}
+        chord(
+            import_csv_shard_task.s(import_log_id, start, end).set(**options) for start, end in shards
+        )(complete_csv_import_task.s(import_log_id).set(**options))
+        logger.info(f"CSV split into {len(shards)} shards for file request: {import_log_id}")
+    else:
+        logger.info(f"CSV completed for file request: {import_log_id} ({import_stats.describe(import_request.stats)})")
+        scheduling.dispatch()
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def import_csv_shard_task(import_log_id, start, end):
+    with CSVShardImporter(import_log_id, start, end) as shard_importer:
+        shard_importer.import_shard()
+    return shard_importer.result
+
+
+@shared_task()
+def complete_csv_import_task(shard_results, import_log_id):
+    import_request = complete_sharded_import(import_log_id, shard_results)
+    logger.info(f"CSV completed for file request: {import_log_id} ({import_stats.describe(import_request.stats)})")
+    scheduling.dispatch()
+
+
+@shared_task()
+def dispatch_imports_task():
+    """Dispatches waiting imports periodically too, in case the process completing an import died first."""
+    dispatched = scheduling.dispatch()
+    if dispatched:
+        logger.info(f"Dispatched waiting file requests: {', '.join(map(str, dispatched))}")
+
+
+@shared_task()
+def create_partitions_task():
+    created = partitions.ensure_upcoming_partitions()
+    if created:
+        logger.info(f"Created transaction partitions: {', '.join(created)}")
@@ -0,0 +1,98 @@
+import io
+import json
+from collections import Counter
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from transactions.benchmarks import suite
+from transactions.benchmarks.data import CSV_HEADER, DIRTY_VALUES, generate_rows, write_transactions_csv
+from transactions.tests.factories import UserFactory
+
+
+class TestGenerateRows:
+    def test_generate_rows_should_return_same_rows_when_same_seed(self):
+        assert list(generate_rows(50, seed=3, skew=1, dirty_ratio=0.2)) == list(
+            generate_rows(50, seed=3, skew=1, dirty_ratio=0.2)
+        )
+
+    def test_generate_rows_should_concentrate_ids_when_skewed(self):
+        column = CSV_HEADER.index('customer_id')
+
+        def top_share(skew):
+            counts = Counter(row[column] for row in generate_rows(2000, customers=100, skew=skew))
+            return sum(count for _, count in counts.most_common(10)) / 2000
+
+        assert top_share(0) < 0.2
+        assert top_share(1.5) > 0.6
+
+    def test_generate_rows_should_insert_invalid_values_when_dirty_ratio(self):
+        rows = list(generate_rows(1000, dirty_ratio=0.1))
+        ids = Counter(row[0] for row in rows)
+        dirty = [
+            row for row in rows
+            if any(row[CSV_HEADER.index(column)] == value for column, value in DIRTY_VALUES) or ids[row[0]] > 1
+        ]
+
+        assert 50 < len(dirty) < 150
+
+
+@pytest.mark.django_db
+class TestSuite:
+    def test_run_import_should_reject_dirty_rows(self, tmp_path):
+        path = tmp_path / 'transactions.csv'
+        with open(path, 'w', newline='') as fileobj:
+            write_transactions_csv(fileobj, 500, customers=20, products=20, skew=1, dirty_ratio=0.1)
+        rows = list(generate_rows(500, customers=20, products=20, skew=1, dirty_ratio=0.1))
+        inserted = set()
+        for row in rows:
+            if not any(row[CSV_HEADER.index(column)] == value for column, value in DIRTY_VALUES):
+                inserted.add(row[0])
+
+        metrics, import_request = suite.run_import(str(path), UserFactory())
+
+        assert import_request.rows_inserted == len(inserted)
+        assert import_request.rows_rejected == len(rows) - len(inserted) > 25
+        assert metrics['import_rows_per_second'] > 0
+        assert metrics['import_peak_rss_mib'] > 0
+
+    def test_compare_should_flag_regressions_when_worse_than_threshold(self):
+        baseline = {'import_rows_per_second': 1000, 'list_page_1_ms': 10, 'report_customer_ms': 10}
+        metrics = {
+            'import_rows_per_second': 700, 'list_page_1_ms': 11, 'report_customer_ms': 13, 'report_product_ms': 5,
+        }
+
+        assert suite.compare(baseline, metrics, 0.25) == [
+            ('import_rows_per_second', 1000, 700, -0.3, True),
+            ('list_page_1_ms', 10, 11, pytest.approx(0.1), False),
+            ('report_customer_ms', 10, 13, pytest.approx(0.3), True),
+            ('report_product_ms', None, 5, None, False),
+        ]
+
+
+@pytest.mark.django_db
+class TestBenchmarkSuiteCommand:
+    options = {'rows': 300, 'customers': 20, 'products': 20, 'depths': [1, 2], 'page_size': 10, 'repeat': 1,
+               'samples': 5, 'stdout': io.StringIO(), 'stderr': io.StringIO()}
+
+    def test_handle_should_raise_when_metrics_regressed(self, tmp_path):
+        baseline = tmp_path / 'baseline.json'
+        call_command('benchmark_suite', baseline=str(baseline), save_baseline=True, **self.options)
+        recorded = json.loads(baseline.read_text())
+        assert set(recorded['metrics']) == {
+            'import_rows_per_second', 'import_peak_rss_mib', 'list_page_1_ms', 'list_cursor_1_ms', 'list_page_2_ms',
+            'list_cursor_2_ms', 'report_customer_ms', 'report_customer_range_ms', 'report_product_ms', 'report_product_range_ms',
+        }
+
+        recorded['metrics'] = {metric: value / 1000 for metric, value in recorded['metrics'].items()}
+        baseline.write_text(json.dumps(recorded))
+        with pytest.raises(CommandError, match='regressed by more than 25%: list_page_1_ms'):
+            call_command('benchmark_suite', baseline=str(baseline), scenarios=['list', 'reports'], **self.options)
+
+    def test_handle_should_raise_when_parameters_differ_from_baseline(self, tmp_path):
+        baseline = tmp_path / 'baseline.json'
+        suite.save_baseline(str(baseline), {'rows': 1}, {}, 0.25)
+
+        with pytest.raises(CommandError, match='recorded with'):
+            call_command('benchmark_suite', baseline=str(baseline), **self.options)
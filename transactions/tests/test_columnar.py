@@ -0,0 +1,119 @@
+import csv
+import io
+
+import pytest
+from django.test import override_settings
+
+from transactions.importers import OVERWRITE_FIELDS, CSVImporter
+from transactions.models import Transaction
+from transactions.tests.factories import FileImportRequestFactory
+from transactions.tests.test_importers import get_sample_file, read_rejections
+from transactions.tests.test_validators import CONTEXT, MISSING, ROW_CHANGES, VALID_ROW, make_row
+from transactions.validators import RowValidator
+
+pytest.importorskip('numpy')
+
+from transactions.columnar import ColumnarValidator  # noqa: E402
+
+EXTRA_CHANGES = [
+    {'transaction_id': '550E8400-E29B-41D4-A716-446655440000'},
+    {'timestamp': '2028-02-29T23:59:59Z'},
+    {'timestamp': '2100-02-29T10:30:00Z'},
+    {'timestamp': '2025-01-15T24:00:00Z'},
+    {'timestamp': '2025-01-15T10:30:00z'},
+    {'amount': '.5'},
+    {'amount': '5.'},
+    {'amount': '0.10'},
+    {'amount': '1.2.3'},
+    {'amount': '0000000000012.5'},
+    {'currency': 'PLN', 'timestamp': '2024-12-31T23:59:59Z'},
+    {'quantity': '007'},
+    {'quantity': '999999999999999999'},
+]
+
+
+def to_lines(rows, fieldnames):
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerows([['' if row.get(name) is None else row[name] for name in fieldnames] for row in rows])
+    return output.getvalue().splitlines(keepends=True)
+
+
+def validate_rows(lines, fieldnames):
+    validator = RowValidator(context=CONTEXT)
+    reader = csv.DictReader(lines, fieldnames=fieldnames)
+    return [(lines[reader.line_num - 1], *validator.validate(row)) for row in reader]
+
+
+def validate_columns(lines, fieldnames):
+    validator = ColumnarValidator(RowValidator(context=CONTEXT), CONTEXT['rate_table'])
+    return validator.validate_chunk(lines, fieldnames)
+
+
+class TestColumnarValidator:
+    @pytest.mark.parametrize('changes', ROW_CHANGES + EXTRA_CHANGES)
+    def test_validate_chunk_should_match_row_validator(self, changes):
+        row = make_row(changes)
+        fieldnames = [name for name in {**VALID_ROW, **changes} if changes.get(name) is not MISSING]
+        lines = to_lines([VALID_ROW, row, VALID_ROW], fieldnames)
+
+        results = validate_columns(lines, fieldnames)
+
+        assert results == validate_rows(lines, fieldnames)
+        if results[1][2] is None:
+            assert results[1][1]['timestamp'].tzinfo == validate_rows(lines, fieldnames)[1][1]['timestamp'].tzinfo
+
+    def test_validate_chunk_should_match_row_validator_when_rows_malformed(self):
+        fieldnames = list(VALID_ROW)
+        valid_line = to_lines([VALID_ROW], fieldnames)[0]
+        lines = [valid_line, '\n', valid_line.rstrip('\n') + ',extra\n', ','.join(['x'] * 3) + '\n', '\r\n', valid_line]
+
+        results = validate_columns(lines, fieldnames)
+
+        assert results == validate_rows(lines, fieldnames)
+        assert [errors is None for _, _, errors in results] == [True, True, False, True]
+
+    def test_validate_chunk_should_parse_chunk_with_csv_when_fields_quoted(self):
+        fieldnames = list(VALID_ROW)
+        lines = to_lines([VALID_ROW, dict(VALID_ROW, currency='E,U')], fieldnames)
+
+        results = validate_columns(lines, fieldnames)
+
+        assert lines[1].count('"') == 2
+        assert results == validate_rows(lines, fieldnames)
+
+
+@pytest.mark.django_db
+class TestColumnarImport:
+    @pytest.mark.parametrize('sample', ['valid_transactions.csv', 'invalid_transactions.csv'])
+    def test_import_file_should_match_rows_engine(self, sample):
+        results = {}
+        for engine in ('rows', 'columnar'):
+            file_request = FileImportRequestFactory.create(file=get_sample_file(sample))
+            with CSVImporter(file_request.id, batch_size=2, engine=engine) as csv_importer:
+                csv_importer.import_file()
+            file_request.refresh_from_db()
+            results[engine] = (
+                file_request.status,
+                file_request.rows_inserted,
+                file_request.rows_rejected,
+                read_rejections(file_request) if file_request.rejections_file else [],
+                list(Transaction.objects.order_by('id').values('id', *OVERWRITE_FIELDS)),
+            )
+            Transaction.objects.all().delete()
+
+        assert results['columnar'] == results['rows']
+
+    @override_settings(TRANSACTIONS_IMPORT_ENGINE='columnar')
+    def test_import_file_should_save_checkpoint_at_end_of_each_chunk(self):
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+        with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+            csv_importer.import_file()
+
+        checkpoint = file_request.checkpoints.get()
+
+        assert csv_importer.engine == 'columnar'
+        assert checkpoint.finished
+        assert checkpoint.rows_read == 5
+        assert checkpoint.offset == file_request.file.size
+        assert Transaction.objects.count() == 5
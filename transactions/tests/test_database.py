@@ -0,0 +1,22 @@
+import pytest
+from django.db import connection
+
+
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason="The profile applies to SQLite connections.")
+@pytest.mark.django_db
+class TestSQLiteProfile:
+    def test_connection_should_apply_sqlite_pragmas_when_opened(self, settings):
+        values = {}
+        with connection.cursor() as cursor:
+            for pragma in ('synchronous', 'busy_timeout', 'cache_size', 'temp_store'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values[pragma] = cursor.fetchone()[0]
+
+        # The in-memory test database ignores journal_mode and mmap_size.
+        assert values == {
+            'synchronous': 1,
+            'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout'],
+            'cache_size': settings.SQLITE_PRAGMAS['cache_size'],
+            'temp_store': 2,
+        }
+        assert connection.transaction_mode == 'IMMEDIATE'
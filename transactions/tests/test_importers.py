@@ -1,13 +1,24 @@
+import gzip
+import io
+import json
+import uuid
+from decimal import Decimal
 from pathlib import Path
+from unittest import mock
 
 import pytest
 from celery import states
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
 
-from transactions.importers import CSVImporter
-from transactions.models import Transaction
-from transactions.tests.factories import FileImportRequestFactory
+from transactions import metrics, rollups
+from transactions.choices import CurrencyChoices, DuplicatePolicyChoices
+from transactions.importers import CSVImporter, CSVShardImporter, complete_sharded_import, split_into_ranges
+from transactions.loaders import StagingLoader, get_loader
+from transactions.models import ImportCheckpoint, Transaction
+from transactions.tests.factories import FileImportRequestFactory, TransactionFactory
 
 User = get_user_model()
 
@@ -24,6 +35,23 @@ def get_sample_file(filename):
         )
 
 
+def read_rejections(file_request):
+    with file_request.rejections_file.open('rb') as rejections_file:
+        return [json.loads(line) for line in gzip.decompress(rejections_file.read()).splitlines()]
+
+
+def fail_on_batch(number):
+    """Patches `CSVImporter.save_batch` to raise before saving the `number`th batch."""
+    save_batch = CSVImporter.save_batch
+    batches = iter(range(1, 1000))
+
+    def save_or_fail(importer, *args):
+        if next(batches) == number:
+            raise RuntimeError('worker lost')
+        return save_batch(importer, *args)
+    return mock.patch.object(CSVImporter, 'save_batch', autospec=True, side_effect=save_or_fail)
+
+
 @pytest.mark.django_db
 class TestCSVImporter:
     def test_import_file_should_save_exception_meta_and_failure_when_invalid_file(self):
@@ -39,6 +67,18 @@ class TestCSVImporter:
             'exception_value': "The 'file' attribute has no file associated with it."
         }
 
+    def test_import_file_should_count_inserted_and_rejected_rows(self):
+        csv_file = get_sample_file('invalid_transactions.csv')
+        file_request = FileImportRequestFactory.create(file=csv_file)
+        with CSVImporter(file_request.id) as csv_importer:
+            csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert file_request.rows_inserted == 1
+        assert file_request.rows_rejected == 3
+        assert file_request.processed_at is not None
+
     def test_import_file_should_import_valid_and_log_invalid_and_success(self):
         csv_file = get_sample_file('invalid_transactions.csv')
         file_request = FileImportRequestFactory.create(file=csv_file)
@@ -63,3 +103,402 @@ class TestCSVImporter:
         assert file_request.status == states.SUCCESS
         assert file_request.exception_meta == {}
         assert Transaction.objects.all().count() == 5
+
+    def test_import_file_should_commit_each_batch_when_batch_size_given(self):
+        csv_file = get_sample_file('valid_transactions.csv')
+        file_request = FileImportRequestFactory.create(file=csv_file)
+        with mock.patch.object(
+            StagingLoader, 'insert', autospec=True, side_effect=StagingLoader.insert
+        ) as mock_insert:
+            with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.SUCCESS
+        assert [len(call.args[1]) for call in mock_insert.call_args_list] == [2, 2, 1]
+        assert Transaction.objects.all().count() == 5
+
+    @pytest.mark.parametrize('policy, expected_counts', [
+        (DuplicatePolicyChoices.SKIP, {'rows_inserted': 0, 'rows_skipped': 5, 'rows_rejected': 0}),
+        (DuplicatePolicyChoices.OVERWRITE, {'rows_inserted': 0, 'rows_updated': 5, 'rows_rejected': 0}),
+        (DuplicatePolicyChoices.REJECT, {'rows_inserted': 0, 'rows_rejected': 5}),
+    ])
+    def test_import_file_should_apply_duplicate_policy_when_reimported(self, policy, expected_counts):
+        for _ in range(2):
+            file_request = FileImportRequestFactory.create(
+                file=get_sample_file('valid_transactions.csv'),
+                duplicate_policy=policy,
+            )
+            with CSVImporter(file_request.id) as csv_importer:
+                csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.SUCCESS
+        assert {counter: getattr(file_request, counter) for counter in expected_counts} == expected_counts
+        assert Transaction.objects.count() == 5
+
+    def test_import_file_should_update_existing_when_overwrite_policy(self):
+        transaction = TransactionFactory(
+            id='550e8400-e29b-41d4-a716-446655440000',
+            timestamp=timezone.now(),
+            amount=1,
+            amount_in_pln=1,
+            currency=CurrencyChoices.PLN,
+            customer_id=uuid.uuid4(),
+            product_id=uuid.uuid4(),
+            quantity=1,
+        )
+        file_request = FileImportRequestFactory.create(
+            file=get_sample_file('valid_transactions.csv'),
+            duplicate_policy=DuplicatePolicyChoices.OVERWRITE,
+        )
+        with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+            csv_importer.import_file()
+
+        transaction.refresh_from_db()
+        file_request.refresh_from_db()
+
+        assert file_request.rows_inserted == 4
+        assert file_request.rows_updated == 1
+        assert transaction.amount == Decimal('150.50')
+        assert transaction.quantity == 2
+
+    @pytest.mark.parametrize('loader_name', ['staging', 'bulk_create'])
+    def test_import_file_should_skip_rows_committed_after_lookup_when_skip_policy(self, settings, loader_name):
+        settings.TRANSACTIONS_IMPORT_LOADER = loader_name
+        loader_class = type(get_loader())
+        insert = loader_class.insert
+
+        def insert_after_concurrent_import(loader, instances, **kwargs):
+            # Another import commits the first row of the batch between the lookup and the insert;
+            # the save updates the rollups like the import would.
+            if not Transaction.objects.exists():
+                TransactionFactory(
+                    id=instances[0].id,
+                    timestamp=timezone.now(),
+                    amount=1,
+                    amount_in_pln=1,
+                    currency=CurrencyChoices.PLN,
+                    customer_id=uuid.uuid4(),
+                    product_id=uuid.uuid4(),
+                    quantity=1,
+                )
+            return insert(loader, instances, **kwargs)
+
+        file_request = FileImportRequestFactory.create(
+            file=get_sample_file('valid_transactions.csv'),
+            duplicate_policy=DuplicatePolicyChoices.SKIP,
+        )
+        with mock.patch.object(loader_class, 'insert', autospec=True, side_effect=insert_after_concurrent_import):
+            with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert (file_request.rows_inserted, file_request.rows_skipped) == (4, 1)
+        assert Transaction.objects.count() == 5
+        assert rollups.verify() == []
+
+    def test_import_file_should_keep_first_of_duplicated_rows_when_reject_policy(self):
+        content = get_sample_file('valid_transactions.csv').read()
+        duplicated = content + content.splitlines(keepends=True)[1]
+        file_request = FileImportRequestFactory.create(
+            file=SimpleUploadedFile('duplicated.csv', duplicated),
+        )
+        with CSVImporter(file_request.id) as csv_importer:
+            csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.SUCCESS
+        assert file_request.rows_inserted == 5
+        assert file_request.rows_rejected == 1
+
+    def test_import_file_should_save_finished_checkpoint_when_completed(self):
+        content = get_sample_file('invalid_transactions.csv').read()
+        file_request = FileImportRequestFactory.create(file=SimpleUploadedFile('invalid.csv', content))
+        with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+            csv_importer.import_file()
+
+        checkpoint = ImportCheckpoint.objects.get(import_request=file_request)
+
+        assert checkpoint.finished
+        assert checkpoint.start == content.index(b'\n') + 1
+        assert checkpoint.offset == len(content)
+        assert checkpoint.rows_read == 4
+        assert (checkpoint.rows_inserted, checkpoint.rows_rejected) == (1, 3)
+
+    def test_import_file_should_checkpoint_committed_batches_when_failed(self):
+        content = get_sample_file('valid_transactions.csv').read()
+        file_request = FileImportRequestFactory.create(file=SimpleUploadedFile('valid.csv', content))
+        with fail_on_batch(2):
+            with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                csv_importer.import_file()
+
+        file_request.refresh_from_db()
+        checkpoint = ImportCheckpoint.objects.get(import_request=file_request)
+
+        assert file_request.status == states.FAILURE
+        assert not checkpoint.finished
+        assert checkpoint.offset == len(b''.join(content.splitlines(keepends=True)[:3]))
+        assert checkpoint.rows_read == checkpoint.rows_inserted == 2
+        assert Transaction.objects.count() == 2
+
+    def test_import_file_should_resume_from_checkpoint_when_retried(self):
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+        with fail_on_batch(2):
+            with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                csv_importer.import_file()
+
+        with mock.patch.object(
+            StagingLoader, 'insert', autospec=True, side_effect=StagingLoader.insert
+        ) as mock_insert:
+            with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.SUCCESS
+        assert [len(call.args[1]) for call in mock_insert.call_args_list] == [2, 1]
+        assert file_request.rows_inserted == 5
+        assert file_request.rows_rejected == 0
+        assert Transaction.objects.count() == 5
+
+    def test_import_file_should_save_phase_stats_when_completed(self):
+        content = get_sample_file('valid_transactions.csv').read()
+        file_request = FileImportRequestFactory.create(file=SimpleUploadedFile('valid.csv', content))
+        with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+            csv_importer.import_file()
+
+        file_request.refresh_from_db()
+        stats = file_request.stats
+
+        assert stats['bytes_read'] == len(content) - content.index(b'\n') - 1
+        assert stats['rows_read'] == stats['rows_validated'] == stats['rows_inserted'] == 5
+        assert stats['batches'] == sum(stats['batch_db_seconds'].values()) == 3
+        assert all(seconds > 0 for seconds in stats['seconds'].values())
+
+    def test_import_file_should_add_stats_of_attempts_when_resumed(self):
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+        with fail_on_batch(2):
+            with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                csv_importer.import_file()
+        with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+            csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert file_request.stats['rows_validated'] == 5
+        assert file_request.stats['batches'] == 3
+
+    def test_import_file_should_count_only_new_work_in_metrics_when_resumed(self):
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+        with fail_on_batch(2):
+            with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                csv_importer.import_file()
+        with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+            csv_importer.import_file()
+
+        lines = metrics.render().splitlines()
+
+        assert 'transactions_import_requests_total{status="FAILURE"} 1' in lines
+        assert 'transactions_import_requests_total{status="SUCCESS"} 1' in lines
+        assert 'transactions_import_rows_total{stage="inserted"} 5' in lines
+        assert 'transactions_import_batch_db_duration_seconds_count 3' in lines
+
+    def test_import_file_should_write_rejected_rows_artifact_when_rows_invalid(self):
+        csv_file = get_sample_file('invalid_transactions.csv')
+        lines = csv_file.read().decode().splitlines()
+        file_request = FileImportRequestFactory.create(file=csv_file)
+        with CSVImporter(file_request.id) as csv_importer:
+            csv_importer.import_file()
+
+        file_request.refresh_from_db()
+        rejections = read_rejections(file_request)
+
+        assert [(rejection['row'], rejection['line']) for rejection in rejections] == [
+            (2, lines[2]), (3, lines[3]), (4, lines[4]),
+        ]
+        assert list(rejections[1]['errors']) == ['timestamp']
+        assert file_request.rejection_counts == {
+            'transaction_id:invalid': 1,
+            'timestamp:invalid': 1,
+            'amount:invalid': 1,
+        }
+        assert not ImportCheckpoint.objects.get(import_request=file_request).rejection_parts
+
+    def test_import_file_should_not_write_artifact_when_no_rows_rejected(self):
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+        with CSVImporter(file_request.id) as csv_importer:
+            csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert not file_request.rejections_file
+        assert file_request.rejection_counts == {}
+
+    def test_import_file_should_write_duplicate_rows_to_artifact_when_reject_policy(self):
+        content = get_sample_file('valid_transactions.csv').read()
+        duplicated = content + content.splitlines(keepends=True)[1]
+        file_request = FileImportRequestFactory.create(file=SimpleUploadedFile('duplicated.csv', duplicated))
+        with CSVImporter(file_request.id) as csv_importer:
+            csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert [rejection['row'] for rejection in read_rejections(file_request)] == [6]
+        assert file_request.rejection_counts == {'transaction_id:unique': 1}
+
+    def test_import_file_should_write_rejected_rows_once_when_resumed(self):
+        valid = get_sample_file('valid_transactions.csv').read().splitlines(keepends=True)
+        invalid = get_sample_file('invalid_transactions.csv').read().splitlines(keepends=True)
+        content = b''.join([valid[0], valid[1], invalid[2], valid[2], valid[3], invalid[3], valid[4], valid[5]])
+        file_request = FileImportRequestFactory.create(file=SimpleUploadedFile('mixed.csv', content))
+        with fail_on_batch(2):
+            with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                csv_importer.import_file()
+        with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+            csv_importer.import_file()
+
+        file_request.refresh_from_db()
+
+        assert [rejection['row'] for rejection in read_rejections(file_request)] == [2, 5]
+        assert file_request.rows_rejected == 2
+        assert sum(file_request.rejection_counts.values()) == 2
+
+
+class TestSplitIntoRanges:
+    def test_split_into_ranges_should_return_line_aligned_ranges_after_header(self):
+        content = get_sample_file('valid_transactions.csv').read()
+        header_end = content.index(b'\n') + 1
+
+        ranges = split_into_ranges(io.BytesIO(content), len(content), 3)
+
+        assert len(ranges) == 3
+        assert ranges[0][0] == header_end
+        assert ranges[-1][1] == len(content)
+        for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+            assert end == next_start
+            assert content[end - 1:end] == b'\n'
+
+    def test_split_into_ranges_should_not_return_empty_ranges_when_more_shards_than_rows(self):
+        content = get_sample_file('valid_transactions.csv').read()
+
+        ranges = split_into_ranges(io.BytesIO(content), len(content), 50)
+
+        assert len(ranges) == 5
+        assert all(start < end for start, end in ranges)
+
+
+@pytest.mark.django_db
+class TestCSVShardImporter:
+    def test_import_shard_should_import_only_rows_in_range(self):
+        csv_file = get_sample_file('valid_transactions.csv')
+        content = csv_file.read()
+        file_request = FileImportRequestFactory.create(file=csv_file)
+        ranges = split_into_ranges(io.BytesIO(content), len(content), 2)
+
+        results = []
+        for start, end in ranges:
+            with CSVShardImporter(file_request.id, start, end) as shard_importer:
+                shard_importer.import_shard()
+            results.append(shard_importer.result)
+
+        assert sum(result['rows_inserted'] for result in results) == 5
+        assert all(0 < result['rows_inserted'] < 5 for result in results)
+        assert Transaction.objects.count() == 5
+
+    def test_import_shard_should_return_checkpoint_counts_when_shard_already_finished(self):
+        csv_file = get_sample_file('valid_transactions.csv')
+        content = csv_file.read()
+        file_request = FileImportRequestFactory.create(file=csv_file)
+        start, end = split_into_ranges(io.BytesIO(content), len(content), 2)[0]
+        for _ in range(2):
+            with CSVShardImporter(file_request.id, start, end) as shard_importer:
+                shard_importer.import_shard()
+
+        assert shard_importer.result['rows_inserted'] > 0
+        assert shard_importer.result['rows_rejected'] == 0
+        assert ImportCheckpoint.objects.get(import_request=file_request).finished
+
+    def test_complete_sharded_import_should_number_rejected_rows_across_shards(self):
+        content = get_sample_file('invalid_transactions.csv').read()
+        file_request = FileImportRequestFactory.create(file=SimpleUploadedFile('invalid.csv', content))
+        results = []
+        for start, end in split_into_ranges(io.BytesIO(content), len(content), 3):
+            with CSVShardImporter(file_request.id, start, end) as shard_importer:
+                shard_importer.import_shard()
+            results.append(shard_importer.result)
+
+        complete_sharded_import(file_request.id, results)
+
+        file_request.refresh_from_db()
+
+        assert [rejection['row'] for rejection in read_rejections(file_request)] == [2, 3, 4]
+        assert sum(file_request.rejection_counts.values()) == 3
+
+    def test_complete_sharded_import_should_total_stats_and_merge_profiles_of_shards(self):
+        content = get_sample_file('valid_transactions.csv').read()
+        file_request = FileImportRequestFactory.create(file=SimpleUploadedFile('valid.csv', content), profile=True)
+        results = []
+        for start, end in split_into_ranges(io.BytesIO(content), len(content), 2):
+            with CSVShardImporter(file_request.id, start, end) as shard_importer:
+                shard_importer.import_shard()
+            results.append(shard_importer.result)
+        parts = [name for checkpoint in file_request.checkpoints.all() for name in checkpoint.profile_parts]
+
+        complete_sharded_import(file_request.id, results)
+
+        file_request.refresh_from_db()
+
+        assert len(parts) == 2
+        assert file_request.stats['rows_read'] == file_request.stats['rows_validated'] == 5
+        assert file_request.stats['batches'] == 2
+        assert file_request.profile_file
+        assert not any(default_storage.exists(name) for name in parts)
+        assert all(checkpoint.profile_parts == [] for checkpoint in file_request.checkpoints.all())
+
+    def test_import_shard_should_report_errors_without_completing_request(self):
+        file_request = FileImportRequestFactory.create(file='')
+        with CSVShardImporter(file_request.id, 0, 10) as shard_importer:
+            shard_importer.import_shard()
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.PENDING
+        assert shard_importer.result['errors'] == [{
+            'exception_type': "<class 'ValueError'>",
+            'exception_value': "The 'file' attribute has no file associated with it.",
+        }]
+
+    def test_complete_sharded_import_should_aggregate_shard_results(self):
+        file_request = FileImportRequestFactory.create()
+        shard_results = [
+            {'start': 10, 'end': 20, 'rows_inserted': 3, 'rows_rejected': 1, 'errors': []},
+            {'start': 20, 'end': 30, 'rows_inserted': 2, 'rows_rejected': 0, 'errors': []},
+        ]
+
+        complete_sharded_import(file_request.id, shard_results)
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.SUCCESS
+        assert file_request.rows_inserted == 5
+        assert file_request.rows_rejected == 1
+        assert file_request.processed_at is not None
+
+    def test_complete_sharded_import_should_save_failure_when_shard_failed(self):
+        file_request = FileImportRequestFactory.create()
+        error = {'exception_type': "<class 'ValueError'>", 'exception_value': 'boom'}
+        shard_results = [
+            {'start': 10, 'end': 20, 'rows_inserted': 3, 'rows_rejected': 0, 'errors': [error]},
+        ]
+
+        complete_sharded_import(file_request.id, shard_results)
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.FAILURE
+        assert file_request.exception_meta == {'shard_errors': [dict(error, start=10, end=20)]}
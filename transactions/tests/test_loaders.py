@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+import pytest
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from transactions.choices import CurrencyChoices
+from transactions.importers import OVERWRITE_FIELDS
+from transactions.loaders import STAGING_LOADERS, BulkCreateLoader, get_loader
+from transactions.models import Transaction
+from transactions.partitions import is_partitioned
+from transactions.tests.factories import TransactionFactory
+from transactions.tests.test_rollups import CUSTOMER_ID, PRODUCT_ID
+
+
+def build_transaction(id_, amount):
+    return TransactionFactory.build(
+        id=id_,
+        timestamp=timezone.now(),
+        amount=amount,
+        amount_in_pln=amount,
+        currency=CurrencyChoices.PLN,
+        customer_id=CUSTOMER_ID,
+        product_id=PRODUCT_ID,
+        quantity=1,
+    )
+
+
+@pytest.mark.django_db
+class TestLoaders:
+    def test_get_loader_should_return_backend_staging_loader(self, settings):
+        assert type(get_loader()) is STAGING_LOADERS[connection.vendor]
+        settings.TRANSACTIONS_IMPORT_LOADER = 'bulk_create'
+        assert type(get_loader()) is (STAGING_LOADERS[connection.vendor] if is_partitioned() else BulkCreateLoader)
+
+    @pytest.mark.parametrize('name', ['staging', 'bulk_create'])
+    def test_insert_should_insert_rows_and_empty_staging_table(self, name):
+        loader = get_loader(name)
+        instances = [build_transaction(f'00000000-0000-0000-0000-00000000000{index}', index) for index in range(3)]
+
+        loader.insert(instances)
+
+        assert sorted(Transaction.objects.values_list('amount', flat=True)) == [Decimal('0'), Decimal('1'), Decimal('2')]
+        assert all(instance.created_at is not None for instance in Transaction.objects.all())
+        assert not instances[0]._state.adding
+        if name == 'staging':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM transactions_transaction_staging')
+                assert cursor.fetchone() == (0,)
+
+    @pytest.mark.parametrize('name', ['staging', 'bulk_create'])
+    def test_insert_should_resolve_conflicts_as_asked(self, name):
+        loader = get_loader(name)
+        transaction_id = '00000000-0000-0000-0000-000000000001'
+        loader.insert([build_transaction(transaction_id, 1)])
+
+        loader.insert([build_transaction(transaction_id, 2)], ignore_conflicts=True)
+        assert Transaction.objects.get().amount == Decimal('1')
+
+        loader.insert([build_transaction(transaction_id, 3)], update_fields=OVERWRITE_FIELDS)
+        assert Transaction.objects.get().amount == Decimal('3')
+
+        # The partitioned table cannot enforce a unique id, which the importer checks itself.
+        if not is_partitioned():
+            with pytest.raises(IntegrityError), transaction.atomic():
+                loader.insert([build_transaction(transaction_id, 4)])
+            assert Transaction.objects.get().amount == Decimal('3')
+
+    @pytest.mark.parametrize('name', ['staging', 'bulk_create'])
+    def test_insert_should_return_written_instances_when_ignoring_conflicts(self, name):
+        loader = get_loader(name)
+        stored = build_transaction('00000000-0000-0000-0000-000000000001', 1)
+        assert loader.insert([stored]) == [stored]
+
+        instances = [build_transaction(f'00000000-0000-0000-0000-00000000000{index}', index) for index in range(1, 4)]
+
+        assert loader.insert(instances, ignore_conflicts=True) == instances[1:]
+        assert Transaction.objects.count() == 3
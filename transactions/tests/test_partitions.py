@@ -0,0 +1,156 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from transactions import partitions
+from transactions.importers import OVERWRITE_FIELDS, CSVImporter
+from transactions.loaders import get_loader
+from transactions.models import Transaction
+from transactions.tests.factories import FileImportRequestFactory
+from transactions.tests.test_importers import get_sample_file
+from transactions.tests.test_loaders import build_transaction
+from transactions.tests.test_rollups import make_transaction
+
+postgresql_only = pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason="Partitioning needs PostgreSQL, run with TRANSACTIONS_DATABASE=postgresql.",
+)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+def waiting_for_id_lock():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND classid = %s AND NOT granted",
+            [partitions.ID_LOCK_NAMESPACE],
+        )
+        return cursor.fetchone()[0] > 0
+
+
+def partition_of(transaction_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT tableoid::regclass::text FROM {partitions.TABLE} WHERE id = %s', [transaction_id],
+        )
+        return cursor.fetchone()[0]
+
+
+class TestMonths:
+    def test_month_start_should_return_first_day_of_utc_month(self):
+        moment = datetime(2025, 3, 1, 0, 30, tzinfo=dt_timezone(timedelta(hours=1)))
+
+        assert partitions.month_start(moment) == utc(2025, 2, 1)
+
+    def test_months_ahead_should_cross_year_end(self):
+        months = partitions.months_ahead(2, today=utc(2025, 11, 20, 12))
+
+        assert months == [utc(2025, 11, 1), utc(2025, 12, 1), utc(2026, 1, 1)]
+        assert partitions.partition_name(months[-1]) == 'transactions_transaction_p2026_01'
+
+
+@postgresql_only
+@pytest.mark.django_db
+class TestPartitions:
+    def test_migrate_should_partition_transactions_table(self):
+        assert partitions.is_partitioned()
+
+    def test_ensure_partitions_should_move_rows_out_of_default_partition(self):
+        instance = make_transaction(timestamp=utc(2001, 5, 10))
+        assert partition_of(instance.id) == partitions.DEFAULT_PARTITION
+
+        created = partitions.ensure_partitions([utc(2001, 5, 1)])
+
+        assert created == ['transactions_transaction_p2001_05']
+        assert partition_of(instance.id) == 'transactions_transaction_p2001_05'
+        assert partitions.ensure_partitions([utc(2001, 5, 1)]) == []
+
+    def test_insert_should_create_partitions_and_move_updated_rows(self):
+        loader = get_loader()
+        instance = build_transaction('00000000-0000-0000-0000-000000000001', 1)
+        instance.timestamp = utc(2002, 1, 15)
+        loader.insert([instance])
+        assert partition_of(instance.id) == 'transactions_transaction_p2002_01'
+
+        moved = build_transaction(instance.id, 2)
+        moved.timestamp = utc(2002, 2, 15)
+        loader.insert([moved], update_fields=OVERWRITE_FIELDS)
+        loader.insert([build_transaction(instance.id, 3)], ignore_conflicts=True)
+
+        assert partition_of(instance.id) == 'transactions_transaction_p2002_02'
+        assert Transaction.objects.get().amount == 2
+
+    def test_date_filtered_queries_should_scan_only_partitions_of_range(self):
+        partitions.ensure_partitions([utc(2003, 1, 1), utc(2003, 2, 1), utc(2003, 3, 1)])
+
+        plan = Transaction.objects.filter(
+            timestamp__gte=utc(2003, 2, 1), timestamp__lt=utc(2003, 3, 1),
+        ).explain()
+
+        assert 'transactions_transaction_p2003_02' in plan
+        assert 'transactions_transaction_p2003_01' not in plan
+        assert 'transactions_transaction_p2003_03' not in plan
+        assert partitions.DEFAULT_PARTITION not in plan
+
+    def test_create_partitions_should_create_months_ahead(self):
+        call_command('create_partitions', months_ahead=13)
+
+        month = partitions.months_ahead(13)[-1]
+        with connection.cursor() as cursor:
+            assert partitions.partition_name(month) in partitions.existing_partitions(cursor)
+
+
+@postgresql_only
+@pytest.mark.django_db(transaction=True)
+class TestIdLocks:
+    def test_import_should_wait_for_concurrent_import_of_same_ids(self):
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+        # The same ids as the sample file, timestamped now: they go to another partition than its rows.
+        ids = [uuid.UUID(f'550e8400-e29b-41d4-a716-44665544000{index}') for index in range(5)]
+        locked, release, errors = threading.Event(), threading.Event(), []
+
+        def import_concurrently():
+            try:
+                with transaction.atomic():
+                    loader = get_loader()
+                    loader.lock_ids(ids)
+                    loader.insert([build_transaction(id_, 1) for id_ in ids])
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        def import_file():
+            try:
+                with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+                    csv_importer.import_file()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=import_concurrently)
+        first.start()
+        assert locked.wait(10)
+        second = threading.Thread(target=import_file)
+        second.start()
+        deadline = time.monotonic() + 10
+        while not waiting_for_id_lock() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        waited = waiting_for_id_lock()
+        release.set()
+        first.join()
+        second.join()
+
+        assert waited
+        assert errors == []
+        assert Transaction.objects.count() == 5
+        file_request.refresh_from_db()
+        assert (file_request.rows_inserted, file_request.rows_rejected) == (0, 5)
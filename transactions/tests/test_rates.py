@@ -0,0 +1,83 @@
+import io
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from transactions import rollups
+from transactions.choices import CurrencyChoices
+from transactions.models import CustomerSummary, ExchangeRate, Transaction
+from transactions.rates import RateTable, read_rates, recompute_amounts_in_pln
+from transactions.tests.test_rollups import CUSTOMER_ID, import_sample, make_transaction
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class TestRateTable:
+    def test_get_rate_should_return_rate_effective_on_day(self):
+        table = RateTable([
+            ('EUR', date(2025, 1, 10), '4.2'),
+            ('EUR', date(2025, 1, 1), '4.1'),
+            ('USD', date(2025, 1, 5), '3.9'),
+        ])
+
+        assert table.get_rate('EUR', date(2024, 12, 31)) is None
+        assert table.get_rate('EUR', date(2025, 1, 1)) == Decimal('4.1')
+        assert table.get_rate('EUR', date(2025, 1, 9)) == Decimal('4.1')
+        assert table.get_rate('EUR', date(2025, 1, 10)) == Decimal('4.2')
+        assert table.get_rate('USD', date(2030, 1, 1)) == Decimal('3.9')
+        assert table.get_rate('PLN', date(1900, 1, 1)) == 1
+
+    def test_read_rates_should_report_line_when_row_invalid(self):
+        fileobj = io.StringIO("currency,effective_date,rate\nEUR,2025-01-01,4.1\nGBP,2025-01-01,5.0\n")
+
+        with pytest.raises(ValueError, match="Line 3: unsupported currency 'GBP'"):
+            read_rates(fileobj)
+
+
+@pytest.mark.django_db
+class TestExchangeRates:
+    def test_import_file_should_convert_with_rate_effective_on_transaction_date(self):
+        ExchangeRate.objects.create(currency=CurrencyChoices.EUR, effective_date=date(2025, 1, 16), rate='4.5')
+
+        import_sample()
+
+        assert Transaction.objects.get(id='550e8400-e29b-41d4-a716-446655440001').amount_in_pln == Decimal('900.00')
+        assert Transaction.objects.get(id='550e8400-e29b-41d4-a716-446655440004').amount_in_pln == Decimal('338.63')
+
+    def test_recompute_amounts_in_pln_should_update_range_and_rollups(self):
+        for day in (1, 15, 31):
+            make_transaction(timestamp=utc(2025, 1, day, 12), amount=10, amount_in_pln=43, currency=CurrencyChoices.EUR)
+        make_transaction(timestamp=utc(2025, 1, 15, 12), amount=10, amount_in_pln=10)
+        rollups.rebuild()
+        ExchangeRate.objects.create(currency=CurrencyChoices.EUR, effective_date=date(2025, 1, 10), rate='4.555')
+
+        updated = recompute_amounts_in_pln(date(2025, 1, 1), date(2025, 1, 20))
+
+        assert updated == 2
+        assert sorted(Transaction.objects.values_list('amount_in_pln', flat=True)) == [
+            Decimal('10.00'), Decimal('43.00'), Decimal('43.00'), Decimal('45.55'),
+        ]
+        assert CustomerSummary.objects.get(customer_id=CUSTOMER_ID).total_cost_in_pln == Decimal('141.55')
+        assert rollups.verify() == []
+
+    def test_exchange_rates_should_load_file_and_recompute_from_earliest_loaded_date(self, tmp_path):
+        make_transaction(timestamp=utc(2025, 1, 5, 12), amount=10, amount_in_pln=43, currency=CurrencyChoices.EUR)
+        make_transaction(timestamp=utc(2025, 1, 20, 12), amount=10, amount_in_pln=43, currency=CurrencyChoices.EUR)
+        path = tmp_path / 'rates.csv'
+        path.write_text("currency,effective_date,rate\nEUR,2025-01-10,4.4\nEUR,1970-01-01,4.3\n")
+
+        call_command('exchange_rates', load=str(path), recompute=True, stdout=io.StringIO())
+
+        assert ExchangeRate.objects.filter(currency=CurrencyChoices.EUR).count() == 2
+        assert sorted(Transaction.objects.values_list('amount_in_pln', flat=True)) == [
+            Decimal('43.00'), Decimal('44.00'),
+        ]
+
+    def test_exchange_rates_should_raise_error_when_no_action_given(self):
+        with pytest.raises(CommandError):
+            call_command('exchange_rates')
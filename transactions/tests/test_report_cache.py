@@ -0,0 +1,78 @@
+import uuid
+from unittest import mock
+
+import pytest
+from django.utils import timezone
+
+from transactions import report_cache
+from transactions.tests.test_rollups import CUSTOMER_ID, PRODUCT_ID, import_sample, make_transaction
+
+UNTOUCHED_ID = uuid.UUID('850e8400-e29b-41d4-a716-446655440001')
+
+
+class TestCachedReport:
+    def test_get_or_compute_should_compute_once_when_version_unchanged(self):
+        compute = mock.Mock(return_value={'total_cost_in_pln': 1})
+
+        first = report_cache.CachedReport(report_cache.CUSTOMER, CUSTOMER_ID).get_or_compute(compute)
+        second = report_cache.CachedReport(report_cache.CUSTOMER, CUSTOMER_ID).get_or_compute(compute)
+
+        assert first == second == {'total_cost_in_pln': 1}
+        compute.assert_called_once()
+        assert report_cache.stats()[report_cache.CUSTOMER] == {'hits': 1, 'misses': 1}
+
+    def test_get_or_compute_should_key_by_date_range(self):
+        compute = mock.Mock(return_value={})
+
+        report_cache.CachedReport(report_cache.CUSTOMER, CUSTOMER_ID).get_or_compute(compute)
+        report_cache.CachedReport(report_cache.CUSTOMER, CUSTOMER_ID, date_from=timezone.now()).get_or_compute(compute)
+
+        assert compute.call_count == 2
+
+    def test_get_or_compute_many_should_compute_missing_ids_only(self):
+        report_cache.CachedReport(report_cache.PRODUCT, PRODUCT_ID).get_or_compute(lambda: {'sum_quantity': 1})
+        compute = mock.Mock(side_effect=lambda ids: {id_: {'sum_quantity': 2} for id_ in ids})
+
+        reports = report_cache.get_or_compute_many(report_cache.PRODUCT, [PRODUCT_ID, UNTOUCHED_ID], None, None, compute)
+
+        assert reports == {PRODUCT_ID: {'sum_quantity': 1}, UNTOUCHED_ID: {'sum_quantity': 2}}
+        compute.assert_called_once_with([UNTOUCHED_ID])
+        assert report_cache.stats()[report_cache.PRODUCT] == {'hits': 1, 'misses': 2}
+
+    def test_invalidate_should_change_version_and_etag(self):
+        report = report_cache.CachedReport(report_cache.PRODUCT, PRODUCT_ID)
+
+        report_cache.invalidate(report_cache.PRODUCT, [str(PRODUCT_ID)])
+        invalidated = report_cache.CachedReport(report_cache.PRODUCT, PRODUCT_ID)
+
+        assert invalidated.version != report.version
+        assert invalidated.etag != report.etag
+
+
+@pytest.mark.django_db
+class TestReportCacheInvalidation:
+    def test_import_file_should_invalidate_touched_ids_only(self, django_capture_on_commit_callbacks):
+        customer = report_cache.CachedReport(report_cache.CUSTOMER, CUSTOMER_ID)
+        product = report_cache.CachedReport(report_cache.PRODUCT, PRODUCT_ID)
+        untouched = report_cache.CachedReport(report_cache.CUSTOMER, UNTOUCHED_ID)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            import_sample()
+
+        assert report_cache.CachedReport(report_cache.CUSTOMER, CUSTOMER_ID).version != customer.version
+        assert report_cache.CachedReport(report_cache.PRODUCT, PRODUCT_ID).version != product.version
+        assert report_cache.CachedReport(report_cache.CUSTOMER, UNTOUCHED_ID).version == untouched.version
+
+    def test_save_should_defer_invalidation_until_commit(self, django_capture_on_commit_callbacks):
+        customer = report_cache.CachedReport(report_cache.CUSTOMER, CUSTOMER_ID)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            make_transaction()
+
+        assert len(callbacks) == 1
+        assert report_cache.CachedReport(report_cache.CUSTOMER, CUSTOMER_ID).version == customer.version
+
+    def test_invalidation_should_not_fail_import_when_cache_unavailable(self, django_capture_on_commit_callbacks):
+        with mock.patch.object(report_cache, 'invalidate', side_effect=ConnectionError):
+            with django_capture_on_commit_callbacks(execute=True):
+                make_transaction()
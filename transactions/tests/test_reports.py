@@ -0,0 +1,138 @@
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from django.db.models import Q
+from django.test import override_settings
+
+from transactions import reports
+from transactions.choices import PeriodChoices
+from transactions.models import Transaction
+from transactions.tests.test_rollups import CUSTOMER_ID, PRODUCT_ID, make_transaction
+
+OTHER_CUSTOMER_ID = uuid.UUID('650e8400-e29b-41d4-a716-446655440002')
+OTHER_PRODUCT_ID = uuid.UUID('750e8400-e29b-41d4-a716-446655440002')
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+DATE_RANGES = [
+    (None, None),
+    (utc(2024, 1, 1), None),
+    (None, utc(2024, 6, 30, 23, 59, 59)),
+    (utc(2024, 1, 1), utc(2024, 12, 31, 23, 59, 59)),
+    (utc(2024, 1, 15, 12), utc(2024, 3, 2, 6)),
+    (utc(2024, 2, 10), utc(2024, 2, 10, 23, 59, 59)),
+    (utc(2024, 2, 10, 8), utc(2024, 2, 10, 9)),
+    (utc(2023, 12, 31, 23), utc(2025, 1, 1, 1)),
+    (utc(2024, 3, 1), utc(2024, 3, 1)),
+    (utc(2024, 5, 1), utc(2024, 4, 1)),
+]
+
+
+def make_transactions():
+    start = utc(2023, 12, 30, 22, 30)
+    for index in range(90):
+        make_transaction(
+            timestamp=start + timedelta(days=index * 4, hours=index * 7 % 24, minutes=index),
+            amount_in_pln=10 + index,
+            quantity=1 + index % 3,
+            customer_id=(CUSTOMER_ID, OTHER_CUSTOMER_ID)[index % 2],
+            product_id=(PRODUCT_ID, OTHER_PRODUCT_ID, uuid.UUID(int=index % 5))[index % 3],
+        )
+
+
+def raw_summaries(summaries, key, date_from, date_to):
+    transactions = Transaction.objects.all()
+    if date_from is not None:
+        transactions = transactions.filter(timestamp__gte=date_from)
+    if date_to is not None:
+        transactions = transactions.filter(timestamp__lte=date_to)
+    rows = {row.pop(key): row for row in summaries(transactions)}
+    return {id_: rows.get(id_, empty) for id_, empty in rows_for(key)}
+
+
+def rows_for(key):
+    if key == 'customer_id':
+        return [(CUSTOMER_ID, reports.EMPTY_CUSTOMER_SUMMARY), (OTHER_CUSTOMER_ID, reports.EMPTY_CUSTOMER_SUMMARY)]
+    return [(PRODUCT_ID, reports.EMPTY_PRODUCT_SUMMARY), (OTHER_PRODUCT_ID, reports.EMPTY_PRODUCT_SUMMARY)]
+
+
+class TestSplitRange:
+    def test_split_range_should_use_month_and_day_buckets_when_range_spans_months(self):
+        buckets, raw = reports.split_range(utc(2024, 1, 15, 12), utc(2024, 3, 2, 5, 59, 59, 999999))
+
+        assert buckets == [
+            Q(period=PeriodChoices.MONTH, start__gte=datetime(2024, 2, 1).date(), start__lt=datetime(2024, 3, 1).date()),
+            Q(period=PeriodChoices.DAY, start__gte=datetime(2024, 1, 16).date(), start__lt=datetime(2024, 2, 1).date()),
+            Q(period=PeriodChoices.DAY, start__gte=datetime(2024, 3, 1).date(), start__lt=datetime(2024, 3, 2).date()),
+        ]
+        assert raw == [
+            Q(timestamp__gte=utc(2024, 1, 15, 12), timestamp__lt=utc(2024, 1, 16)),
+            Q(timestamp__gte=utc(2024, 3, 2), timestamp__lt=utc(2024, 3, 2, 6)),
+        ]
+
+    def test_split_range_should_skip_raw_rows_when_range_is_whole_days(self):
+        buckets, raw = reports.split_range(utc(2024, 1, 3), utc(2024, 1, 9, 23, 59, 59, 999999))
+
+        assert buckets == [Q(
+            period=PeriodChoices.DAY,
+            start__gte=datetime(2024, 1, 3).date(),
+            start__lt=datetime(2024, 1, 10).date(),
+        )]
+        assert raw == []
+
+    def test_split_range_should_only_use_raw_rows_when_range_within_day(self):
+        buckets, raw = reports.split_range(utc(2024, 1, 3, 8), utc(2024, 1, 3, 9))
+
+        assert buckets == []
+        assert raw == [Q(timestamp__gte=utc(2024, 1, 3, 8), timestamp__lt=utc(2024, 1, 3, 9, 0, 0, 1))]
+
+    def test_split_range_should_select_nothing_when_range_is_empty(self):
+        assert reports.split_range(utc(2024, 1, 3), utc(2024, 1, 2)) == ([], [])
+
+
+@pytest.mark.django_db
+class TestReports:
+    @pytest.mark.parametrize('date_from,date_to', DATE_RANGES)
+    def test_customer_summaries_should_match_raw_aggregates(self, date_from, date_to):
+        make_transactions()
+
+        summaries = reports.customer_summaries([CUSTOMER_ID, OTHER_CUSTOMER_ID], date_from, date_to)
+
+        assert summaries == raw_summaries(
+            lambda transactions: transactions.summarize_customers(), 'customer_id', date_from, date_to,
+        )
+
+    @pytest.mark.parametrize('date_from,date_to', DATE_RANGES)
+    def test_product_summaries_should_match_raw_aggregates(self, date_from, date_to):
+        make_transactions()
+
+        summaries = reports.product_summaries([PRODUCT_ID, OTHER_PRODUCT_ID], date_from, date_to)
+
+        assert summaries == raw_summaries(
+            lambda transactions: transactions.summarize_products(), 'product_id', date_from, date_to,
+        )
+
+    @override_settings(TIME_ZONE='Europe/Warsaw')
+    @pytest.mark.parametrize('date_from,date_to', DATE_RANGES)
+    def test_customer_summaries_should_match_raw_aggregates_when_buckets_are_local_days(self, date_from, date_to):
+        make_transactions()
+
+        summaries = reports.customer_summaries([CUSTOMER_ID, OTHER_CUSTOMER_ID], date_from, date_to)
+
+        assert summaries == raw_summaries(
+            lambda transactions: transactions.summarize_customers(), 'customer_id', date_from, date_to,
+        )
+
+    def test_customer_summaries_should_follow_deleted_transactions(self):
+        first = make_transaction(timestamp=utc(2024, 2, 10, 8))
+        make_transaction(timestamp=utc(2024, 2, 3, 8), amount_in_pln=50)
+
+        first.delete()
+        summary = reports.customer_summaries([CUSTOMER_ID], utc(2024, 2, 1), utc(2024, 2, 29))[CUSTOMER_ID]
+
+        assert summary['total_cost_in_pln'] == 50
+        assert summary['last_transaction_datetime'] == utc(2024, 2, 3, 8)
@@ -0,0 +1,223 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from transactions import rollups
+from transactions.choices import CurrencyChoices, DuplicatePolicyChoices, PeriodChoices
+from transactions.importers import CSVImporter
+from transactions.models import (
+    CustomerPeriodSummary,
+    CustomerProduct,
+    CustomerProductPeriod,
+    CustomerSummary,
+    ProductPeriodSummary,
+    ProductSummary,
+    Transaction,
+)
+from transactions.tests.factories import FileImportRequestFactory, TransactionFactory
+from transactions.tests.test_importers import get_sample_file
+
+CUSTOMER_ID = uuid.UUID('650e8400-e29b-41d4-a716-446655440001')
+PRODUCT_ID = uuid.UUID('750e8400-e29b-41d4-a716-446655440001')
+
+postgresql_only = pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason="SQLite serializes writing transactions, run with TRANSACTIONS_DATABASE=postgresql.",
+)
+
+
+def import_sample(filename='valid_transactions.csv', **kwargs):
+    file_request = FileImportRequestFactory.create(file=get_sample_file(filename), **kwargs)
+    with CSVImporter(file_request.id, batch_size=2) as csv_importer:
+        csv_importer.import_file()
+
+
+def waiting_for_lock():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM pg_locks WHERE NOT granted')
+        return cursor.fetchone()[0] > 0
+
+
+def make_transaction(**kwargs):
+    return TransactionFactory(**{
+        'timestamp': timezone.now(),
+        'amount': 100,
+        'amount_in_pln': 100,
+        'currency': CurrencyChoices.PLN,
+        'customer_id': CUSTOMER_ID,
+        'product_id': PRODUCT_ID,
+        'quantity': 1,
+        **kwargs,
+    })
+
+
+@pytest.mark.django_db
+class TestRollups:
+    def test_import_file_should_update_rollups_when_rows_inserted(self):
+        import_sample()
+
+        customer = CustomerSummary.objects.get(customer_id=CUSTOMER_ID)
+        product = ProductSummary.objects.get(product_id=PRODUCT_ID)
+
+        assert customer.total_cost_in_pln == Decimal('1260.99')
+        assert customer.count_distinct_product == 3
+        assert customer.last_transaction_datetime.isoformat() == '2025-01-18T16:45:00+00:00'
+        assert product.sum_quantity == 5
+        assert product.total_income_in_pln == Decimal('4510.00')
+        assert product.count_distinct_customer == 2
+        assert rollups.verify() == []
+
+    def test_import_file_should_keep_rollups_when_reimported_with_overwrite(self):
+        import_sample()
+        import_sample(duplicate_policy=DuplicatePolicyChoices.OVERWRITE)
+
+        assert CustomerProduct.objects.count() == 5
+        assert rollups.verify() == []
+
+    def test_save_and_delete_should_update_rollups(self):
+        now = timezone.now()
+        first = make_transaction(timestamp=now - timedelta(days=1))
+        second = make_transaction(timestamp=now, product_id=uuid.uuid4(), quantity=3)
+
+        assert Transaction.objects.group_by_customer(CUSTOMER_ID) == {
+            'total_cost_in_pln': Decimal('400.00'),
+            'count_distinct_product': 2,
+            'last_transaction_datetime': now,
+        }
+
+        second.quantity = 1
+        second.save()
+        assert Transaction.objects.group_by_customer(CUSTOMER_ID)['total_cost_in_pln'] == Decimal('200.00')
+
+        second.delete()
+        assert Transaction.objects.group_by_customer(CUSTOMER_ID) == {
+            'total_cost_in_pln': Decimal('100.00'),
+            'count_distinct_product': 1,
+            'last_transaction_datetime': first.timestamp,
+        }
+
+        first.delete()
+        assert not CustomerSummary.objects.exists()
+        assert not ProductSummary.objects.exists()
+        assert not CustomerProduct.objects.exists()
+
+    def test_key_filter_should_select_only_given_keys(self):
+        other_customer_id, other_product_id = uuid.uuid4(), uuid.uuid4()
+        make_transaction()
+        make_transaction(customer_id=other_customer_id, product_id=other_product_id)
+        make_transaction(product_id=other_product_id)
+
+        rows = CustomerProduct.objects.filter(rollups.key_filter(
+            ('customer_id', 'product_id'), [(CUSTOMER_ID, PRODUCT_ID), (other_customer_id, other_product_id)],
+        ))
+
+        assert sorted(rows.values_list('customer_id', 'product_id')) == sorted([
+            (CUSTOMER_ID, PRODUCT_ID), (other_customer_id, other_product_id),
+        ])
+        assert not CustomerProduct.objects.filter(rollups.key_filter(('customer_id', 'product_id'), [])).exists()
+
+    def test_delete_should_keep_latest_timestamp_when_older_transaction_deleted(self):
+        now = timezone.now()
+        first = make_transaction(timestamp=now - timedelta(days=1))
+        make_transaction(timestamp=now)
+
+        first.delete()
+
+        assert CustomerSummary.objects.get(customer_id=CUSTOMER_ID).last_transaction_datetime == now
+        assert rollups.verify() == []
+
+    def test_delete_should_recompute_period_latest_timestamp_when_latest_transaction_deleted(self):
+        now = timezone.now().replace(hour=12)
+        first = make_transaction(timestamp=now - timedelta(hours=1))
+        second = make_transaction(timestamp=now, quantity=2)
+
+        second.delete()
+
+        day = CustomerPeriodSummary.objects.get(customer_id=CUSTOMER_ID, period=PeriodChoices.DAY)
+        assert (day.transactions, day.last_transaction_datetime) == (1, first.timestamp)
+        assert ProductPeriodSummary.objects.get(product_id=PRODUCT_ID, period=PeriodChoices.DAY).sum_quantity == 1
+        assert rollups.verify() == []
+
+        first.delete()
+        assert not CustomerPeriodSummary.objects.exists()
+        assert not ProductPeriodSummary.objects.exists()
+        assert not CustomerProductPeriod.objects.exists()
+
+    def test_rebuild_should_restore_rollups_from_transactions(self):
+        import_sample()
+        CustomerSummary.objects.all().delete()
+        ProductSummary.objects.update(sum_quantity=0)
+        assert rollups.verify() != []
+
+        call_command('rebuild_rollups')
+
+        assert rollups.verify() == []
+
+    def test_rebuild_should_only_touch_given_ids(self):
+        import_sample()
+        ProductSummary.objects.update(sum_quantity=0)
+
+        rollups.rebuild(product_ids=[PRODUCT_ID])
+
+        assert ProductSummary.objects.get(product_id=PRODUCT_ID).sum_quantity == 5
+        assert ProductSummary.objects.filter(sum_quantity=0).count() == 2
+
+    def test_verify_command_should_fail_when_rollups_differ(self):
+        import_sample()
+        CustomerSummary.objects.update(count_distinct_product=10)
+
+        with pytest.raises(CommandError):
+            call_command('rebuild_rollups', verify=True)
+
+
+@postgresql_only
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentRollups:
+    def test_save_should_increment_rows_created_by_concurrent_transaction(self):
+        created, release, errors = threading.Event(), threading.Event(), []
+
+        def save_concurrently():
+            try:
+                with transaction.atomic():
+                    make_transaction()
+                    created.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        def save():
+            try:
+                make_transaction()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=save_concurrently)
+        first.start()
+        assert created.wait(10)
+        second = threading.Thread(target=save)
+        second.start()
+        deadline = time.monotonic() + 10
+        while not waiting_for_lock() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        waited = waiting_for_lock()
+        release.set()
+        first.join()
+        second.join()
+
+        assert waited
+        assert errors == []
+        assert CustomerProduct.objects.get(customer_id=CUSTOMER_ID, product_id=PRODUCT_ID).transactions == 2
+        assert CustomerSummary.objects.get(customer_id=CUSTOMER_ID).count_distinct_product == 1
+        assert ProductSummary.objects.get(product_id=PRODUCT_ID).count_distinct_customer == 1
+        assert set(CustomerProductPeriod.objects.values_list('transactions', flat=True)) == {2}
+        assert rollups.verify() == []
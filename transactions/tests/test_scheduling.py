@@ -0,0 +1,144 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from celery import states
+from django.utils import timezone
+
+from transactions import scheduling
+from transactions.models import FileImportRequest, ImportCheckpoint
+from transactions.tasks import import_csv_task
+from transactions.tests.factories import FileImportRequestFactory, UserFactory
+from transactions.tests.test_importers import get_sample_file
+
+
+def waiting_request(user, queue='imports_small', **kwargs):
+    return FileImportRequestFactory(requested_by=user, queue=queue, **kwargs)
+
+
+class TestClassify:
+    def test_classify_should_return_first_queue_when_file_fits_its_limit(self, settings):
+        settings.TRANSACTIONS_IMPORT_QUEUES = [('small', 100), ('medium', 1000), ('large', None)]
+
+        assert scheduling.classify(100) == 'small'
+        assert scheduling.classify(101) == 'medium'
+        assert scheduling.classify(10 ** 12) == 'large'
+
+
+@pytest.mark.django_db
+class TestEnqueue:
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_enqueue_should_route_by_file_size_when_committed(
+            self, mock_apply_async, settings, django_capture_on_commit_callbacks):
+        settings.TRANSACTIONS_IMPORT_QUEUES = [('small', 10), ('large', None)]
+        import_request = FileImportRequestFactory(file=get_sample_file('valid_transactions.csv'))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            scheduling.enqueue(import_request)
+
+        import_request.refresh_from_db()
+        assert import_request.queue == 'large'
+        assert import_request.dispatched_at is not None
+        mock_apply_async.assert_called_once_with((import_request.id,), queue='large')
+
+
+@pytest.mark.django_db
+class TestDispatch:
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_dispatch_should_stop_at_user_limit_when_user_has_many_requests(self, mock_apply_async, settings):
+        settings.TRANSACTIONS_IMPORT_USER_CONCURRENCY = 2
+        user = UserFactory()
+        requests = [waiting_request(user) for _ in range(4)]
+
+        assert scheduling.dispatch() == [requests[0].id, requests[1].id]
+        assert scheduling.dispatch() == []
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_dispatch_should_alternate_users_when_one_user_queued_first(self, mock_apply_async, settings):
+        settings.TRANSACTIONS_IMPORT_USER_CONCURRENCY = 3
+        busy_user, other_user = UserFactory(), UserFactory()
+        busy = [waiting_request(busy_user) for _ in range(5)]
+        other = waiting_request(other_user)
+
+        dispatched = scheduling.dispatch()
+
+        assert dispatched == [busy[0].id, other.id, busy[1].id, busy[2].id]
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_dispatch_should_count_limit_per_queue(self, mock_apply_async, settings):
+        settings.TRANSACTIONS_IMPORT_USER_CONCURRENCY = 1
+        user = UserFactory()
+        waiting_request(user, queue='imports_large', dispatched_at=timezone.now(), status=states.STARTED)
+        small = waiting_request(user)
+        waiting_request(user, queue='imports_large')
+
+        assert scheduling.dispatch() == [small.id]
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_dispatch_should_prefer_user_with_fewer_active_imports(self, mock_apply_async, settings):
+        settings.TRANSACTIONS_IMPORT_USER_CONCURRENCY = 2
+        busy_user, other_user = UserFactory(), UserFactory()
+        waiting_request(busy_user, dispatched_at=timezone.now(), status=states.STARTED)
+        busy = waiting_request(busy_user)
+        other = waiting_request(other_user)
+
+        assert scheduling.dispatch() == [other.id, busy.id]
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_dispatch_should_not_count_started_request_when_lease_expired(self, mock_apply_async, settings):
+        settings.TRANSACTIONS_IMPORT_USER_CONCURRENCY = 1
+        settings.TRANSACTIONS_IMPORT_LEASE = 60
+        user = UserFactory()
+        long_ago = timezone.now() - timedelta(minutes=5)
+        waiting_request(user, dispatched_at=long_ago, started_at=long_ago, status=states.STARTED)
+        pending = waiting_request(user)
+
+        assert scheduling.dispatch() == [pending.id]
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_dispatch_should_count_started_request_when_batch_committed_within_lease(
+            self, mock_apply_async, settings):
+        settings.TRANSACTIONS_IMPORT_USER_CONCURRENCY = 1
+        settings.TRANSACTIONS_IMPORT_LEASE = 60
+        user = UserFactory()
+        long_ago = timezone.now() - timedelta(minutes=5)
+        running = waiting_request(user, dispatched_at=long_ago, started_at=long_ago, status=states.STARTED)
+        ImportCheckpoint.objects.create(import_request=running, start=0, offset=0)
+        waiting_request(user)
+
+        assert scheduling.dispatch() == []
+
+    @mock.patch("transactions.tasks.import_csv_task.apply_async")
+    def test_import_csv_task_should_dispatch_next_request_when_import_completes(
+            self, mock_apply_async, settings, django_capture_on_commit_callbacks):
+        settings.TRANSACTIONS_IMPORT_USER_CONCURRENCY = 1
+        user = UserFactory()
+        first = waiting_request(user, file=get_sample_file('valid_transactions.csv'))
+        second = waiting_request(user)
+        assert scheduling.dispatch() == [first.id]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            import_csv_task(first.id)
+
+        second.refresh_from_db()
+        assert second.dispatched_at is not None
+        mock_apply_async.assert_called_once_with((second.id,), queue='imports_small')
+
+
+@pytest.mark.django_db
+class TestQueueStats:
+    def test_queue_stats_should_count_requests_per_state(self):
+        user = UserFactory()
+        oldest = waiting_request(user)
+        FileImportRequest.objects.filter(pk=oldest.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        waiting_request(user, dispatched_at=timezone.now())
+        waiting_request(user, dispatched_at=timezone.now(), status=states.STARTED)
+        waiting_request(user, dispatched_at=timezone.now(), status=states.SUCCESS)
+
+        stats = scheduling.queue_stats()
+
+        assert stats['imports_small']['waiting'] == 1
+        assert stats['imports_small']['queued'] == 1
+        assert stats['imports_small']['running'] == 1
+        assert stats['imports_small']['oldest'] == FileImportRequest.objects.get(pk=oldest.pk).created_at
+        assert stats['imports_large'] == {'waiting': 0, 'queued': 0, 'running': 0, 'oldest': None}
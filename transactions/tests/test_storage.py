@@ -0,0 +1,122 @@
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from transactions import rollups, storage
+from transactions.api.serializers import TransactionSerializer
+from transactions.choices import CurrencyChoices
+from transactions.loaders import get_loader
+from transactions.models import CustomerSummary, ExchangeRate, Transaction
+from transactions.rates import recompute_amounts_in_pln
+from transactions.reports import customer_summaries, product_summaries
+from transactions.tests.test_loaders import build_transaction
+from transactions.tests.test_rollups import CUSTOMER_ID, PRODUCT_ID, make_transaction
+
+sqlite_only = pytest.mark.skipif(connection.vendor != 'sqlite', reason="Compact storage only applies to SQLite.")
+
+
+def stored(transaction_id, *columns):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {", ".join(f"typeof({column}), {column}" for column in columns)} '
+            f'FROM transactions_transaction WHERE lower(hex(id)) = %s OR id = %s',
+            [transaction_id.hex, transaction_id.hex],
+        )
+        return cursor.fetchone()
+
+
+@sqlite_only
+@pytest.mark.django_db
+class TestCompactStorage:
+    def test_save_should_store_minor_units_and_uuid_bytes_when_compact(self, settings):
+        settings.TRANSACTIONS_COMPACT_STORAGE = True
+
+        instance = make_transaction(amount=Decimal('12.34'), amount_in_pln=Decimal('12.345'))
+
+        assert stored(instance.id, 'id', 'customer_id', 'amount', 'amount_in_pln') == (
+            'blob', instance.id.bytes, 'blob', CUSTOMER_ID.bytes, 'integer', 1234, 'integer', 1235,
+        )
+        assert Transaction.objects.filter(customer_id=CUSTOMER_ID, amount__gte=Decimal('12.34')).get() == instance
+        instance.refresh_from_db()
+        assert (instance.amount, instance.amount_in_pln, instance.customer_id) == (
+            Decimal('12.34'), Decimal('12.35'), CUSTOMER_ID,
+        )
+
+    def test_serializer_should_return_same_representation_when_compact(self, settings):
+        instance = make_transaction(amount=Decimal('12.30'))
+        expected = TransactionSerializer(Transaction.objects.get()).data
+
+        settings.TRANSACTIONS_COMPACT_STORAGE = True
+        storage.convert(True)
+
+        assert stored(instance.id, 'amount')[0] == 'integer'
+        assert TransactionSerializer(Transaction.objects.get()).data == expected
+
+    def test_reports_should_return_same_summaries_when_compact(self, settings):
+        now = timezone.now()
+        for days, amount in ((40, '100.10'), (3, '200.20'), (0, '0.05')):
+            make_transaction(timestamp=now - timedelta(days=days), amount=amount, amount_in_pln=amount,
+                             product_id=uuid.uuid4(), quantity=3)
+        date_range = (now - timedelta(days=30), now - timedelta(hours=1))
+        expected = [customer_summaries([CUSTOMER_ID], *date_range), product_summaries([PRODUCT_ID], *date_range),
+                    list(Transaction.objects.summarize_customers())]
+
+        settings.TRANSACTIONS_COMPACT_STORAGE = True
+        storage.convert(True)
+
+        assert [customer_summaries([CUSTOMER_ID], *date_range), product_summaries([PRODUCT_ID], *date_range),
+                list(Transaction.objects.summarize_customers())] == expected
+        assert expected[0][CUSTOMER_ID]['total_cost_in_pln'] == Decimal('600.60')
+
+    def test_recompute_amounts_in_pln_should_store_minor_units_when_compact(self, settings):
+        settings.TRANSACTIONS_COMPACT_STORAGE = True
+        timestamp = datetime(2025, 1, 15, 12, tzinfo=dt_timezone.utc)
+        instance = make_transaction(timestamp=timestamp, amount=Decimal('12.35'), amount_in_pln=Decimal('12.35'),
+                                    currency=CurrencyChoices.EUR)
+        rollups.rebuild()
+        ExchangeRate.objects.create(currency=CurrencyChoices.EUR, effective_date=date(2025, 1, 1), rate='4.33')
+
+        recompute_amounts_in_pln(date(2025, 1, 1), date(2025, 1, 31))
+
+        # 12.35 EUR * 4.33 = 53.4755 PLN, stored as 5348 grosze.
+        assert stored(instance.id, 'amount_in_pln') == ('integer', 5348)
+        assert Transaction.objects.get().amount_in_pln == Decimal('53.48')
+        date_range = (timestamp - timedelta(days=1), timestamp + timedelta(days=1))
+        assert customer_summaries([CUSTOMER_ID], *date_range)[CUSTOMER_ID]['total_cost_in_pln'] == Decimal('53.48')
+        assert Transaction.objects.group_by_customer(CUSTOMER_ID)['total_cost_in_pln'] == Decimal('53.48')
+        assert CustomerSummary.objects.get(customer_id=CUSTOMER_ID).total_cost_in_pln == Decimal('53.48')
+        assert rollups.verify() == []
+
+    def test_staging_loader_should_insert_compact_rows_when_compact(self, settings):
+        settings.TRANSACTIONS_COMPACT_STORAGE = True
+        instance = build_transaction(uuid.uuid4(), Decimal('7.50'))
+
+        get_loader('staging').insert([instance])
+
+        assert stored(instance.id, 'id', 'amount') == ('blob', instance.id.bytes, 'integer', 750)
+        assert Transaction.objects.get().amount == Decimal('7.50')
+
+    def test_convert_should_restore_default_representation_when_expanded(self, settings):
+        settings.TRANSACTIONS_COMPACT_STORAGE = False
+        instance = make_transaction(amount=Decimal('12.34'))
+        before = stored(instance.id, 'id', 'customer_id', 'amount')
+
+        assert storage.convert(True) > 0
+        assert storage.convert(True) == 0
+        storage.convert(False)
+
+        assert stored(instance.id, 'id', 'customer_id', 'amount') == before
+
+    def test_convert_storage_should_convert_to_configured_representation(self, settings):
+        instance = make_transaction()
+        settings.TRANSACTIONS_COMPACT_STORAGE = True
+
+        call_command('convert_storage')
+
+        assert stored(instance.id, 'id')[0] == 'blob'
+        assert Transaction.objects.get().id == instance.id
@@ -0,0 +1,118 @@
+from unittest import mock
+
+import pytest
+from celery import states
+
+from transaction_api.celery import app as celery_app
+from transactions.models import Transaction
+from transactions.tasks import import_csv_task
+from transactions.tests.factories import FileImportRequestFactory
+from transactions.tests.test_importers import fail_on_batch, get_sample_file
+from transactions.tests.test_uploads import finalize, upload_in_chunks
+
+
+@pytest.fixture
+def celery_eager():
+    celery_app.conf.task_always_eager = True
+    yield
+    celery_app.conf.task_always_eager = False
+
+
+@pytest.mark.django_db
+class TestImportCSVTask:
+    def test_import_csv_task_should_import_in_place_when_file_is_small(self):
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+
+        import_csv_task(file_request.id)
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.SUCCESS
+        assert Transaction.objects.count() == 5
+
+    @mock.patch("transactions.tasks.chord")
+    def test_import_csv_task_should_fan_out_shards_when_file_is_large(self, mock_chord, settings):
+        settings.TRANSACTIONS_IMPORT_SHARD_SIZE = 200
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+
+        import_csv_task(file_request.id)
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.STARTED
+        assert file_request.processed_at is None
+        shard_signatures = list(mock_chord.call_args.args[0])
+        assert len(shard_signatures) > 1
+        assert [signature.args[0] for signature in shard_signatures] == [file_request.id] * len(shard_signatures)
+        mock_chord.return_value.assert_called_once()
+        assert Transaction.objects.count() == 0
+
+    def test_import_csv_task_should_complete_request_when_shards_run_eagerly(self, settings, celery_eager):
+        settings.TRANSACTIONS_IMPORT_SHARD_SIZE = 200
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+
+        import_csv_task(file_request.id)
+
+        file_request.refresh_from_db()
+
+        assert file_request.checkpoints.count() > 1
+        assert file_request.status == states.SUCCESS
+        assert file_request.rows_inserted == 5
+        assert file_request.processed_at is not None
+        assert Transaction.objects.count() == 5
+
+    @mock.patch("transactions.tasks.chord")
+    def test_import_csv_task_should_not_split_again_when_redelivered(self, mock_chord, settings):
+        settings.TRANSACTIONS_IMPORT_SHARD_SIZE = 200
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+        import_csv_task(file_request.id)
+        shard_count = len(list(mock_chord.call_args.args[0]))
+
+        import_csv_task(file_request.id)
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.STARTED
+        mock_chord.return_value.assert_called_once()
+        assert file_request.checkpoints.filter(end__isnull=False).count() == shard_count
+
+    def test_import_csv_task_should_resume_and_clear_failure_when_retried(self, settings):
+        settings.TRANSACTIONS_IMPORT_BATCH_SIZE = 2
+        file_request = FileImportRequestFactory.create(file=get_sample_file('valid_transactions.csv'))
+        with fail_on_batch(3):
+            import_csv_task(file_request.id)
+
+        file_request.refresh_from_db()
+        assert file_request.status == states.FAILURE
+        started_at = file_request.started_at
+
+        import_csv_task(file_request.id)
+
+        file_request.refresh_from_db()
+
+        assert file_request.status == states.SUCCESS
+        assert file_request.exception_meta == {}
+        assert file_request.started_at == started_at
+        assert file_request.rows_inserted == 5
+        assert Transaction.objects.count() == 5
+
+    def test_import_csv_task_should_skip_request_when_already_imported(self):
+        file_request = FileImportRequestFactory.create(
+            file=get_sample_file('valid_transactions.csv'),
+            status=states.SUCCESS,
+        )
+
+        import_csv_task(file_request.id)
+
+        assert Transaction.objects.count() == 0
+
+    def test_import_csv_task_should_fail_request_when_upload_checksum_does_not_match(self):
+        upload = upload_in_chunks(get_sample_file('valid_transactions.csv').read(), 100)
+        file_request = finalize(upload, '0' * 64)
+
+        import_csv_task(file_request.id)
+
+        file_request.refresh_from_db()
+        assert file_request.status == states.FAILURE
+        assert 'checksum' in file_request.exception_meta['exception_value']
+        assert Transaction.objects.count() == 0
@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import io
+
+import pytest
+from django.core.files.storage import default_storage
+
+from transactions import uploads
+from transactions.models import ChunkedUpload
+from transactions.tests.factories import FileImportRequestFactory, UserFactory
+from transactions.tests.test_importers import get_sample_file
+
+
+def sample_bytes():
+    return get_sample_file('valid_transactions.csv').read()
+
+
+def upload_in_chunks(content, chunk_size, **kwargs):
+    upload = ChunkedUpload.objects.create(requested_by=UserFactory(), filename='transactions.csv', **kwargs)
+    for start in range(0, len(content), chunk_size):
+        chunk = content[start:start + chunk_size]
+        name = uploads.save_part(upload, upload.offset, io.BytesIO(chunk), len(chunk))
+        uploads.append_part(upload, name, len(chunk))
+    return upload
+
+
+def finalize(upload, checksum=''):
+    upload.import_request = FileImportRequestFactory(file='', requested_by=upload.requested_by)
+    upload.checksum = checksum
+    upload.save()
+    return upload.import_request
+
+
+@pytest.mark.django_db
+class TestSavePart:
+    def test_append_part_should_advance_offset_when_parts_saved(self):
+        upload = upload_in_chunks(b'abcdef', 4)
+
+        assert upload.offset == 6
+        assert upload.parts == [uploads.part_name(upload.id, 0), uploads.part_name(upload.id, 4)]
+        assert default_storage.open(upload.parts[1]).read() == b'ef'
+
+    def test_save_part_should_save_each_attempt_under_own_name_when_offset_is_same(self):
+        upload = ChunkedUpload.objects.create(requested_by=UserFactory(), filename='transactions.csv')
+
+        first = uploads.save_part(upload, 0, io.BytesIO(b'abc'), 3)
+        second = uploads.save_part(upload, 0, io.BytesIO(b'xyz'), 3)
+
+        assert first != second
+        assert default_storage.open(first).read() == b'abc'
+        assert default_storage.open(second).read() == b'xyz'
+
+    def test_save_part_should_raise_when_body_is_shorter_than_length(self):
+        upload = ChunkedUpload.objects.create(requested_by=UserFactory(), filename='transactions.csv')
+
+        with pytest.raises(ValueError):
+            uploads.save_part(upload, 0, io.BytesIO(b'abc'), 5)
+
+        assert not default_storage.exists(uploads.part_name(upload.id, 0))
+
+    def test_discard_parts_should_delete_parts_of_interrupted_attempts(self):
+        upload = upload_in_chunks(b'abcdef', 4)
+        orphan = uploads.save_part(upload, 4, io.BytesIO(b'ef'), 2)
+
+        uploads.discard_parts(upload)
+
+        assert upload.parts == []
+        assert not default_storage.exists(orphan)
+        assert default_storage.listdir(uploads.part_directory(upload.id)) == ([], [])
+
+
+@pytest.mark.django_db
+class TestPrepareFile:
+    def test_prepare_file_should_assemble_parts_when_upload_is_finalized(self):
+        content = sample_bytes()
+        upload = upload_in_chunks(content, 100)
+        import_request = finalize(upload, hashlib.sha256(content).hexdigest())
+
+        uploads.prepare_file(import_request)
+
+        import_request.refresh_from_db()
+        upload.refresh_from_db()
+        assert import_request.file.name.endswith('.csv')
+        assert import_request.file.open('rb').read() == content
+        assert upload.parts == []
+        assert not default_storage.exists(uploads.part_name(upload.id, 0))
+
+    def test_prepare_file_should_decompress_parts_when_upload_is_gzipped(self):
+        content = sample_bytes()
+        compressed = gzip.compress(content)
+        upload = upload_in_chunks(compressed, 50)
+        upload.filename = 'transactions.csv.gz'
+        import_request = finalize(upload, hashlib.sha256(compressed).hexdigest())
+
+        uploads.prepare_file(import_request)
+
+        import_request.refresh_from_db()
+        assert import_request.file.name.endswith('.csv')
+        assert import_request.file.open('rb').read() == content
+
+    def test_prepare_file_should_raise_when_checksum_does_not_match(self):
+        upload = upload_in_chunks(sample_bytes(), 100)
+        import_request = finalize(upload, '0' * 64)
+
+        with pytest.raises(ValueError, match='checksum'):
+            uploads.prepare_file(import_request)
+
+        import_request.refresh_from_db()
+        assert not import_request.file
+
+    def test_prepare_file_should_decompress_file_when_uploaded_gzipped_at_once(self):
+        content = sample_bytes()
+        import_request = FileImportRequestFactory(file=get_sample_file('valid_transactions.csv'))
+        import_request.file.save('transactions.csv.gz', io.BytesIO(gzip.compress(content)))
+        gzipped_name = import_request.file.name
+
+        uploads.prepare_file(import_request)
+
+        import_request.refresh_from_db()
+        assert import_request.file.name.endswith('.csv')
+        assert import_request.file.open('rb').read() == content
+        assert not default_storage.exists(gzipped_name)
+
+    def test_prepare_file_should_keep_file_when_it_is_plain(self):
+        import_request = FileImportRequestFactory(file=get_sample_file('valid_transactions.csv'))
+        name = import_request.file.name
+
+        uploads.prepare_file(import_request)
+
+        import_request.refresh_from_db()
+        assert import_request.file.name == name
@@ -0,0 +1,117 @@
+from datetime import date
+
+import pytest
+
+from transactions.rates import RateTable
+from transactions.validators import RowValidator, SerializerRowValidator
+
+MISSING = object()
+
+CONTEXT = {'rate_table': RateTable([('EUR', date(2025, 1, 1), '4.3'), ('USD', date(2025, 1, 1), '4.0')])}
+
+VALID_ROW = {
+    'transaction_id': '550e8400-e29b-41d4-a716-446655440000',
+    'timestamp': '2025-01-15T10:30:00Z',
+    'amount': '150.50',
+    'currency': 'EUR',
+    'customer_id': '650e8400-e29b-41d4-a716-446655440001',
+    'product_id': '750e8400-e29b-41d4-a716-446655440001',
+    'quantity': '2',
+}
+
+ROW_CHANGES = [
+    {},
+    {'transaction_id': '550E8400E29B41D4A716446655440000'},
+    {'transaction_id': '{550e8400-e29b-41d4-a716-446655440000}'},
+    {'transaction_id': 'urn:uuid:550e8400-e29b-41d4-a716-446655440000'},
+    {'transaction_id': 'invalid-uuid'},
+    {'transaction_id': ''},
+    {'transaction_id': None},
+    {'customer_id': ' 650e8400-e29b-41d4-a716-446655440001'},
+    {'timestamp': '2025-01-15T10:30:00+02:00'},
+    {'timestamp': '2025-01-15 10:30'},
+    {'timestamp': '2025-01-15T10:30:00.123456'},
+    {'timestamp': '2025-01-15'},
+    {'timestamp': '2025-02-30T10:30:00Z'},
+    {'timestamp': 'invalid-date'},
+    {'timestamp': ''},
+    {'amount': '100'},
+    {'amount': ' 100.5 '},
+    {'amount': '1e2'},
+    {'amount': '1_000.25'},
+    {'amount': '0'},
+    {'amount': '-1.00'},
+    {'amount': '0.001'},
+    {'amount': '9999999999.99'},
+    {'amount': '99999999999.99'},
+    {'amount': 'NaN'},
+    {'amount': 'Infinity'},
+    {'amount': 'abc'},
+    {'amount': ''},
+    {'amount': '1' * 1001},
+    {'currency': 'PLN'},
+    {'currency': 'USD'},
+    {'currency': 'pln'},
+    {'currency': 'GBP'},
+    {'currency': ''},
+    {'quantity': '1'},
+    {'quantity': '0'},
+    {'quantity': '-3'},
+    {'quantity': '2.0'},
+    {'quantity': '2.5'},
+    {'quantity': ' 7 '},
+    {'quantity': '1_0'},
+    {'quantity': '9223372036854775808'},
+    {'quantity': 'many'},
+    {'amount_in_pln': '12.00'},
+    {'amount_in_pln': 'abc'},
+    {'amount_in_pln': '123456789.00'},
+    {'amount': 'abc', 'currency': 'GBP', 'quantity': '0'},
+    {'quantity': MISSING},
+    {'timestamp': MISSING},
+    {'transaction_id': MISSING, 'amount': MISSING},
+]
+
+
+def make_row(changes):
+    row = dict(VALID_ROW, **changes)
+    return {key: value for key, value in row.items() if value is not MISSING}
+
+
+
+def error_codes(errors):
+    return {name: [error.code for error in details] for name, details in errors.items()}
+
+
+class TestRowValidator:
+    @pytest.mark.parametrize('changes', ROW_CHANGES)
+    def test_validate_should_match_serializer(self, changes):
+        row = make_row(changes)
+
+        expected_data, expected_errors = SerializerRowValidator(context=CONTEXT).validate(row)
+        validated_data, errors = RowValidator(context=CONTEXT).validate(row)
+
+        assert validated_data == expected_data
+        assert errors == expected_errors
+        if expected_errors:
+            assert error_codes(errors) == error_codes(expected_errors)
+        else:
+            assert {name: type(value) for name, value in validated_data.items()} == {
+                name: type(value) for name, value in expected_data.items()
+            }
+            assert validated_data['timestamp'].tzinfo == expected_data['timestamp'].tzinfo
+
+    def test_validate_should_compute_amount_in_pln_when_valid(self):
+        validated_data, errors = RowValidator(context=CONTEXT).validate(VALID_ROW)
+
+        assert errors is None
+        assert str(validated_data['amount']) == '150.50'
+        assert str(validated_data['amount_in_pln']) == '647.15'
+
+    def test_validate_should_reject_row_when_no_rate_effective_on_its_date(self):
+        row = make_row({'timestamp': '2024-12-31T23:59:59Z'})
+
+        validated_data, errors = RowValidator(context=CONTEXT).validate(row)
+
+        assert validated_data is None
+        assert error_codes(errors) == {'currency': ['no_rate']}
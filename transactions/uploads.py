@@ -0,0 +1,158 @@
+"""
+Chunked uploads. The web process writes each chunk to storage as a part, and the import task
+assembles the parts into the file of the import request. Gzipped files, uploaded in chunks or
+in one request, are decompressed on the fly while they are copied, so the importer reads a
+plain CSV file it can split into byte ranges and resume at an offset.
+"""
+import gzip
+import hashlib
+import io
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .models import ChunkedUpload
+
+GZIP_MAGIC = b'\x1f\x8b'
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def part_directory(upload_id):
+    return f'import_uploads/parts/{upload_id}'
+
+
+def part_name(upload_id, offset):
+    return f'{part_directory(upload_id)}/{offset}.part'
+
+
+def plain_name(filename):
+    return filename[:-3] if filename.endswith('.gz') else filename
+
+
+class HashingReader(io.RawIOBase):
+    """Reads `fileobj`, counting the bytes read and hashing them with SHA-256."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.fileobj.read(len(buffer))
+        buffer[:len(data)] = data
+        self.sha256.update(data)
+        self.size += len(data)
+        return len(data)
+
+
+class PartsReader(io.RawIOBase):
+    """Reads the files of `names` in storage one after another."""
+
+    def __init__(self, names):
+        self.names = iter(names)
+        self.part = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.part is None:
+                name = next(self.names, None)
+                if name is None:
+                    return 0
+                self.part = default_storage.open(name, 'rb')
+            data = self.part.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+            self.part.close()
+            self.part = None
+
+    def close(self):
+        if self.part is not None:
+            self.part.close()
+        super().close()
+
+
+def save_part(upload, offset, stream, length):
+    """
+    Writes the `length` bytes of `stream` to storage as the part of `upload` at `offset` and
+    returns its name. It runs without locking the upload, so every attempt, including
+    concurrent ones at the same offset, gets a name of its own.
+    """
+    name = part_name(upload.id, offset)
+    reader = HashingReader(stream)
+    name = default_storage.save(name, File(reader, name=name))
+    if reader.size != length:
+        delete_part(name)
+        raise ValueError(f"Received {reader.size} bytes of a {length} byte chunk.")
+    return name
+
+
+def append_part(upload, name, length):
+    """Adds the saved part `name` at the offset of `upload`, locked by the caller, and moves the offset past it."""
+    upload.parts = [*upload.parts, name]
+    upload.offset += length
+    upload.save(update_fields=['parts', 'offset', 'updated_at'])
+
+
+def delete_part(name):
+    default_storage.delete(name)
+
+
+def prepare_file(import_request):
+    """
+    Makes the file of the request a plain CSV file: assembles the parts of a chunked upload,
+    verifying the SHA-256 checksum given when it was finalized, and decompresses gzipped
+    files. A plain file is left as it is, so a redelivered task does not copy it again.
+    """
+    upload = ChunkedUpload.objects.filter(import_request=import_request).first()
+    if import_request.file:
+        with import_request.file.open('rb') as file:
+            compressed = file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+        if not compressed:
+            discard_parts(upload)
+            return
+        source = default_storage.open(import_request.file.name, 'rb')
+        filename, checksum = import_request.file.name.rsplit('/', 1)[-1], ''
+    else:
+        source = PartsReader(upload.parts)
+        filename, checksum = upload.filename, upload.checksum
+
+    previous_name = import_request.file.name
+    with source:
+        hashing = HashingReader(source)
+        buffered = io.BufferedReader(hashing, COPY_CHUNK_SIZE)
+        content = buffered
+        if buffered.peek(len(GZIP_MAGIC))[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+            content = gzip.GzipFile(fileobj=buffered)
+        import_request.file.save(plain_name(filename), File(content), save=False)
+        while buffered.read(COPY_CHUNK_SIZE):
+            pass
+    if checksum and hashing.sha256.hexdigest() != checksum:
+        import_request.file.delete(save=False)
+        raise ValueError(f"The SHA-256 checksum of the upload is {hashing.sha256.hexdigest()}, not {checksum}.")
+    import_request.save(update_fields=['file'])
+    if previous_name:
+        default_storage.delete(previous_name)
+    discard_parts(upload)
+
+
+def discard_parts(upload):
+    """Deletes the parts of `upload`, with those of attempts interrupted before they were appended."""
+    if upload is None:
+        return
+    directory = part_directory(upload.id)
+    try:
+        _, names = default_storage.listdir(directory)
+    except FileNotFoundError:
+        names = []
+    for name in set(upload.parts) | {f'{directory}/{name}' for name in names}:
+        default_storage.delete(name)
+    if upload.parts:
+        upload.parts = []
+        upload.save(update_fields=['parts', 'updated_at'])
@@ -0,0 +1,221 @@
+import decimal
+import uuid
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils.dateparse import parse_datetime
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField, empty
+from rest_framework.settings import api_settings
+
+from .serializers import ImportTransactionSerializer
+
+
+class RowValidator:
+    """
+    Validates CSV rows without instantiating ImportTransactionSerializer per row.
+
+    Converters are compiled once from the serializer's own field definitions, so
+    rows are accepted or rejected exactly as the serializer would do it. Failures
+    are re-raised through the DRF field so error details are the serializer's too.
+    """
+
+    def __init__(self, serializer_class=ImportTransactionSerializer, context=None):
+        self.serializer = serializer_class(context=context)
+        self.fields = [
+            (name, field.source, field, compile_field(field))
+            for name, field in self.serializer.fields.items()
+            if not field.read_only
+        ]
+        self.run_serializer_validators = bool(self.serializer.validators)
+
+    def validate(self, row):
+        """Returns a `(validated_data, errors)` pair, one of them being None."""
+        data = {}
+        errors = {}
+        for name, source, field, convert in self.fields:
+            value = row.get(name, empty)
+            try:
+                if value is empty or value is None:
+                    data[source] = field.run_validation(value)
+                else:
+                    data[source] = convert(value)
+            except SkipField:
+                pass
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+
+        if errors:
+            return None, errors
+
+        try:
+            if self.run_serializer_validators:
+                self.serializer.run_validators(data)
+            return self.serializer.validate(data), None
+        except (serializers.ValidationError, DjangoValidationError) as exc:
+            return None, serializers.as_serializer_error(exc)
+
+
+def compile_field(field):
+    if field.allow_null:
+        return field.run_validation
+    for field_class, compiler in FIELD_COMPILERS:
+        if isinstance(field, field_class):
+            return compiler(field)
+    return field.run_validation
+
+
+def compile_bounds(field, convert):
+    min_value = getattr(field, 'min_value', None)
+    max_value = getattr(field, 'max_value', None)
+    if any(not isinstance(validator, (MinValueValidator, MaxValueValidator)) for validator in field.validators):
+        def validate(value):
+            value = convert(value)
+            field.run_validators(value)
+            return value
+        return validate
+
+    def validate_bounds(value):
+        value = convert(value)
+        if (min_value is not None and value < min_value) or (max_value is not None and value > max_value):
+            field.run_validators(value)
+        return value
+    return validate_bounds
+
+
+def compile_uuid(field):
+    UUID = uuid.UUID
+
+    def convert(value):
+        if isinstance(value, str):
+            try:
+                return UUID(value)
+            except ValueError:
+                pass
+        return field.to_internal_value(value)
+    return compile_bounds(field, convert)
+
+
+def compile_integer(field):
+    max_length = field.MAX_STRING_LENGTH
+
+    def convert(value):
+        if isinstance(value, str) and len(value) <= max_length:
+            try:
+                # Succeeds only for input without a '.', which the field's re_decimal leaves untouched.
+                return int(value)
+            except ValueError:
+                pass
+        return field.to_internal_value(value)
+    return compile_bounds(field, convert)
+
+
+def compile_decimal(field):
+    if field.localize:
+        return compile_bounds(field, field.to_internal_value)
+
+    max_length = field.MAX_STRING_LENGTH
+    max_digits = field.max_digits
+    decimal_places = field.decimal_places
+    max_whole_digits = field.max_whole_digits
+    Decimal = decimal.Decimal
+    if decimal_places is not None:
+        quantum = Decimal('.1') ** decimal_places
+        context = decimal.getcontext().copy()
+        if max_digits is not None:
+            context.prec = max_digits
+
+    def convert(value):
+        text = value.strip() if isinstance(value, str) else value
+        if not isinstance(text, str) or len(text) > max_length:
+            return field.to_internal_value(value)
+        try:
+            number = Decimal(text)
+        except decimal.DecimalException:
+            return field.to_internal_value(value)
+        if not number.is_finite():
+            return field.to_internal_value(value)
+
+        _, digits, exponent = number.as_tuple()
+        if exponent >= 0:
+            total_digits = whole_digits = len(digits) + exponent
+            places = 0
+        elif len(digits) > -exponent:
+            total_digits = len(digits)
+            whole_digits = total_digits + exponent
+            places = -exponent
+        else:
+            total_digits = places = -exponent
+            whole_digits = 0
+        if (
+            (max_digits is not None and total_digits > max_digits)
+            or (decimal_places is not None and places > decimal_places)
+            or (max_whole_digits is not None and whole_digits > max_whole_digits)
+        ):
+            field.validate_precision(number)
+
+        if decimal_places is None:
+            return number
+        return number.quantize(quantum, rounding=field.rounding, context=context)
+    return compile_bounds(field, convert)
+
+
+def compile_datetime(field):
+    input_formats = getattr(field, 'input_formats', api_settings.DATETIME_INPUT_FORMATS)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if [input_format.lower() for input_format in input_formats] != [ISO_8601] or field_timezone is None:
+        return compile_bounds(field, field.to_internal_value)
+
+    def convert(value):
+        try:
+            parsed = parse_datetime(value)
+        except (ValueError, TypeError):
+            parsed = None
+        if parsed is None:
+            return field.to_internal_value(value)
+        if parsed.utcoffset() is not None:
+            try:
+                return parsed.astimezone(field_timezone)
+            except OverflowError:
+                field.fail('overflow')
+        return field.enforce_timezone(parsed)
+    return compile_bounds(field, convert)
+
+
+def compile_choice(field):
+    choices = field.choice_strings_to_values
+    allow_blank = field.allow_blank
+
+    def convert(value):
+        if not isinstance(value, str):
+            return field.to_internal_value(value)
+        if value == '' and allow_blank:
+            return ''
+        try:
+            return choices[value]
+        except KeyError:
+            field.fail('invalid_choice', input=value)
+    return compile_bounds(field, convert)
+
+
+FIELD_COMPILERS = [
+    (serializers.UUIDField, compile_uuid),
+    (serializers.IntegerField, compile_integer),
+    (serializers.DecimalField, compile_decimal),
+    (serializers.DateTimeField, compile_datetime),
+    (serializers.ChoiceField, compile_choice),
+]
+
+
+class SerializerRowValidator:
+    """Reference implementation running ImportTransactionSerializer for every row."""
+
+    def __init__(self, serializer_class=ImportTransactionSerializer, context=None):
+        self.serializer_class = serializer_class
+        self.context = context
+
+    def validate(self, row):
+        serializer = self.serializer_class(data=row, context=self.context)
+        if not serializer.is_valid():
+            return None, serializer.errors
+        return serializer.validated_data, None